@@ -1,13 +1,32 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response
 import pymysql
 from utils import *
+from db import init_app, get_db
+import ids
+from ids import next_id
+from auth import cache_role, user_is_admin, login_required, admin_required
+from pagination import row_counts
+from player_import import import_stream
+import player_archive
+import player_search
+import export
+from player_archive import archive_players, select_players
+from player_search import players_changed, search_players
+import ingest
+import metrics
+import querylog
+from ingest import validate_events, Backpressure
+from standings import refresh_team_standings
+from page_cache import cached_page
+from draft import draft_preview
+from waivers import run_waivers
 import logging
 import math
 import datetime
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
-import logger
 import traceback
+import hmac
 
 app = Flask(__name__)
 
@@ -18,20 +37,72 @@ app.secret_key = 'your_unique_secret_key'
 # import os
 # app.secret_key = os.urandom(24)
 
-def get_db_connection():
-    return pymysql.connect(
-        host='localhost',
-        user='root',
-        password='',
-        db='FSL',
-        cursorclass=pymysql.cursors.DictCursor  # Returns rows as dictionaries
-    )
+# Each request borrows one pooled connection on first use and returns it at teardown
+init_app(app)
+ids.init_app(app)
+ingest.init_app(app)
+querylog.init_app(app)
+player_archive.init_app(app)
+player_search.init_app(app)
+metrics.init_app(app)
 
 # Main route to test the app
 @app.route('/')
 def home():
     return render_template('base.html')  # Ensure you have a home.html template
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """
+    Request, database and cache metrics in the Prometheus text format.
+    When METRICS_TOKEN is set, scrapers send it as a bearer token; logged in admins may look as well.
+    """
+    token = app.config.get('METRICS_TOKEN')
+    if token:
+        sent_token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(sent_token, token) and not user_is_admin():
+            return Response("Not authorized.\n", status=403, mimetype='text/plain')
+    return Response(metrics.render_metrics(app), mimetype='text/plain; version=0.0.4')
+
+@app.route('/diagnostics/queries')
+@admin_required("You do not have permission to view query diagnostics.")
+def query_diagnostics():
+    """
+    Per-route report of slow, repeated and similar statements (see querylog.py).
+    """
+    query_log = app.extensions.get('query_log')
+    if query_log is None:
+        return jsonify({'error': "The query log is off. Set FSL_QUERY_LOG=1 to enable it."}), 404
+    return jsonify({
+        'slow_query_ms': query_log.slow_threshold * 1000,
+        'repeat_threshold': query_log.repeat_threshold,
+        'sample_rate': query_log.sample_rate,
+        'routes': query_log.report(),
+    })
+
+@app.route('/export/<dataset>')
+@admin_required("You do not have permission to export data.")
+def export_data(dataset):
+    """
+    Streams players, trades or match_events as CSV or JSON Lines (?format=csv|jsonl), optionally
+    filtered by sport, status, match or player (see export.py). Rows are sent as they are read.
+    """
+    fmt = request.args.get('format', 'csv')
+    filters = {name: request.args[name] for name in ('sport', 'status', 'match', 'player') if request.args.get(name)}
+    try:
+        for name in ('match', 'player'):
+            if name in filters:
+                filters[name] = int(filters[name])
+        chunks = export.export(dataset, fmt, filters)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return Response(chunks, mimetype=export.FORMATS[fmt], headers={
+        'Content-Disposition': f'attachment; filename="{dataset}.{fmt}"',
+        # keep proxies from buffering the whole export before passing it on
+        'X-Accel-Buffering': 'no',
+    })
+
 # Dashboard route
 @app.route('/dashboard')
 def dashboard():
@@ -55,26 +126,25 @@ def login():
             flash("Username and password are required.", "danger")
             return redirect(url_for('login'))
 
-        connection = get_db_connection()
+        connection = get_db()
         cursor = connection.cursor()
 
         try:
             # check if the username or email exists in the database
             cursor.execute("""
-                SELECT UserID, UserName, Pwd FROM User WHERE Email = %s OR UserName = %s
+                SELECT UserID, UserName, Pwd, Position, RoleVersion FROM User WHERE Email = %s OR UserName = %s
             """, (username, username))
             user = cursor.fetchone()
         except Exception as e:
             logging.error(f"Error during login: {e}")
             flash("An error occurred. Please try again.", "danger")
             return redirect(url_for('login'))
-        finally:
-            connection.close()
 
         if user and check_password_hash(user['Pwd'], password):
             # if found, log in the user
             session['user_id'] = user['UserID']
             session['user_name'] = user['UserName']
+            cache_role(user)  # role is read from the session from now on
             flash("Logged in successfully!", "success")
             return redirect(url_for('dashboard'))  # redirect to the dashboard
         else:
@@ -102,7 +172,7 @@ def register():
         # generate a hashed password
         hashed_password = generate_password_hash(password, method='pbkdf2:sha256', salt_length=16)
 
-        connection = get_db_connection()
+        connection = get_db()
         cursor = connection.cursor()
 
         try:
@@ -117,9 +187,9 @@ def register():
 
             # insert the new user into the database
             cursor.execute("""
-                INSERT INTO User (FullName, Email, UserName, Pwd, Position, ProfileSetting)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (full_name, email, username, hashed_password, position, 'Public'))
+                INSERT INTO User (UserID, FullName, Email, UserName, Pwd, Position, ProfileSetting)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (next_id('User'), full_name, email, username, hashed_password, position, 'Public'))
             connection.commit()
             flash("Registration successful! You can now log in.", "success")
             return redirect(url_for('login'))
@@ -128,8 +198,6 @@ def register():
             flash("An error occurred during registration. Please try again.", "danger")
             logging.error(f"Error during registration: {e}")
             return redirect(url_for('register'))
-        finally:
-            connection.close()
     else:
         return render_template('register.html')
     
@@ -159,20 +227,16 @@ def get_user_public_leagues():
     user_id = session['user_id']
     leagues = []
 
-    # Establish a database connection
-    connection = get_db_connection()
-    try:
-        with connection.cursor() as cursor:
-            # Call the stored procedure with the user_id from the session
-            cursor.callproc('GetUserPublicLeaguesAndTeamRankings', (user_id,))
-            result = cursor.fetchall()
-            
-            if result:
-                leagues = result  # Populate the leagues list if results found
-            else:
-                leagues = []  # No leagues found for this user
-    finally:
-        connection.close()
+    connection = get_db()
+    with connection.cursor() as cursor:
+        # Call the stored procedure with the user_id from the session
+        cursor.callproc('GetUserPublicLeaguesAndTeamRankings', (user_id,))
+        result = cursor.fetchall()
+        
+        if result:
+            leagues = result  # Populate the leagues list if results found
+        else:
+            leagues = []  # No leagues found for this user
 
     # Render the template without needing to pass user_id or form_submitted
     return render_template('public_leagues.html', leagues=leagues)
@@ -187,20 +251,16 @@ def get_user_private_leagues():
     user_id = session['user_id']
     leagues = []
 
-    # Establish a database connection
-    connection = get_db_connection()
-    try:
-        with connection.cursor() as cursor:
-            # Call the stored procedure with the user_id from the session
-            cursor.callproc('GetUserPrivateLeaguesAndTeamRankings', (user_id,))
-            result = cursor.fetchall()
-            
-            if result:
-                leagues = result  # Populate the leagues list if results found
-            else:
-                leagues = []  # No leagues found for this user
-    finally:
-        connection.close()
+    connection = get_db()
+    with connection.cursor() as cursor:
+        # Call the stored procedure with the user_id from the session
+        cursor.callproc('GetUserPrivateLeaguesAndTeamRankings', (user_id,))
+        result = cursor.fetchall()
+        
+        if result:
+            leagues = result  # Populate the leagues list if results found
+        else:
+            leagues = []  # No leagues found for this user
 
     # Render the template with the leagues data
     return render_template('private_leagues.html', leagues=leagues)
@@ -220,20 +280,15 @@ def get_user_teams():
     user_id = session.get('user_id')
     teams = []
 
-    # Establish a database connection
-    connection = get_db_connection()
-    
-    try:
-        with connection.cursor() as cursor:
-            # Call the stored procedure with the user_id from the session
-            cursor.callproc('GetUserTeams', (user_id,))
-            result = cursor.fetchall()
-            if result:
-                teams = result
-            else:
-                teams = []
-    finally:
-        connection.close()
+    connection = get_db()
+    with connection.cursor() as cursor:
+        # Call the stored procedure with the user_id from the session
+        cursor.callproc('GetUserTeams', (user_id,))
+        result = cursor.fetchall()
+        if result:
+            teams = result
+        else:
+            teams = []
 
     # Render the template with the teams data
     return render_template('user_teams.html', teams=teams)
@@ -243,18 +298,14 @@ def get_user_teams():
 def get_team_info_by_name():
     team_name = request.args.get('team_name')
 
-    connection = get_db_connection()
-    
-    try:
-        with connection.cursor() as cursor:
-            cursor.callproc('GetTeamInfoByName', (team_name,))
-            result = cursor.fetchall()
-            if result:
-                return render_template('team_info.html', team_info=result, team_name=team_name)
-            else:
-                return render_template('team_info.html', team_info=[], team_name=team_name)
-    finally:
-        connection.close()
+    connection = get_db()
+    with connection.cursor() as cursor:
+        cursor.callproc('GetTeamInfoByName', (team_name,))
+        result = cursor.fetchall()
+        if result:
+            return render_template('team_info.html', team_info=result, team_name=team_name)
+        else:
+            return render_template('team_info.html', team_info=[], team_name=team_name)
 
 # Flask route for CreateTeam
 @app.route('/create_team', methods=['GET', 'POST'])
@@ -280,8 +331,7 @@ def create_team():
             league_id = int(league_id)
             user_id = int(session['user_id'])
 
-            # Establish database connection
-            connection = get_db_connection()
+            connection = get_db()
             cursor = connection.cursor()
 
             # Fetch league details
@@ -306,15 +356,9 @@ def create_team():
                 flash("Team name already exists in this league. Please choose a different name.", "danger")
                 return redirect(url_for('create_team'))
 
-            # Begin transaction by setting autocommit to False
-            connection.autocommit = False
-
             try:
-                # Get the next TeamID with row-level locking
-                cursor.execute("SELECT MAX(TeamID) AS max_id FROM Team FOR UPDATE")
-                result = cursor.fetchone()
-                max_id = result['max_id']
-                next_team_id = max_id + 1 if max_id else 1
+                # Reserve the next TeamID without locking the Team table
+                next_team_id = next_id('Team')
 
                 # Log the values before insertion
                 app.logger.debug(f"Inserting Team: TeamID={next_team_id}, TeamName='{team_name}', Manager={user_id}, LeagueID={league_id}, Sport='{sport_type}'")
@@ -325,6 +369,9 @@ def create_team():
                     VALUES (%s, %s, %s, %s, 0.00, NULL, 'A', %s)
                 """, (next_team_id, team_name, user_id, league_id, sport_type))
 
+                # Give the new team its place in the league standings
+                refresh_team_standings(cursor, [next_team_id])
+
                 # Commit transaction
                 connection.commit()
             # except pymysql.connector.Error as err:
@@ -343,16 +390,13 @@ def create_team():
                 app.logger.error(f"Error in create_team: {e}")
                 app.logger.error("Traceback: " + traceback.format_exc())
                 return render_template('create_team.html', leagues=[], sport_types=[])
-            finally:
-                # Set autocommit back to True
-                connection.autocommit = True
 
             flash("Team created successfully!", "success")
             return redirect(url_for('dashboard'))
 
         else:
             # GET request
-            connection = get_db_connection()
+            connection = get_db()
             cursor = connection.cursor()
 
             # Fetch all leagues
@@ -370,7 +414,6 @@ def create_team():
     except Exception as e:
         if 'connection' in locals():
             connection.rollback()
-            connection.autocommit = True
         error_message = f"An unexpected error occurred: {e}"
         flash(error_message, "danger")
         app.logger.error(f"Error in create_team: {e}")
@@ -379,12 +422,11 @@ def create_team():
     finally:
         if 'cursor' in locals():
             cursor.close()
-        if 'connection' in locals():
-            connection.close()
 
 
 # lzd
 @app.route('/matches', methods=['GET'])
+@cached_page(MATCH_TABLES)
 def matches():
     """
     Display all matches with options to sort by Date or Team and filter by Sport.
@@ -405,8 +447,7 @@ def matches():
         flash("Invalid sorting option. Please choose 'Date' or 'Team'.", 'danger')
         order_by = 'Date'  # Reset to default
 
-    # Establish a database connection
-    connection = get_db_connection()
+    connection = get_db()
 
     try:
         # Fetch matches using the stored procedure
@@ -426,10 +467,6 @@ def matches():
         flash("An unexpected error occurred. Please try again later.", 'danger')
         return render_template('matches.html', matches=[], sport=sport, order_by=order_by)
 
-    finally:
-        # Close the database connection
-        connection.close()
-
 # Route to view match events
 @app.route('/match_events/<int:match_id>', methods=['GET'])
 def match_events(match_id):
@@ -446,7 +483,7 @@ def match_events(match_id):
         flash("Invalid sorting option. Please choose 'Player' or 'Time'.", 'danger')
         order_by = 'Time'  # reset to default
 
-    connection = get_db_connection()
+    connection = get_db()
 
     try:
         # get match events using the utility function
@@ -462,12 +499,41 @@ def match_events(match_id):
         flash("An unexpected error occurred. Please try again later.", 'danger')
         return render_template('match_events.html', events=[], match_id=match_id, order_by=order_by)
 
-    finally:
-        connection.close()
+
+@app.route('/match_events/ingest', methods=['POST'])
+def ingest_match_events():
+    """
+    Accept a batch of live match events as JSON, either a list or {"events": [...]}.
+    Feeds authenticate with the X-Ingest-Token header; logged in admins may post as well.
+    Valid events are queued and written in the background; 503 means the queue is full.
+    """
+    token = app.config.get('INGEST_TOKEN')
+    sent_token = request.headers.get('X-Ingest-Token', '')
+    if not (token and hmac.compare_digest(sent_token, token)) and not user_is_admin():
+        return jsonify({'error': "Not authorized to ingest match events."}), 403
+
+    payload = request.get_json(silent=True)
+    rows = payload.get('events') if isinstance(payload, dict) else payload
+    if not isinstance(rows, list):
+        return jsonify({'error': "Expected a JSON list of events."}), 400
+
+    events, errors = validate_events(rows)
+    try:
+        app.extensions['event_ingestor'].submit(events)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 413
+    except Backpressure as e:
+        response = jsonify({'error': str(e)})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+
+    return jsonify({'accepted': len(events), 'rejected': errors}), 202
 
 
 
 @app.route('/players', methods=['GET'])
+@cached_page(('Player',), vary=(user_is_admin,))
 def get_all_player_stats():
     """
     Displays player stats with sorting options for 'Name', 'Fantasy Points', or 'Sport' and pagination.
@@ -476,10 +542,12 @@ def get_all_player_stats():
     # Get the 'order_by' query parameter, default to 'Name'
     order_by = request.args.get('order_by', 'Name')
 
-    # Get the 'page' query parameter, default to 1
+    # Page cursors ('after' / 'before') select the page; 'page' is only used for display
+    after = request.args.get('after')
+    before = request.args.get('before')
     try:
         page = int(request.args.get('page', 1))
-        if page < 1:
+        if page < 1 or not (after or before):
             page = 1
     except ValueError:
         page = 1
@@ -493,43 +561,32 @@ def get_all_player_stats():
         flash("Invalid sorting option. Please use 'Name', 'Fantasy Points', or 'Sport'.", 'danger')
         order_by = 'Name'
 
-    # Establish a database connection
-    connection = get_db_connection()
+    connection = get_db()
 
     try:
-        # Check if the user is logged in and determine if they are an admin
-        is_admin = False
-        if 'user_id' in session:
-            cursor = connection.cursor()
-            cursor.execute("SELECT Position FROM User WHERE UserID = %s", (session['user_id'],))
-            user = cursor.fetchone()
-            if user and user['Position'] == 'A':
-                is_admin = True
-
-        # Fetch player stats using the utility function
-        players = GetAllPlayerStats(connection, order_by)
-        # print(players)
-        # Calculate total pages
-        total_players = len(players)
-        total_pages = math.ceil(total_players / players_per_page) if total_players > 0 else 1
+        # Determine if the user is an admin (cached in the session)
+        is_admin = user_is_admin()
 
-        # Ensure the current page is within bounds
-        if page > total_pages and total_pages != 0:
-            page = total_pages
+        # Fetch only the requested page of players
+        result = GetPlayerPage(connection, order_by, after=after, before=before, per_page=players_per_page)
+        players_paginated = result['rows']
 
-        # Calculate start and end indices for slicing
-        start_idx = (page - 1) * players_per_page
-        end_idx = start_idx + players_per_page
-        players_paginated = players[start_idx:end_idx]
+        # Total pages come from a cached count instead of a full table read
+        total_players = CountPlayers(connection)
+        total_pages = math.ceil(total_players / players_per_page) if total_players > 0 else 1
+        if not result['prev_cursor']:
+            page = 1
 
         # Generate pagination links
         pagination = {
             'total_pages': total_pages,
             'current_page': page,
-            'has_prev': page > 1,
-            'has_next': page < total_pages,
+            'has_prev': result['prev_cursor'] is not None,
+            'has_next': result['next_cursor'] is not None,
             'prev_page': page - 1,
-            'next_page': page + 1
+            'next_page': page + 1,
+            'prev_cursor': result['prev_cursor'],
+            'next_cursor': result['next_cursor']
         }
 
         # Render the template with the fetched player stats, pagination, and is_admin flag
@@ -550,250 +607,315 @@ def get_all_player_stats():
         logging.error(f"Error fetching player stats: {e}")
         flash("An error occurred while fetching player stats. Please try again later.", "danger")
         return redirect(url_for('get_all_player_stats'))
-    finally:
-        # Close the database connection
-        connection.close()
 
 
 
+@app.route('/players/search', methods=['GET'])
+def search_players_view():
+    """
+    Typeahead search over player names and real teams, as JSON.
+    Query parameters: q, sport, status (AvaiStatus), team_id, and limit (10 by default, at most 50).
+    """
+    query = request.args.get('q', '').strip()
+    team_id = request.args.get('team_id', type=int)
+    limit = request.args.get('limit', player_search.DEFAULT_LIMIT, type=int)
+    limit = min(max(limit, 1), player_search.MAX_LIMIT)
+    if not query and team_id is None:
+        return jsonify({'players': [], 'source': None})
+
+    try:
+        players, source = search_players(query, sport=request.args.get('sport') or None,
+                                         status=request.args.get('status') or None, team_id=team_id, limit=limit)
+    except pymysql.MySQLError as e:
+        logging.error(f"Error searching players: {e}")
+        return jsonify({'error': "An error occurred while searching players."}), 500
+    return jsonify({'players': players, 'source': source})
+
+
 @app.route('/player/<int:player_id>', methods=['GET', 'POST'])
+@login_required("Please log in to view player details.")
 def player_details(player_id):
     """
     Displays the details of a specific player.
     Allows admins to edit or delete player details.
     """
-    # Check if the user is logged in
-    if 'user_id' not in session:
-        flash("Please log in to view player details.", "danger")
-        return redirect(url_for('login'))
-
-    # Establish a database connection
-    connection = get_db_connection()
-
-    try:
-        # Get user position from the database
-        cursor = connection.cursor()
-        cursor.execute("SELECT Position FROM User WHERE UserID = %s", (session['user_id'],))
-        user = cursor.fetchone()
-        is_admin = user['Position'] == 'A'
+    connection = get_db()
+    cursor = connection.cursor()
+    is_admin = user_is_admin()
 
-        if request.method == 'POST':
-            if is_admin:
-                action = request.form.get('action')
-
-                if action == 'update':
-                    # Admin submitted changes to player details
-                    # Retrieve form data
-                    full_name = request.form.get('full_name')
-                    position = request.form.get('position')
-                    real_team = request.form.get('real_team')
-                    fantasy_points = request.form.get('fantasy_points')
-                    avai_status = request.form.get('avai_status')
-                    photo_url = request.form.get('photo_url')
-
-                    # Validate input
-                    if not full_name or not position or not real_team:
-                        flash("Please fill out all required fields.", "danger")
-                    else:
-                        try:
-                            # Update player details in the database
-                            cursor.execute("""
-                                UPDATE Player
-                                SET FullName = %s,
-                                    Position = %s,
-                                    RealTeam = %s,
-                                    FantasyPoints = %s,
-                                    AvaiStatus = %s,
-                                    PhotoURL = %s
-                                WHERE PlayerID = %s
-                            """, (full_name, position, real_team, fantasy_points, avai_status, photo_url, player_id))
-                            connection.commit()
-                            flash("Player details updated successfully.", "success")
-                        except Exception as e:
-                            connection.rollback()
-                            flash("An error occurred while updating player details.", "danger")
-                            logging.error(f"Error updating player: {e}")
-
-                elif action == 'delete':
-                    # Admin wants to delete the player
+    if request.method == 'POST':
+        if is_admin:
+            action = request.form.get('action')
+
+            if action == 'update':
+                # Admin submitted changes to player details
+                # Retrieve form data
+                full_name = request.form.get('full_name')
+                position = request.form.get('position')
+                real_team = request.form.get('real_team')
+                fantasy_points = request.form.get('fantasy_points')
+                avai_status = request.form.get('avai_status')
+                photo_url = request.form.get('photo_url')
+
+                # Validate input
+                if not full_name or not position or not real_team:
+                    flash("Please fill out all required fields.", "danger")
+                else:
                     try:
-                        # Delete related records from PlayerStats
-                        cursor.execute("DELETE FROM PlayerStats WHERE PlayerID = %s", (player_id,))
-                        # Delete related records from MatchEvent
-                        cursor.execute("DELETE FROM MatchEvent WHERE PlayerID = %s", (player_id,))
-                        # Delete related records from PlayerTrade
-                        cursor.execute("DELETE FROM PlayerTrade WHERE PlayerID = %s", (player_id,))
-                        # Delete related records from Waiver
-                        cursor.execute("DELETE FROM Waiver WHERE PlayerID = %s", (player_id,))
-
-                        # Now delete the player
-                        cursor.execute("DELETE FROM Player WHERE PlayerID = %s", (player_id,))
+                        # Update player details in the database
+                        cursor.execute("""
+                            UPDATE Player
+                            SET FullName = %s,
+                                Position = %s,
+                                RealTeam = %s,
+                                FantasyPoints = %s,
+                                AvaiStatus = %s,
+                                PhotoURL = %s
+                            WHERE PlayerID = %s
+                        """, (full_name, position, real_team, fantasy_points, avai_status, photo_url, player_id))
                         connection.commit()
-                        flash("Player and all related data deleted successfully.", "success")
-                        return redirect(url_for('get_all_player_stats'))
+                        players_changed(connection, [player_id])
+                        flash("Player details updated successfully.", "success")
                     except Exception as e:
                         connection.rollback()
-                        flash("An error occurred while deleting the player.", "danger")
-                        logging.error(f"Error deleting player: {e}")
-            else:
-                flash("You do not have permission to perform this action.", "danger")
+                        flash("An error occurred while updating player details.", "danger")
+                        logging.error(f"Error updating player: {e}")
 
-        # Use GetPlayerDetails to fetch player information
-        player = GetPlayerDetails(connection, player_id)
+            elif action == 'delete':
+                # Admin wants to delete the player; history goes in short chunked transactions
+                try:
+                    archive_players(connection, [player_id], archive=False)
+                    row_counts.invalidate('players')
+                    players_changed(connection, [player_id], removed=True)
+                    flash("Player and all related data deleted successfully.", "success")
+                    return redirect(url_for('get_all_player_stats'))
+                except Exception as e:
+                    connection.rollback()
+                    flash("An error occurred while deleting the player.", "danger")
+                    logging.error(f"Error deleting player: {e}")
+        else:
+            flash("You do not have permission to perform this action.", "danger")
 
-        # Check if the player was found
-        if not player:
-            flash("Player not found.", "danger")
-            return redirect(url_for('get_all_player_stats'))
+    # Use GetPlayerDetails to fetch player information
+    player = GetPlayerDetails(connection, player_id)
 
-        # Render the player details template
-        return render_template('player_details.html', player=player, is_admin=is_admin)
+    # Check if the player was found
+    if not player:
+        flash("Player not found.", "danger")
+        return redirect(url_for('get_all_player_stats'))
 
-    finally:
-        # Ensure the connection is closed
-        connection.close()
+    # Render the player details template
+    return render_template('player_details.html', player=player, is_admin=is_admin)
 
 @app.route('/player/new', methods=['GET', 'POST'])
+@admin_required("You do not have permission to create a new player.", 'get_all_player_stats',
+                login_message="Please log in to create a new player.")
 def create_player():
     """
     Allows admin users to create a new player.
     """
-    # Check if the user is logged in
-    if 'user_id' not in session:
-        flash("Please log in to create a new player.", "danger")
-        return redirect(url_for('login'))
-
-    # Establish a database connection
-    connection = get_db_connection()
+    connection = get_db()
     cursor = connection.cursor()
 
-    try:
-        # Get user position from the database
-        cursor.execute("SELECT Position FROM User WHERE UserID = %s", (session['user_id'],))
-        user = cursor.fetchone()
-        is_admin = user['Position'] == 'A'
+    if request.method == 'POST':
+        # Get form data
+        full_name = request.form.get('full_name')
+        sport = request.form.get('sport')
+        position = request.form.get('position')
+        real_team = request.form.get('real_team')
+        fantasy_points = request.form.get('fantasy_points')
+        avai_status = request.form.get('avai_status')
+        photo_url = request.form.get('photo_url')
+
+        # Validate input (you can add more validation as needed)
+        if not full_name or not sport or not position or not real_team:
+            flash("Please fill out all required fields.", "danger")
+        else:
+            try:
+                # Insert new player into the database
+                player_id = next_id('Player')
+                cursor.execute("""
+                    INSERT INTO Player (PlayerID, FullName, Sport, Position, RealTeam, FantasyPoints, AvaiStatus, PhotoURL)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """, (player_id, full_name, sport, position, real_team, fantasy_points, avai_status, photo_url))
+                connection.commit()
+                row_counts.invalidate('players')
+                players_changed(connection, [player_id])
+                flash("New player created successfully.", "success")
+                return redirect(url_for('get_all_player_stats'))
+            except Exception as e:
+                connection.rollback()
+                flash("An error occurred while creating the player.", "danger")
+                logging.error(f"Error creating player: {e}")
 
-        if not is_admin:
-            flash("You do not have permission to create a new player.", "danger")
-            return redirect(url_for('get_all_player_stats'))
+    # GET request (or a failed POST), render the create player form
+    return render_template('create_player.html')
 
-        if request.method == 'POST':
-            # Get form data
-            full_name = request.form.get('full_name')
-            sport = request.form.get('sport')
-            position = request.form.get('position')
-            real_team = request.form.get('real_team')
-            fantasy_points = request.form.get('fantasy_points')
-            avai_status = request.form.get('avai_status')
-            photo_url = request.form.get('photo_url')
-
-            # Validate input (you can add more validation as needed)
-            if not full_name or not sport or not position or not real_team:
-                flash("Please fill out all required fields.", "danger")
-            else:
-                try:
-                    # Insert new player into the database
-                    cursor.execute("""
-                        INSERT INTO Player (FullName, Sport, Position, RealTeam, FantasyPoints, AvaiStatus, PhotoURL)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    """, (full_name, sport, position, real_team, fantasy_points, avai_status, photo_url))
-                    connection.commit()
-                    flash("New player created successfully.", "success")
-                    return redirect(url_for('get_all_player_stats'))
-                except Exception as e:
-                    connection.rollback()
-                    flash("An error occurred while creating the player.", "danger")
-                    logging.error(f"Error creating player: {e}")
+
+@app.route('/player/import', methods=['GET', 'POST'])
+@admin_required("You do not have permission to import players.", 'get_all_player_stats',
+                login_message="Please log in to import players.")
+def import_players():
+    """
+    Allows admin users to bulk import players from a CSV or JSON Lines file.
+    """
+    report = None
+
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        upsert = request.form.get('upsert') == 'on'
+
+        if not upload or not upload.filename:
+            flash("Please choose a file to import.", "danger")
         else:
-            # GET request, render the create player form
-            return render_template('create_player.html')
-    finally:
-        # Ensure the connection is closed
-        connection.close()
+            try:
+                report = import_stream(get_db(), upload.stream, upload.filename, upsert=upsert)
+                row_counts.invalidate('players')
+                players_changed(get_db())
+                category = "danger" if report['error_count'] else "success"
+                flash(f"{report['inserted']} players added, {report['updated']} updated, "
+                      f"{report['error_count']} rows rejected.", category)
+            except ValueError as e:
+                flash(str(e), "danger")
+            except pymysql.MySQLError as e:
+                logging.error(f"Error importing players: {e}")
+                flash("A database error occurred, no players were imported.", "danger")
+
+    return render_template('import_players.html', report=report)
+
+@app.route('/player/archive', methods=['GET', 'POST'])
+@admin_required("You do not have permission to archive players.", 'get_all_player_stats',
+                login_message="Please log in to archive players.")
+def archive_players_view():
+    """
+    Allows admin users to archive or delete many players, chosen by ID or by Sport, AvaiStatus and RealTeam.
+    The work runs in the background in small chunks; the page shows its progress.
+    """
+    jobs = app.extensions['archive_jobs']
+    form = request.form if request.method == 'POST' else request.args
+    criteria = {
+        'player_ids': form.get('player_ids', '').strip(),
+        'sport': form.get('sport') or None,
+        'avai_status': form.get('avai_status') or None,
+        'real_team': form.get('real_team', '').strip() or None,
+        'mode': form.get('mode', 'archive'),
+    }
+    matched = None
+
+    if request.method == 'POST':
+        try:
+            player_ids = [int(value) for value in criteria['player_ids'].replace(',', ' ').split()]
+        except ValueError:
+            flash("PlayerIDs must be numbers separated by commas or spaces.", "danger")
+            player_ids = None
+
+        if player_ids is not None:
+            try:
+                selected = select_players(get_db(), player_ids, criteria['sport'], criteria['avai_status'],
+                                          criteria['real_team'])
+                if request.form.get('action') == 'start' and selected:
+                    description = ', '.join(f"{name}={value}" for name, value in criteria.items()
+                                            if value and name != 'mode')
+                    jobs.start(selected, criteria['mode'] != 'delete', description, on_done=archive_job_done)
+                    flash(f"Started to {criteria['mode']} {len(selected)} players.", "success")
+                    return redirect(url_for('archive_players_view'))
+                matched = len(selected)
+            except ValueError as e:
+                flash(str(e), "danger")
+            except pymysql.MySQLError as e:
+                logging.error(f"Error selecting players to archive: {e}")
+                flash("A database error occurred while selecting players.", "danger")
+
+    recent = [job.status() for job in jobs.recent()]
+    return render_template('archive_players.html', criteria=criteria, matched=matched, jobs=recent,
+                           running=any(job['state'] in ('queued', 'running') for job in recent))
+
+
+def archive_job_done(job):
+    """
+    Runs on the archive job's thread once it finished.
+    """
+    row_counts.invalidate('players')
+    search_index = app.extensions.get('player_search')
+    if search_index is not None:
+        search_index.request_rebuild()
 
 
+@app.route('/player/archive/<int:job_id>', methods=['GET'])
+@admin_required("You do not have permission to archive players.", 'get_all_player_stats')
+def archive_job_status(job_id):
+    """
+    Progress of one archive job as JSON.
+    """
+    job = app.extensions['archive_jobs'].get(job_id)
+    if job is None:
+        return jsonify({'error': "Archive job not found."}), 404
+    return jsonify(job.status())
+
+
+@app.route('/player/archive/<int:job_id>/cancel', methods=['POST'])
+@admin_required("You do not have permission to archive players.", 'get_all_player_stats')
+def cancel_archive_job(job_id):
+    """
+    Stop a running archive job before its next chunk. Chunks already moved stay moved.
+    """
+    job = app.extensions['archive_jobs'].get(job_id)
+    if job is None:
+        flash("Archive job not found.", "danger")
+    elif not job.running:
+        flash(f"Archive job {job_id} has already finished.", "danger")
+    else:
+        job.cancel()
+        flash(f"Archive job {job_id} will stop after its current chunk.", "success")
+    return redirect(url_for('archive_players_view'))
 
 
 @app.route('/trade', methods=['GET'])
+@cached_page(('Trade', 'PlayerTrade', 'Player', 'Team'))
 def trade():
     """
     Display trades with options to sort by Name, Sport, Fantasy Points, or Trade Date.
     """
     # Get query parameters
     order_by = request.args.get('order_by', 'Name')  # Default sorting by Name
-    page = request.args.get('page', 1, type=int)     # Current page number
+    after = request.args.get('after')                # Page cursors
+    before = request.args.get('before')
+    page = request.args.get('page', 1, type=int)     # Current page number (display only)
+    if page < 1 or not (after or before):
+        page = 1
 
-    # Validate sorting options
+    # Validate sorting options (see utils.TRADE_SORT_KEYS for the seek keys of each mode)
     valid_order_fields = ['Name', 'Sport', 'Fantasy Points', 'Trade Date']
     if order_by not in valid_order_fields:
         flash("Invalid sorting option. Please choose 'Name', 'Sport', 'Fantasy Points', or 'Trade Date'.", 'danger')
         order_by = 'Name'  # Reset to default
 
-    # Define sorting SQL
-    sort_mapping = {
-        'Name': 'p.FullName ASC',
-        'Sport': 't.Sport ASC',
-        'Fantasy Points': 'p.FantasyPoints DESC',
-        'Trade Date': 'tr.TradeDate DESC'  # Default sorting
-    }
-    sort_order = sort_mapping.get(order_by, 'p.FullName ASC')
-
     # Pagination settings
     trades_per_page = 10
-    offset = (page - 1) * trades_per_page
 
-    # Establish database connection
-    connection = get_db_connection()
+    connection = get_db()
 
     try:
-        with connection.cursor() as cursor:
-            # Get total number of trades for pagination
-            cursor.execute("""
-                SELECT COUNT(*) AS count
-                FROM PlayerTrade pt
-                JOIN Player p ON pt.PlayerID = p.PlayerID
-                JOIN Trade tr ON pt.TradeID = tr.TradeID
-                JOIN Team t ON p.TeamID = t.TeamID
-            """)
-            total_trades = cursor.fetchone()['count']
-            total_pages = math.ceil(total_trades / trades_per_page) if total_trades > 0 else 1
-
-            # Fetch trades with sorting and pagination
-            cursor.execute(f"""
-                SELECT 
-                    pt.PlayerID,
-                    p.FullName,
-                    p.PhotoURL,
-                    p.RealTeam,
-                    t.TeamName,
-                    pt.FromOrTo,
-                    tr.TradeDate
-                FROM 
-                    PlayerTrade pt
-                JOIN 
-                    Player p ON pt.PlayerID = p.PlayerID
-                JOIN 
-                    Trade tr ON pt.TradeID = tr.TradeID
-                JOIN
-                    Team t ON p.TeamID = t.TeamID
-                ORDER BY 
-                    {sort_order}
-                LIMIT %s OFFSET %s
-            """, (trades_per_page, offset))
-            trades = cursor.fetchall()
-
-        # Determine pagination flags
-        has_prev = page > 1
-        has_next = page < total_pages
+        # Total comes from the trigger-maintained counter instead of a four-way join COUNT(*)
+        total_trades = GetRowCount(connection, 'PlayerTrade')
+        total_pages = math.ceil(total_trades / trades_per_page) if total_trades > 0 else 1
+
+        # Fetch one page of trades by seeking past the previous page's last row
+        result = GetTradePage(connection, order_by, after=after, before=before, per_page=trades_per_page)
+        trades = result['rows']
+        if not result['prev_cursor']:
+            page = 1
 
         # Create pagination object
         pagination = {
             'current_page': page,
-            'total_pages': total_pages,
-            'has_prev': has_prev,
-            'has_next': has_next,
+            'total_pages': max(total_pages, page),
+            'has_prev': result['prev_cursor'] is not None,
+            'has_next': result['next_cursor'] is not None,
             'prev_page': page - 1,
-            'next_page': page + 1
+            'next_page': page + 1,
+            'prev_cursor': result['prev_cursor'],
+            'next_cursor': result['next_cursor']
         }
 
         return render_template('trade.html', trades=trades, order_by=order_by, pagination=pagination)
@@ -809,8 +931,6 @@ def trade():
             'prev_page': 1,
             'next_page': 1
         })
-    finally:
-        connection.close()
 
 import logging
 from datetime import datetime
@@ -831,120 +951,104 @@ def start_trade():
     user_id = session['user_id']
 
     try:
-        with get_db_connection() as connection:
-            with connection.cursor() as cursor:
-                # 获取买方团队
-                cursor.execute("SELECT TeamID, TeamName FROM Team WHERE Manager = %s", (user_id,))
-                buyer_team = cursor.fetchone()
-                # logger.info(f"Buyer team: {buyer_team}")
+        connection = get_db()
+        with connection.cursor() as cursor:
+            # 获取买方团队
+            cursor.execute("SELECT TeamID, TeamName FROM Team WHERE Manager = %s", (user_id,))
+            buyer_team = cursor.fetchone()
+            # logger.info(f"Buyer team: {buyer_team}")
+
+            if not buyer_team:
+                flash("You do not have a team to perform trades.", "danger")
+                return redirect(url_for('dashboard'))
 
-                if not buyer_team:
-                    flash("You do not have a team to perform trades.", "danger")
-                    return redirect(url_for('dashboard'))
+            buyer_team_id = buyer_team['TeamID']
 
-                buyer_team_id = buyer_team['TeamID']
+            # 获取卖方团队
+            cursor.execute("SELECT TeamID, TeamName FROM Team WHERE TeamID != %s", (buyer_team_id,))
+            seller_teams = cursor.fetchall()
+            # logger.info(f"Seller teams: {seller_teams}")
 
-                # 获取卖方团队
-                cursor.execute("SELECT TeamID, TeamName FROM Team WHERE TeamID != %s", (buyer_team_id,))
-                seller_teams = cursor.fetchall()
-                # logger.info(f"Seller teams: {seller_teams}")
+            # the seller's players are looked up with the typeahead search (/players/search)
 
-                # 获取卖方玩家
-                cursor.execute("""
-                    SELECT p.PlayerID, p.FullName, p.RealTeam
-                    FROM Player p
-                    WHERE p.TeamID IN (
-                        SELECT TeamID FROM Team WHERE TeamID != %s
-                    ) AND p.AvaiStatus = 'A'
-                """, (buyer_team_id,))
-                seller_players = cursor.fetchall()
-                # logger.info(f"Seller players: {seller_players}")
-
-                # 获取买方玩家
-                cursor.execute("""
-                    SELECT p.PlayerID, p.FullName, p.RealTeam
-                    FROM Player p
-                    WHERE p.TeamID = %s AND p.AvaiStatus = 'A'
-                """, (buyer_team_id,))
-                your_players = cursor.fetchall()
-                # logger.info(f"Your players: {your_players}")
-
-                if request.method == 'POST':
-                    # 获取表单数据
-                    seller_team_id = request.form.get('seller_team_id')
-                    seller_player_id = request.form.get('seller_player_id')
-                    your_player_id = request.form.get('your_player_id')
-
-                    # 数据验证
-                    errors = []
-                    if not seller_team_id:
-                        errors.append("Seller team is required.")
-                    if not seller_player_id:
-                        errors.append("Seller player is required.")
-                    if not your_player_id:
-                        errors.append("Your player is required.")
-
-                    if errors:
-                        for error in errors:
-                            flash(error, "danger")
-                        return render_template('start_trade.html', 
-                                               seller_teams=seller_teams, 
-                                               seller_players=seller_players,
-                                               your_players=your_players)
-
-                    # 设置交易日期为当前日期
-                    trade_date = datetime.today().date()
-
-                    # 执行交易
-                    result = ExecuteTrade(connection, user_id, seller_team_id, seller_player_id, your_player_id, trade_date)
-                    # logger.info(f"Trade result: {result}")
-
-                    if result['status'] == "Trade executed successfully.":
-                        flash(result['status'], "success")
-                        return redirect(url_for('trade'))  
-                    else:
-                        flash(result['status'], "danger")
-                        return render_template('start_trade.html', 
-                                               seller_teams=seller_teams, 
-                                               seller_players=seller_players,
-                                               your_players=your_players)
-
-                return render_template('start_trade.html', 
-                                       seller_teams=seller_teams, 
-                                       seller_players=seller_players,
-                                       your_players=your_players)
+            # 获取买方玩家
+            cursor.execute("""
+                SELECT p.PlayerID, p.FullName, p.RealTeam
+                FROM Player p
+                WHERE p.TeamID = %s AND p.AvaiStatus = 'A'
+            """, (buyer_team_id,))
+            your_players = cursor.fetchall()
+            # logger.info(f"Your players: {your_players}")
+
+            if request.method == 'POST':
+                # 获取表单数据
+                seller_team_id = request.form.get('seller_team_id')
+                seller_player_id = request.form.get('seller_player_id')
+                your_player_id = request.form.get('your_player_id')
+
+                # 数据验证
+                errors = []
+                if not seller_team_id:
+                    errors.append("Seller team is required.")
+                if not seller_player_id:
+                    errors.append("Seller player is required.")
+                if not your_player_id:
+                    errors.append("Your player is required.")
+
+                if errors:
+                    for error in errors:
+                        flash(error, "danger")
+                    return render_template('start_trade.html', 
+                                           seller_teams=seller_teams, 
+                                           your_players=your_players)
+
+                # 设置交易日期为当前日期
+                trade_date = datetime.today().date()
+
+                # 执行交易
+                result = ExecuteTrade(connection, user_id, seller_team_id, seller_player_id, your_player_id, trade_date)
+                # logger.info(f"Trade result: {result}")
+
+                if result['status'] == "Trade executed successfully.":
+                    players_changed(connection, [seller_player_id, your_player_id])
+                    flash(result['status'], "success")
+                    return redirect(url_for('trade'))  
+                else:
+                    flash(result['status'], "danger")
+                    return render_template('start_trade.html', 
+                                           seller_teams=seller_teams, 
+                                           your_players=your_players)
+
+            return render_template('start_trade.html', 
+                                   seller_teams=seller_teams, 
+                                   your_players=your_players)
     except Exception as e:
         logging.error(f"Error in start_trade route: {e}")
         flash("An unexpected error occurred. Please try again later.", "danger")
         return redirect(url_for('dashboard'))
 
 @app.route('/draft', methods=['GET'], endpoint='draft')
+@cached_page(('Draft', 'League'))
 def draft():
     """
     Display all drafts from all leagues with pagination and an option to start a new draft.
     """
     # Retrieve query parameters
     order_by = request.args.get('order_by', 'Date')  # Default sorting by Date
-    page = request.args.get('page', 1, type=int)    # Current page number
+    after = request.args.get('after')                # Page cursors
+    before = request.args.get('before')
+    page = request.args.get('page', 1, type=int)    # Current page number (display only)
+    if page < 1 or not (after or before):
+        page = 1
 
-    # Define valid sorting fields
+    # Define valid sorting fields (see utils.DRAFT_SORT_KEYS for the seek keys of each mode)
     valid_order_fields = ['Date', 'DraftOrder', 'DraftStatus', 'LeagueType']
     if order_by not in valid_order_fields:
         flash("Invalid sorting option. Please choose 'Date', 'DraftOrder', 'DraftStatus', or 'LeagueType'.", 'danger')
         order_by = 'Date'  # Reset to default
 
-    # Define sorting SQL mapping
-    sort_mapping = {
-        'Date': 'Draft.DraftDate ASC',
-        'DraftOrder': 'Draft.DraftOrder ASC',
-        'DraftStatus': 'Draft.DraftStatus ASC',
-        'LeagueType': 'League.LeagueType ASC'
-    }
-    sort_order = sort_mapping.get(order_by, 'Draft.DraftDate ASC')
-
     # Pagination settings
     drafts_per_page = 12
-    offset = (page - 1) * drafts_per_page
 
     # Initialize variables to prevent UnboundLocalError
     drafts = []
@@ -954,44 +1058,38 @@ def draft():
         'has_prev': False,
         'has_next': False,
         'prev_page': page - 1,
-        'next_page': page + 1
+        'next_page': page + 1,
+        'prev_cursor': None,
+        'next_cursor': None
     }
 
-    # Establish database connection
-    connection = get_db_connection()
+    connection = get_db()
 
     try:
-        with connection.cursor() as cursor:
-            # Fetch total number of drafts for pagination
-            cursor.execute("SELECT COUNT(*) AS count FROM Draft")
-            total_drafts = cursor.fetchone()['count']
-            total_pages = math.ceil(total_drafts / drafts_per_page) if total_drafts > 0 else 1
-            pagination['total_pages'] = total_pages
-            pagination['has_prev'] = page > 1
-            pagination['has_next'] = page < total_pages
-
-            # Fetch drafts with league information, sorting, and pagination
-            drafts_query = f"""
-                SELECT
-                    Draft.DraftID,
-                    Draft.DraftDate AS Date,
-                    Draft.DraftOrder,
-                    Draft.DraftStatus,
-                    League.LeagueName,
-                    League.LeagueType
-                FROM Draft
-                JOIN League ON Draft.LeagueID = League.LeagueID
-                ORDER BY {sort_order}
-                LIMIT %s OFFSET %s
-            """
-            cursor.execute(drafts_query, (drafts_per_page, offset))
-            drafts = cursor.fetchall()
+        # Total comes from the trigger-maintained counter
+        total_drafts = GetRowCount(connection, 'Draft')
+        total_pages = math.ceil(total_drafts / drafts_per_page) if total_drafts > 0 else 1
+
+        # Fetch one page of drafts by seeking past the previous page's last row
+        result = GetDraftPage(connection, order_by, after=after, before=before, per_page=drafts_per_page)
+        drafts = result['rows']
+        if not result['prev_cursor']:
+            page = 1
+
+        pagination.update({
+            'current_page': page,
+            'total_pages': max(total_pages, page),
+            'has_prev': result['prev_cursor'] is not None,
+            'has_next': result['next_cursor'] is not None,
+            'prev_page': page - 1,
+            'next_page': page + 1,
+            'prev_cursor': result['prev_cursor'],
+            'next_cursor': result['next_cursor']
+        })
 
     except Exception as e:
         logging.error(f"Error fetching drafts: {e}")
         flash("An error occurred while fetching drafts. Please try again later.", "danger")
-    finally:
-        connection.close()
 
     return render_template(
         'draft.html',
@@ -1020,34 +1118,24 @@ def new_draft():
         # use current date as DraftDate
         draft_date = datetime.today().date()
 
-        # establish a database connection
-        connection = get_db_connection()
+        connection = get_db()
         try:
-            with connection.cursor() as cursor:
-                cursor.callproc('StartDraft', [league_id, draft_date, draft_order])
-
-                # get the DraftID of the new draft
-                row = cursor.fetchone()
-                if row and 'DraftID' in row:
-                    draft_id = row['DraftID']
-                    flash("Successfully started a new draft", "success")
-                    return redirect(url_for('draft_detail', draft_id=draft_id))
-                else:
-                    flash("Fail to get the ID of new draft", "danger")
-                    return redirect(url_for('new_draft'))
-
+            # run the draft with the set-based engine (same picks as the StartDraft procedure)
+            draft_id = start_draft(connection, league_id, draft_date, draft_order)
+            players_changed(connection)
+            flash("Successfully started a new draft", "success")
+            return redirect(url_for('draft_detail', draft_id=draft_id))
+
+        except ValueError as e:
+            # league missing, no teams or invalid order
+            flash(str(e), "danger")
+            return redirect(url_for('new_draft'))
         except pymysql.MySQLError as e:
-            # handle custom error messages
-            if e.args[0] == 45000:
-                flash(e.args[1], "danger")
-            else:
-                logging.error(f"Error when starting new draft: {e}")
-                flash("Error when starting new draft, please try again later", "danger")
+            logging.error(f"Error when starting new draft: {e}")
+            flash("Error when starting new draft, please try again later", "danger")
             return redirect(url_for('new_draft'))
-        finally:
-            connection.close()
     else:
-        connection = get_db_connection()
+        connection = get_db()
         try:
             with connection.cursor() as cursor:
                 # get the list of leagues
@@ -1061,17 +1149,48 @@ def new_draft():
             logging.error(f"Error when getting league list: {e}")
             flash("Error when getting league list, please try again later", "danger")
             leagues = []
-        finally:
-            connection.close()
 
         return render_template('new_draft.html', leagues=leagues)
 
+# most random tie-break runs one preview request may ask for, per draft order
+MAX_DRAFT_SIMULATIONS = 1000
+
+
+@app.route('/draft/simulate', methods=['GET'], endpoint='simulate_draft')
+@login_required("Please log in to preview a draft.")
+def simulate_draft_view():
+    """
+    Preview what a draft would give each team of a league, as JSON, without changing anything.
+    Query parameters: league_id, order ('R' or 'S'; both when omitted), simulations (runs with
+    random LeagueRanking tie-breaks), seed, and roster_limit (players listed per team, 50 by default).
+    """
+    league_id = request.args.get('league_id', type=int)
+    order = request.args.get('order')
+    simulations = request.args.get('simulations', 0, type=int)
+    seed = request.args.get('seed', type=int)
+    roster_limit = request.args.get('roster_limit', 50, type=int)
+
+    if not league_id:
+        return jsonify({'error': "league_id is required."}), 400
+    if not 0 <= simulations <= MAX_DRAFT_SIMULATIONS:
+        return jsonify({'error': f"simulations must be between 0 and {MAX_DRAFT_SIMULATIONS}."}), 400
+
+    try:
+        preview = draft_preview(get_db(), league_id, orders=(order,) if order else ('R', 'S'),
+                                simulations=simulations, seed=seed, roster_limit=max(roster_limit, 0))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except pymysql.MySQLError as e:
+        logging.error(f"Error when simulating draft: {e}")
+        return jsonify({'error': "Error when simulating the draft, please try again later."}), 500
+    return jsonify(preview)
+
 @app.route('/draft/<int:draft_id>', methods=['GET'], endpoint='draft_detail')
 def draft_detail(draft_id):
     """
     Display the details of a specific draft, including the league name, draft date, order, status, and assigned players.
     """
-    connection = get_db_connection()
+    connection = get_db()
     try:
         with connection.cursor() as cursor:
             # get the draft details
@@ -1112,14 +1231,13 @@ def draft_detail(draft_id):
         logging.error(f"Error when getting draft details: {e}")
         flash("Errors when getting draft details, please try again later", "danger")
         return redirect(url_for('draft'))
-    finally:
-        connection.close()
 
     return render_template('draft_detail.html', draft=draft, players=players)
 
 
 # Waiver routes
 @app.route('/waivers', methods=['GET'])
+@cached_page(('Waiver', 'Player'), vary=(user_is_admin,))
 def waiver_list():
     """
     Display all currently available Waiver players, with sorting options.
@@ -1131,22 +1249,15 @@ def waiver_list():
     if sort_order not in valid_sort_orders:
         sort_order = 'Name'
 
+    connection = get_db()
+
     # Check if user is admin
     is_admin = False
-    if 'user_id' in session:
-        connection = get_db_connection()
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute("SELECT Position FROM User WHERE UserID = %s", (session['user_id'],))
-                user = cursor.fetchone()
-                if user and user['Position'] == 'A':
-                    is_admin = True
-        except pymysql.MySQLError as e:
-            logger.error(f"Error checking user position: {e}")
-        finally:
-            connection.close()
+    try:
+        is_admin = user_is_admin()
+    except pymysql.MySQLError as e:
+        logger.error(f"Error checking user position: {e}")
 
-    connection = get_db_connection()
     try:
         with connection.cursor(pymysql.cursors.DictCursor) as cursor:
             # Call the stored procedure GetWaiverPlayers
@@ -1164,8 +1275,6 @@ def waiver_list():
         logger.error(f"Error fetching waiver players: {e}")
         flash("Error fetching Waiver player list, please try again later.", "danger")
         players = []
-    finally:
-        connection.close()
 
     return render_template('waiver_list.html', players=players, sort_order=sort_order, is_admin=is_admin)
 
@@ -1175,9 +1284,9 @@ def waiver_details(waiver_id):
     Display the details of a specific Waiver.
     """
     # Check if user is admin
-    is_admin = session.get('is_admin', False)
+    is_admin = user_is_admin()
 
-    connection = get_db_connection()
+    connection = get_db()
     try:
         with connection.cursor(pymysql.cursors.DictCursor) as cursor:
             # Call the stored procedure GetWaiverDetails
@@ -1195,39 +1304,16 @@ def waiver_details(waiver_id):
         logger.error(f"Error fetching waiver details: {e}")
         flash("Error fetching Waiver details, please try again later.", "danger")
         return redirect(url_for('waiver_list'))
-    finally:
-        connection.close()
 
     return render_template('waiver_details.html', waiver=waiver, is_admin=is_admin)
 
 @app.route('/waivers/<int:waiver_id>/update', methods=['GET', 'POST'])
+@admin_required(endpoint='waiver_list')
 def update_waiver_status(waiver_id):
     """
     Update the status (approve or deny) of a specific Waiver.
     """
-    # Check if user is logged in
-    if 'user_id' not in session:
-        flash("Please log in first.", "danger")
-        return redirect(url_for('login'))
-
-    # Check if user is admin
-    is_admin = False
-    connection = get_db_connection()
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT Position FROM User WHERE UserID = %s", (session['user_id'],))
-            user = cursor.fetchone()
-            if user and user['Position'] == 'A':
-                is_admin = True
-            else:
-                flash("You do not have permission to perform this action.", "danger")
-                return redirect(url_for('waiver_list'))
-    except pymysql.MySQLError as e:
-        logger.error(f"Error checking user permissions: {e}")
-        flash("Error checking permissions, please try again later.", "danger")
-        return redirect(url_for('waiver_list'))
-    finally:
-        connection.close()
+    connection = get_db()
 
     if request.method == 'POST':
         new_status = request.form.get('status')
@@ -1238,7 +1324,6 @@ def update_waiver_status(waiver_id):
             flash("Invalid status option.", "danger")
             return redirect(url_for('update_waiver_status', waiver_id=waiver_id))
 
-        connection = get_db_connection()
         try:
             with connection.cursor(pymysql.cursors.DictCursor) as cursor:
                 # Call the stored procedure UpdateWaiverStatus
@@ -1259,13 +1344,10 @@ def update_waiver_status(waiver_id):
             logger.error(f"Error updating waiver status: {e}")
             flash("Error updating Waiver status, please try again later.", "danger")
             return redirect(url_for('waiver_details', waiver_id=waiver_id))
-        finally:
-            connection.close()
 
         return redirect(url_for('waiver_details', waiver_id=waiver_id))
     else:
         # GET request, display the update form
-        connection = get_db_connection()
         try:
             with connection.cursor(pymysql.cursors.DictCursor) as cursor:
                 cursor.callproc('GetWaiverDetails', (waiver_id,))
@@ -1279,11 +1361,40 @@ def update_waiver_status(waiver_id):
             logger.error(f"Error fetching waiver details for update: {e}")
             flash("Error fetching Waiver details, please try again later.", "danger")
             return redirect(url_for('waiver_list'))
-        finally:
-            connection.close()
 
         return render_template('update_waiver.html', waiver=waiver)
 
+@app.route('/waivers/run', methods=['GET', 'POST'])
+@admin_required("You do not have permission to process waivers.", 'waiver_list')
+def run_waivers_view():
+    """
+    Settle all pending waiver claims of a pickup date window at once (see waivers.py).
+    """
+    form = request.form if request.method == 'POST' else request.args
+    window = {'since': form.get('since', ''), 'until': form.get('until') or datetime.today().date().isoformat()}
+    report = None
+
+    if request.method == 'POST':
+        try:
+            since = datetime.strptime(window['since'], '%Y-%m-%d').date() if window['since'] else None
+            until = datetime.strptime(window['until'], '%Y-%m-%d').date()
+        except ValueError:
+            flash("Dates must be given as YYYY-MM-DD.", "danger")
+        else:
+            connection = get_db()
+            try:
+                report = run_waivers(connection, since, until, dry_run=request.form.get('dry_run') == 'on')
+                if not report['dry_run'] and report['moves']:
+                    players_changed(connection, [move['player_id'] for move in report['moves']])
+                verb = "would be approved" if report['dry_run'] else "approved"
+                flash(f"{report['claims']} pending claims: {report['approved']} {verb}, {report['denied']} denied "
+                      f"in {report['seconds']:.2f}s.", "success")
+            except pymysql.MySQLError as e:
+                logger.error(f"Error processing waivers: {e}")
+                flash("A database error occurred, no waivers were processed.", "danger")
+
+    return render_template('waiver_run.html', window=window, report=report)
+
 
 
 if __name__ == '__main__':
@@ -0,0 +1,163 @@
+import time
+import threading
+from functools import wraps
+
+from flask import g, session, flash, redirect, url_for, current_app
+
+from db import get_db
+
+
+# seconds a role cached in the session is trusted before it is re-read from User
+DEFAULT_ROLE_TTL = 300
+
+# user_id -> wall-clock time of the last role change made by this process
+_invalidated = {}
+_invalidated_lock = threading.Lock()
+
+
+def cache_role(user):
+    """
+    Store a user's role in the session.
+
+    :param user: A row with Position and RoleVersion columns (e.g. the row fetched at login).
+    """
+    session['role'] = user['Position']
+    session['role_version'] = user['RoleVersion']
+    session['role_checked_at'] = time.time()
+    session['is_admin'] = user['Position'] == 'A'
+
+
+def clear_role():
+    for key in ('role', 'role_version', 'role_checked_at', 'is_admin'):
+        session.pop(key, None)
+
+
+def _role_version_changed(connection, user_id):
+    """
+    Compare the session's RoleVersion with the database's, once per request.
+    """
+    if getattr(g, 'role_version_checked', False):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT RoleVersion FROM User WHERE UserID = %s", (user_id,))
+        row = cursor.fetchone()
+    g.role_version_checked = True
+    return row is None or row['RoleVersion'] != session.get('role_version')
+
+
+def _role_is_stale(user_id):
+    checked_at = session.get('role_checked_at')
+    if 'role' not in session or checked_at is None:
+        return True
+    with _invalidated_lock:
+        if checked_at <= _invalidated.get(user_id, 0):
+            return True
+    ttl = current_app.config.get('ROLE_CACHE_TTL', DEFAULT_ROLE_TTL)
+    return time.time() - checked_at > ttl
+
+
+def load_role(connection, user_id):
+    """
+    Read a user's role from the database and cache it in the session.
+
+    :param connection: MySQL connection object.
+    :param user_id: The ID of the logged in user.
+    :return: The user's Position ('U' or 'A'), or None if the user no longer exists.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT Position, RoleVersion FROM User WHERE UserID = %s", (user_id,))
+        user = cursor.fetchone()
+
+    if not user:
+        clear_role()
+        return None
+
+    cache_role(user)
+    g.role_version_checked = True
+    return user['Position']
+
+
+def current_role():
+    """
+    The logged in user's role, served from the session while its stamp is fresh.
+
+    :return: The user's Position ('U' or 'A'), or None if nobody is logged in.
+    """
+    user_id = session.get('user_id')
+    if user_id is None:
+        return None
+    if _role_is_stale(user_id):
+        return load_role(get_db(), user_id)
+    return session['role']
+
+
+def user_is_admin():
+    """
+    Whether the logged in user is an admin. A cached admin role is trusted only while its
+    RoleVersion still matches User.RoleVersion, checked with one primary key read per
+    request, so a demotion made by any process takes effect on the next request.
+    """
+    if current_role() != 'A':
+        return False
+    if _role_version_changed(get_db(), session['user_id']):
+        return load_role(get_db(), session['user_id']) == 'A'
+    return True
+
+
+def invalidate_role(user_id):
+    """
+    Force the next request of the given user (in this process) to re-read their role.
+    Other processes see the bumped RoleVersion: admin checks compare it on every request,
+    other role reads once the cached role's TTL expires.
+    """
+    with _invalidated_lock:
+        _invalidated[user_id] = time.time()
+
+
+def set_user_role(connection, user_id, position):
+    """
+    Change a user's role. The trg_user_role_version trigger bumps RoleVersion.
+
+    :param connection: MySQL connection object.
+    :param user_id: The ID of the user to update.
+    :param position: 'U' for User or 'A' for Admin.
+    """
+    if position not in ('U', 'A'):
+        raise ValueError("Invalid position. Use 'U' or 'A'.")
+
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE User SET Position = %s WHERE UserID = %s", (position, user_id))
+    connection.commit()
+    invalidate_role(user_id)
+
+
+def login_required(message="Please log in first."):
+    """
+    Redirect to the login page unless a user is logged in.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if session.get('user_id') is None:
+                flash(message, "danger")
+                return redirect(url_for('login'))
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def admin_required(message="You do not have permission to perform this action.", endpoint='dashboard',
+                   login_message="Please log in first."):
+    """
+    Only let admins through; other logged in users are redirected to `endpoint`.
+    """
+    def decorator(view):
+        @wraps(view)
+        @login_required(login_message)
+        def wrapper(*args, **kwargs):
+            if not user_is_admin():
+                flash(message, "danger")
+                return redirect(url_for(endpoint))
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
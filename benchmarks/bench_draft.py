@@ -0,0 +1,103 @@
+"""
+Benchmark the set-based draft engine (draft.py) against the StartDraft stored procedure.
+
+For each draft order the script runs StartDraft, records the picks and restores the
+players, then does the same with draft.run_draft, and checks both produced identical
+assignments. Run it against a scratch copy of the database:
+
+    python -m benchmarks.bench_draft --league 1 --repeat 3
+"""
+import sys
+import time
+import argparse
+import datetime
+
+import pymysql
+
+from db import DB_CONFIG
+from draft import run_draft
+
+
+def snapshot_pool(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT PlayerID, TeamID, DraftID, AvaiStatus FROM Player WHERE AvaiStatus = 'A'")
+        return cursor.fetchall()
+
+
+def picks_of(connection, draft_id):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT PlayerID, TeamID FROM Player WHERE DraftID = %s", (draft_id,))
+        return {row['PlayerID']: row['TeamID'] for row in cursor.fetchall()}
+
+
+def restore_pool(connection, snapshot, draft_id):
+    """
+    Put the drafted players back the way they were and remove the draft.
+    """
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            "UPDATE Player SET TeamID = %s, DraftID = %s, AvaiStatus = %s WHERE PlayerID = %s",
+            [(row['TeamID'], row['DraftID'], row['AvaiStatus'], row['PlayerID']) for row in snapshot]
+        )
+        cursor.execute("DELETE FROM Draft WHERE DraftID = %s", (draft_id,))
+    connection.commit()
+
+
+def run_procedure(connection, league_id, draft_date, order):
+    with connection.cursor() as cursor:
+        cursor.callproc('StartDraft', (league_id, draft_date, order))
+        draft_id = cursor.fetchone()['DraftID']
+        while cursor.nextset():
+            pass
+    connection.commit()
+    return draft_id
+
+
+def time_draft(connection, runner, league_id, draft_date, order, repeat):
+    snapshot = snapshot_pool(connection)
+    timings = []
+    picks = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        draft_id = runner(connection, league_id, draft_date, order)
+        timings.append(time.perf_counter() - start)
+        picks = picks_of(connection, draft_id)
+        restore_pool(connection, snapshot, draft_id)
+    return min(timings), picks, len(snapshot)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--league', type=int, default=1, help='LeagueID to draft for')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per variant (best time is reported)')
+    args = parser.parse_args(argv)
+
+    connection = pymysql.connect(**DB_CONFIG)
+    draft_date = datetime.date.today()
+    identical = True
+
+    try:
+        for order in ('R', 'S'):
+            proc_time, proc_picks, pool_size = time_draft(
+                connection, run_procedure, args.league, draft_date, order, args.repeat)
+            engine_time, engine_picks, _ = time_draft(
+                connection, run_draft, args.league, draft_date, order, args.repeat)
+
+            same = proc_picks == engine_picks
+            identical = identical and same
+            speedup = proc_time / engine_time if engine_time else float('inf')
+            print(f"order={order} players={pool_size} "
+                  f"StartDraft={proc_time * 1000:.1f}ms engine={engine_time * 1000:.1f}ms "
+                  f"speedup={speedup:.1f}x picks_identical={same}")
+            if not same:
+                diff = [pid for pid in proc_picks if proc_picks[pid] != engine_picks.get(pid)]
+                print(f"  {len(diff)} picks differ (teams with tied LeagueRanking are ordered "
+                      f"arbitrarily by StartDraft), e.g. PlayerIDs {diff[:10]}")
+    finally:
+        connection.close()
+
+    return 0 if identical else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,143 @@
+"""
+Throughput benchmark for match-event ingestion (ingest.py).
+
+Feeds synthetic events for existing players and matches through EventIngestor and,
+for comparison, through a naive writer that inserts each event and updates
+Player/Team in its own transaction. Benchmark events are tagged with EventType
+'Benchmark', and their points are reverted and the rows deleted at the end. Run it
+against a scratch copy of the database:
+
+    python -m benchmarks.bench_ingest --events 20000 --baseline-events 1000
+"""
+import sys
+import time
+import random
+import argparse
+import datetime
+from decimal import Decimal
+
+import pymysql
+
+from db import DB_CONFIG
+from ids import next_id
+from ingest import EventIngestor, apply_point_deltas
+from standings import refresh_team_standings
+
+
+EVENT_TYPE = 'Benchmark'
+
+
+def make_events(connection, count, seed):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT PlayerID FROM Player")
+        player_ids = [int(row['PlayerID']) for row in cursor.fetchall()]
+        cursor.execute("SELECT MatchID FROM MatchDetail")
+        match_ids = [int(row['MatchID']) for row in cursor.fetchall()]
+    if not player_ids or not match_ids:
+        raise SystemExit("The database needs players and matches to benchmark against.")
+
+    rng = random.Random(seed)
+    return [
+        {
+            'EventType': EVENT_TYPE,
+            'EventTime': datetime.time(0, rng.randrange(60), rng.randrange(60)),
+            'PlayerID': rng.choice(player_ids),
+            'MatchID': rng.choice(match_ids),
+            'ImpactFantasyPoint': Decimal(rng.randrange(-20, 61)) / 10,
+        }
+        for _ in range(count)
+    ]
+
+
+def naive_ingest(connection, events):
+    """
+    One INSERT, two UPDATEs and a commit per event.
+    """
+    with connection.cursor() as cursor:
+        for event in events:
+            cursor.execute("""
+                INSERT INTO MatchEvent (MatchEventID, EventType, EventTime, PlayerID, MatchID, ImpactFantasyPoint)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, (next_id('MatchEvent'), event['EventType'], event['EventTime'], event['PlayerID'],
+                  event['MatchID'], event['ImpactFantasyPoint']))
+            cursor.execute("UPDATE Player SET FantasyPoints = FantasyPoints + %s WHERE PlayerID = %s",
+                           (event['ImpactFantasyPoint'], event['PlayerID']))
+            cursor.execute("""
+                UPDATE Team SET TotalPoints = TotalPoints + %s
+                WHERE TeamID = (SELECT TeamID FROM Player WHERE PlayerID = %s)
+            """, (event['ImpactFantasyPoint'], event['PlayerID']))
+            connection.commit()
+
+
+def pipeline_ingest(events, batch_size, submit_size):
+    ingestor = EventIngestor(batch_size=batch_size, max_pending=max(batch_size * 4, submit_size))
+    try:
+        for start in range(0, len(events), submit_size):
+            ingestor.submit(events[start:start + submit_size], timeout=None)
+        ingestor.flush()
+    finally:
+        ingestor.stop()
+    return ingestor.stats()
+
+
+def clean_up(connection):
+    """
+    Revert the points added by benchmark events and delete them.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT e.PlayerID, p.TeamID, SUM(e.ImpactFantasyPoint) AS Total
+            FROM MatchEvent e
+            JOIN Player p ON p.PlayerID = e.PlayerID
+            WHERE e.EventType = %s
+            GROUP BY e.PlayerID, p.TeamID
+        """, (EVENT_TYPE,))
+        player_deltas = {}
+        team_deltas = {}
+        for row in cursor.fetchall():
+            player_deltas[row['PlayerID']] = -row['Total']
+            if row['TeamID'] is not None:
+                team_deltas[row['TeamID']] = team_deltas.get(row['TeamID'], 0) - row['Total']
+        apply_point_deltas(cursor, 'Player', 'PlayerID', 'FantasyPoints', player_deltas)
+        apply_point_deltas(cursor, 'Team', 'TeamID', 'TotalPoints', team_deltas)
+        refresh_team_standings(cursor, team_deltas)
+        cursor.execute("DELETE FROM MatchEvent WHERE EventType = %s", (EVENT_TYPE,))
+    connection.commit()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=20000, help='events sent through the pipeline')
+    parser.add_argument('--baseline-events', type=int, default=1000, help='events sent through the naive writer (0 to skip)')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--submit-size', type=int, default=200, help='events per submitted batch (one HTTP request)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        events = make_events(connection, max(args.events, args.baseline_events), args.seed)
+
+        if args.baseline_events:
+            start = time.perf_counter()
+            naive_ingest(connection, events[:args.baseline_events])
+            elapsed = time.perf_counter() - start
+            print(f"naive: {args.baseline_events} events in {elapsed:.2f}s "
+                  f"({args.baseline_events / elapsed:.0f} events/s)")
+            clean_up(connection)
+
+        start = time.perf_counter()
+        stats = pipeline_ingest(events[:args.events], args.batch_size, args.submit_size)
+        elapsed = time.perf_counter() - start
+        print(f"pipeline: {stats['written']} events in {elapsed:.2f}s "
+              f"({stats['written'] / elapsed:.0f} events/s, {stats['batches']} batches, "
+              f"{stats['failed']} failed)")
+    finally:
+        clean_up(connection)
+        connection.close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
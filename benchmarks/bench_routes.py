@@ -0,0 +1,283 @@
+"""
+End-to-end latency benchmark of the app's routes.
+
+Every route is driven through Flask's test client against the configured database
+(load one with datagen first). For each route the script reports throughput, p50/p95/p99
+latency and the number of SQL statements per request, and saves the results as JSON.
+A previous results file can be passed with --compare; routes whose p95 grew by more than
+--threshold, or that send more statements than before, are flagged and the script exits 1.
+
+Statements are counted on the pooled request connections, including the hidden ones
+callproc sends; the ID allocator's own connection is not counted. Routes that need a
+login get a session for a team manager (or an admin) without going through /login; the
+/login route itself is measured with a real POST. By default the page and result caches
+stay warm, as in production; --cold empties them before every request.
+
+    python -m benchmarks.bench_routes --requests 200 --out bench_routes.json
+    python -m benchmarks.bench_routes --compare bench_routes.json --threshold 0.2
+"""
+import sys
+import json
+import time
+import argparse
+import datetime
+import threading
+
+import pymysql
+
+from db import DB_CONFIG, ConnectionPool
+
+
+# (name, method, path, login, form); paths are formatted with the sample keys,
+# login is None, 'user' (a team manager) or 'admin'
+ROUTES = [
+    ('players (Name)', 'GET', '/players?order_by=Name', None, None),
+    ('players (Fantasy Points)', 'GET', '/players?order_by=Fantasy+Points', None, None),
+    ('players (Sport)', 'GET', '/players?order_by=Sport', None, None),
+    ('matches (Date)', 'GET', '/matches?sport={sport}&order_by=Date', None, None),
+    ('matches (Team)', 'GET', '/matches?sport={sport}&order_by=Team', None, None),
+    ('match_events', 'GET', '/match_events/{match_id}', None, None),
+    ('trade', 'GET', '/trade', None, None),
+    ('draft', 'GET', '/draft', None, None),
+    ('draft/new', 'GET', '/draft/new', 'user', None),
+    ('start_trade', 'GET', '/start_trade', 'user', None),
+    ('players/search', 'GET', '/players/search?q=jo', None, None),
+    ('waivers', 'GET', '/waivers', 'admin', None),
+    ('player', 'GET', '/player/{player_id}', 'admin', None),
+    ('login', 'POST', '/login', None, {'input_user': '{user_name}', 'input_password': '{password}'}),
+]
+
+
+_counts = threading.local()
+
+
+class CountingConnection(pymysql.connections.Connection):
+    """
+    A connection that counts the statements sent from the current thread.
+    """
+
+    def query(self, sql, unbuffered=False):
+        _counts.statements = getattr(_counts, 'statements', 0) + 1
+        return super().query(sql, unbuffered)
+
+
+class CountingPool(ConnectionPool):
+    def _connect(self):
+        connection = CountingConnection(**self.connect_kwargs)
+        with self._cond:
+            self._created += 1
+        return connection
+
+
+def load_samples(connection):
+    """
+    Pick the keys the routes are called with: a match with events, a player, a team
+    manager and an admin.
+    """
+    queries = {
+        'match': "SELECT MatchID AS match_id FROM MatchEvent ORDER BY MatchEventID LIMIT 1",
+        'player': "SELECT PlayerID AS player_id FROM Player ORDER BY PlayerID LIMIT 1",
+        'user': """
+            SELECT u.UserID AS user_id, u.UserName AS user_name, t.Sport AS sport
+            FROM Team t JOIN User u ON u.UserID = t.Manager
+            ORDER BY t.TeamID LIMIT 1
+        """,
+        'admin': "SELECT UserID AS admin_id, UserName AS admin_name FROM User WHERE Position = 'A' ORDER BY UserID LIMIT 1",
+    }
+    samples = {}
+    with connection.cursor() as cursor:
+        for name, sql in queries.items():
+            cursor.execute(sql)
+            row = cursor.fetchone()
+            if row is None:
+                raise SystemExit(f"No sample row for '{name}'; load a dataset first (see datagen).")
+            samples.update(row)
+    return samples
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an ascending list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def make_client(app, login, samples):
+    client = app.test_client()
+    if login is not None:
+        with client.session_transaction() as session:
+            if login == 'admin':
+                session['user_id'] = samples['admin_id']
+                session['user_name'] = samples['admin_name']
+            else:
+                session['user_id'] = samples['user_id']
+                session['user_name'] = samples['user_name']
+    return client
+
+
+def clear_caches():
+    from utils import match_cache
+    from page_cache import page_cache
+    from pagination import row_counts
+    match_cache.clear()
+    page_cache.clear()
+    row_counts.invalidate()
+
+
+def run_route(app, route, samples, requests, warmup, concurrency, cold):
+    """
+    Send `requests` requests to one route from `concurrency` threads.
+
+    :return: A result dictionary for the route.
+    """
+    name, method, path, login, form = route
+    path = path.format(**samples)
+    data = {key: value.format(**samples) for key, value in form.items()} if form else None
+
+    def send(client):
+        if cold:
+            clear_caches()
+        _counts.statements = 0
+        start = time.perf_counter()
+        response = client.open(path, method=method, data=data)
+        elapsed = time.perf_counter() - start
+        status = response.status_code
+        response.close()
+        return elapsed, _counts.statements, status
+
+    client = make_client(app, login, samples)
+    for _ in range(warmup):
+        send(client)
+
+    latencies, statements, errors = [], [], []
+    lock = threading.Lock()
+    share = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    def worker(count):
+        worker_client = make_client(app, login, samples)
+        for _ in range(count):
+            elapsed, sent, status = send(worker_client)
+            with lock:
+                latencies.append(elapsed)
+                statements.append(sent)
+                if status >= 400:
+                    errors.append(status)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(count,)) for count in share if count]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'name': name,
+        'method': method,
+        'path': path,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'throughput': len(latencies) / wall if wall else 0.0,
+        'mean_ms': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': latencies[-1] * 1000 if latencies else 0.0,
+        'statements': sum(statements) / len(statements) if statements else 0.0,
+        'statements_max': max(statements) if statements else 0,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    :return: Regression messages for routes that got slower or chattier than the baseline.
+    """
+    previous = {result['name']: result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get(result['name'])
+        if before is None:
+            continue
+        if before['p95_ms'] and result['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            regressions.append(f"{result['name']}: p95 {before['p95_ms']:.1f}ms -> {result['p95_ms']:.1f}ms")
+        if result['statements'] > before['statements'] + 0.5:
+            regressions.append(f"{result['name']}: statements {before['statements']:.1f} -> {result['statements']:.1f}")
+        if result['errors'] > before['errors']:
+            regressions.append(f"{result['name']}: errors {before['errors']} -> {result['errors']}")
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100, help='measured requests per route')
+    parser.add_argument('--warmup', type=int, default=5, help='unmeasured requests per route first')
+    parser.add_argument('--concurrency', type=int, default=1, help='client threads per route')
+    parser.add_argument('--cold', action='store_true', help='empty the page and result caches before every request')
+    parser.add_argument('--route', action='append', help='only run routes whose name starts with this (repeatable)')
+    parser.add_argument('--password', default='password', help="the sample user's password, for /login")
+    parser.add_argument('--out', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='a previous results file to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative p95 growth')
+    args = parser.parse_args(argv)
+
+    from app import app
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        samples = load_samples(connection)
+    finally:
+        connection.close()
+    samples['password'] = args.password
+
+    app.config['TESTING'] = True
+    pool = app.extensions['db_pool']
+    app.extensions['db_pool'] = CountingPool(
+        size=max(pool.size, args.concurrency),
+        timeout=pool.timeout,
+        idle_timeout=pool.idle_timeout,
+        health_check_interval=pool.health_check_interval,
+        **pool.connect_kwargs
+    )
+    pool.close_all()
+
+    routes = [route for route in ROUTES
+              if not args.route or any(route[0].startswith(prefix) for prefix in args.route)]
+    results = []
+    try:
+        for route in routes:
+            result = run_route(app, route, samples, args.requests, args.warmup, args.concurrency, args.cold)
+            results.append(result)
+            print(f"{result['name']:26} {result['throughput']:8.1f} req/s  "
+                  f"p50 {result['p50_ms']:7.1f}ms  p95 {result['p95_ms']:7.1f}ms  p99 {result['p99_ms']:7.1f}ms  "
+                  f"{result['statements']:5.1f} stmts" + (f"  {result['errors']} errors" if result['errors'] else ''))
+    finally:
+        app.extensions['db_pool'].close_all()
+
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'cold': args.cold,
+        'samples': {key: value for key, value in samples.items() if key != 'password'},
+        'results': results,
+    }
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, default=str)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
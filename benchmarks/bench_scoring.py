@@ -0,0 +1,88 @@
+"""
+Benchmark the stat parser and the vectorized scoring engine (scoring.py).
+
+Generates synthetic PerformanceStats texts in the formats datagen.py writes, times the
+parser on them, then scores a synthetic stat matrix with scoring.score_players and, for
+comparison, with a plain Python loop over the same rows. Needs no database:
+
+    python -m benchmarks.bench_scoring --rows 1000000 --players 50000
+"""
+import sys
+import time
+import random
+import argparse
+
+import numpy as np
+
+from scoring import SPORTS, STAT_COLUMNS, DEFAULT_RULES, parse_performance, weight_matrix, score_players
+
+
+TEXTS = {
+    'FTB': ('Passed for {a} yards, {b} TDs', 'Caught {a} yards, {b} TD', '{a} yards, {b} TDs, {c} receptions'),
+    'BB': ('Scored {a} points, {b} rebounds, {c} assists', '{a} pts, {b} reb, {c} ast'),
+    'SB': ('Scored {b} goals, {c} assist', 'Made {c} saves, clean sheet', '{b} goals, {a} passes, {c} shots'),
+}
+
+
+def bench_parser(count, rng):
+    texts = []
+    for _ in range(count):
+        sport = rng.choice(SPORTS)
+        texts.append(rng.choice(TEXTS[sport]).format(a=rng.randint(0, 400), b=rng.randint(0, 4), c=rng.randint(0, 10)))
+    start = time.perf_counter()
+    for text in texts:
+        parse_performance(text)
+    return time.perf_counter() - start
+
+
+def loop_scores(player_ids, sport_codes, stats, rules):
+    totals = {}
+    for player_id, code, row in zip(player_ids.tolist(), sport_codes.tolist(), stats.tolist()):
+        weights = rules[SPORTS[code]]
+        points = sum(value * weights.get(column, 0) for column, value in zip(STAT_COLUMNS, row))
+        totals[player_id] = totals.get(player_id, 0) + points
+    return totals
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='stat lines to score')
+    parser.add_argument('--players', type=int, default=50000)
+    parser.add_argument('--parse-rows', type=int, default=100000, help='texts to parse (0 to skip)')
+    parser.add_argument('--loop-rows', type=int, default=100000, help='rows scored by the Python loop (0 to skip)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.parse_rows:
+        elapsed = bench_parser(args.parse_rows, random.Random(args.seed))
+        print(f"parser: {args.parse_rows} texts in {elapsed:.2f}s ({args.parse_rows / elapsed:.0f} texts/s)")
+
+    rng = np.random.default_rng(args.seed)
+    player_ids = rng.integers(1, args.players + 1, args.rows)
+    sport_codes = player_ids % len(SPORTS)
+    stats = rng.integers(0, 50, (args.rows, len(STAT_COLUMNS))).astype(np.int32)
+    weights = weight_matrix(DEFAULT_RULES)
+
+    start = time.perf_counter()
+    players, points = score_players(player_ids, sport_codes, stats, weights)
+    elapsed = time.perf_counter() - start
+    print(f"vectorized: {args.rows} stat lines, {len(players)} players in {elapsed:.3f}s "
+          f"({args.rows / elapsed:.0f} lines/s)")
+
+    if args.loop_rows:
+        count = min(args.loop_rows, args.rows)
+        start = time.perf_counter()
+        totals = loop_scores(player_ids[:count], sport_codes[:count], stats[:count], DEFAULT_RULES)
+        elapsed = time.perf_counter() - start
+        print(f"loop: {count} stat lines in {elapsed:.3f}s ({count / elapsed:.0f} lines/s)")
+
+        check_players, check_points = score_players(player_ids[:count], sport_codes[:count], stats[:count], weights)
+        expected = np.array([totals[player_id] for player_id in check_players.tolist()])
+        if not np.allclose(check_points, expected):
+            print("MISMATCH between vectorized and loop scores", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
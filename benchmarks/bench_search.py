@@ -0,0 +1,87 @@
+"""
+Benchmark the typeahead player search index (player_search.py).
+
+Builds the index from synthetic players (names made of random syllables, real teams drawn
+from a small list) and times typeahead lookups: prefixes of one and two words, words
+found inside names, and searches filtered by Sport and AvaiStatus. Needs no database:
+
+    python -m benchmarks.bench_search --players 500000
+"""
+import sys
+import time
+import random
+import argparse
+
+from player_search import PlayerSearchIndex
+
+
+# names are built from syllables, which gives a vocabulary of realistic size and spread
+SYLLABLES = ('an', 'ar', 'ba', 'bel', 'car', 'da', 'del', 'el', 'fa', 'gar', 'ha', 'in', 'jo', 'ka', 'ki',
+             'la', 'lu', 'ma', 'mi', 'mo', 'na', 'ni', 'o', 'pa', 'ra', 'ri', 'ro', 'sa', 'son', 'ta', 'to',
+             'va', 'vi', 'wa', 'ya', 'zu', 'hn', 'st', 'ck', 'ez', 'ov', 'ski', 'ler', 'man', 'ton', 'sen')
+CITIES = ('Boston', 'Madrid', 'Chicago', 'Lyon', 'Denver', 'Milan', 'Austin', 'Porto', 'Seattle', 'Munich',
+          'Dallas', 'Sevilla', 'Toronto', 'Napoli', 'Phoenix', 'Lisboa', 'Atlanta', 'Bremen', 'Houston', 'Ajaccio')
+MASCOTS = ('Hawks', 'United', 'Bears', 'Rovers', 'Giants', 'City', 'Kings', 'Athletic', 'Storm', 'Wanderers')
+
+
+def make_name(rng, low, high):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(low, high))).capitalize()
+
+
+def make_players(count, rng):
+    first_names = [make_name(rng, 2, 3) for _ in range(5000)]
+    last_names = [make_name(rng, 2, 4) for _ in range(100000)]
+    for player_id in range(1, count + 1):
+        yield {
+            'PlayerID': player_id,
+            'FullName': f"{rng.choice(first_names)} {rng.choice(last_names)}",
+            'RealTeam': f"{rng.choice(CITIES)} {rng.choice(MASCOTS)}",
+            'Sport': rng.choice(('FTB', 'BB', 'SB')),
+            'Position': 'MF',
+            'AvaiStatus': 'A' if rng.random() < 0.3 else 'U',
+            'TeamID': rng.randint(1, count // 15) if rng.random() < 0.7 else None,
+        }
+
+
+def time_queries(index, queries, repeat, **filters):
+    start = time.perf_counter()
+    results = 0
+    for _ in range(repeat):
+        for query in queries:
+            results += len(index.search(query, **filters))
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeat * len(queries)), results / (repeat * len(queries))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=200, help='runs of each query set')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    index = PlayerSearchIndex()
+    start = time.perf_counter()
+    index.load(make_players(args.players, rng))
+    stats = index.stats()
+    print(f"build: {stats['players']} players, {stats['tokens']} tokens, {stats['trigrams']} trigrams "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    cases = [
+        ('one-letter prefix', ['j', 'm', 's', 'k'], {}),
+        ('name prefix', ['joh', 'gar', 'marin', 'kisa'], {}),
+        ('two words', ['jo gar', 'ma s', 'boston ha', 'ki lyon'], {}),
+        ('inside a word', ['sonma', 'arel', 'skiler'], {}),
+        ('no match', ['qqq', 'xylo'], {}),
+        ('filtered', ['jo', 'mil', 'sa'], {'sport': 'BB', 'status': 'A'}),
+        ('team roster', ['', 'a'], {'team_id': 7}),
+    ]
+    for name, queries, filters in cases:
+        per_query, results = time_queries(index, queries, args.repeat, **filters)
+        print(f"{name:18} {per_query * 1e6:8.1f} us/query ({results:.1f} results)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,331 @@
+"""
+EXPLAIN every query and stored procedure the app runs and fail on full table scans.
+
+Stored procedures cannot be EXPLAINed through CALL, so their SELECT and UPDATE bodies are
+listed here with the procedure's parameters filled in; keep them in step with the
+procedure definitions. The paginated listings are captured from GetPlayerPage,
+GetTradePage and GetDraftPage themselves (first page, next page and previous page of
+every sort order).
+
+A plan fails when it reads a table with access type ALL, or scans a whole index without a
+LIMIT, and the optimizer expects at least --min-rows rows. Queries that list a whole
+table by design are marked with the reason they are allowed to scan. Run it against a
+database loaded to benchmark size:
+
+    python -m benchmarks.explain_plans --min-rows 1000
+"""
+import sys
+import json
+import argparse
+
+import pymysql
+
+from db import DB_CONFIG
+from utils import (
+    GetPlayerPage, GetTradePage, GetDraftPage,
+    PLAYER_SORT_KEYS, TRADE_SORT_KEYS, DRAFT_SORT_KEYS,
+)
+
+
+SAMPLE_QUERIES = {
+    'user': "SELECT UserID, UserName, Email FROM User ORDER BY UserID LIMIT 1",
+    'team': "SELECT TeamID, TeamName, Manager, LeagueID, Sport FROM Team ORDER BY TeamID LIMIT 1",
+    'commissioner': "SELECT Commissioner FROM League WHERE Commissioner IS NOT NULL ORDER BY LeagueID LIMIT 1",
+    'player': "SELECT PlayerID FROM Player ORDER BY PlayerID LIMIT 1",
+    'draft': "SELECT DraftID FROM Draft ORDER BY DraftID LIMIT 1",
+    'match': "SELECT MatchID FROM MatchDetail ORDER BY MatchID LIMIT 1",
+    'waiver': "SELECT WaiverID FROM Waiver ORDER BY WaiverID LIMIT 1",
+}
+
+
+def load_samples(connection):
+    """
+    Pick existing keys to use as query parameters, so the optimizer sees real values.
+    """
+    samples = {}
+    with connection.cursor() as cursor:
+        for name, sql in SAMPLE_QUERIES.items():
+            cursor.execute(sql)
+            row = cursor.fetchone()
+            if row is None:
+                raise SystemExit(f"No sample row for '{name}'; load a dataset first (see datagen).")
+            samples.update({f'{name}_{column}'.lower(): value for column, value in row.items()})
+    return samples
+
+
+def app_queries(s):
+    """
+    The statements the app runs directly, as (name, sql, params, allowed_scan_reason).
+    """
+    return [
+        ('login', "SELECT UserID, UserName, Pwd, Position, RoleVersion FROM User WHERE Email = %s OR UserName = %s",
+         (s['user_username'], s['user_username']), None),
+        ('auth role check', "SELECT Position, RoleVersion FROM User WHERE UserID = %s", (s['user_userid'],), None),
+        ('auth role version', "SELECT RoleVersion FROM User WHERE UserID = %s", (s['user_userid'],), None),
+        ('create_team league', "SELECT LeagueID, MaxNumber FROM League WHERE LeagueID = %s AND Sport = %s",
+         (s['team_leagueid'], s['team_sport']), None),
+        ('create_team name check', "SELECT * FROM Team WHERE TeamName = %s AND LeagueID = %s",
+         (s['team_teamname'], s['team_leagueid']), None),
+        ('create_team league list', "SELECT LeagueID, LeagueName, Sport FROM League", (),
+         'the form lists every league'),
+        ('start_trade buyer team', "SELECT TeamID, TeamName FROM Team WHERE Manager = %s", (s['team_manager'],), None),
+        ('start_trade seller teams', "SELECT TeamID, TeamName FROM Team WHERE TeamID != %s", (s['team_teamid'],),
+         'the form lists every other team'),
+        ('player search fallback', """
+            SELECT PlayerID, FullName, RealTeam, Sport, Position, AvaiStatus, TeamID FROM Player
+            WHERE (FullName LIKE %s OR RealTeam LIKE %s) AND Sport = %s AND AvaiStatus = %s
+            ORDER BY FullName
+            LIMIT %s
+        """, ('Jo%', 'Jo%', s['team_sport'], 'A', 10),
+         'only while the in-process search index is being built; RealTeam prefixes are not indexed'),
+        ('start_trade buyer players', """
+            SELECT p.PlayerID, p.FullName, p.RealTeam
+            FROM Player p
+            WHERE p.TeamID = %s AND p.AvaiStatus = 'A'
+        """, (s['team_teamid'],), None),
+        ('new_draft league list', "SELECT LeagueID, LeagueName, LeagueType FROM League ORDER BY LeagueName ASC", (),
+         'the form lists every league'),
+        ('draft_detail draft', """
+            SELECT Draft.DraftID, Draft.DraftDate, Draft.DraftOrder, Draft.DraftStatus, League.LeagueName, League.LeagueType
+            FROM Draft JOIN League ON Draft.LeagueID = League.LeagueID
+            WHERE Draft.DraftID = %s
+        """, (s['draft_draftid'],), None),
+        ('draft_detail players', """
+            SELECT Player.PlayerID, Player.FullName, Player.Position, Player.FantasyPoints, Team.TeamName
+            FROM Player JOIN Team ON Player.TeamID = Team.TeamID
+            WHERE Player.DraftID = %s
+            ORDER BY Team.TeamName ASC, Player.FantasyPoints DESC
+        """, (s['draft_draftid'],), None),
+        ('run_draft teams', "SELECT TeamID, LeagueRanking FROM Team WHERE LeagueID = %s", (s['team_leagueid'],), None),
+        ('run_draft pool', "SELECT PlayerID FROM Player WHERE AvaiStatus = 'A' ORDER BY PlayerID FOR UPDATE", (),
+         None),
+        ('player count', "SELECT COUNT(*) AS count FROM Player", (),
+         'counted at most once per CountCache period'),
+        ('row counter', "SELECT COALESCE(SUM(Total), 0) AS count FROM RowCounter WHERE Name = %s", ('PlayerTrade',), None),
+        ('table versions', "SELECT Name, SUM(Version) AS Version FROM TableVersion WHERE Name IN (%s, %s) GROUP BY Name",
+         ('MatchDetail', 'MatchTeam'), None),
+        ('archive player stats', "SELECT StatsID FROM PlayerStats WHERE PlayerID IN (%s) LIMIT 1000 FOR UPDATE",
+         (s['player_playerid'],), None),
+        ('archive player events', "SELECT MatchEventID FROM MatchEvent WHERE PlayerID IN (%s) LIMIT 1000 FOR UPDATE",
+         (s['player_playerid'],), None),
+        ('archive player trades', "SELECT TradeID, PlayerID FROM PlayerTrade WHERE PlayerID IN (%s) LIMIT 1000 FOR UPDATE",
+         (s['player_playerid'],), None),
+        ('archive player waivers', "SELECT WaiverID FROM Waiver WHERE PlayerID IN (%s) LIMIT 1000 FOR UPDATE",
+         (s['player_playerid'],), None),
+        ('archive player selection', """
+            SELECT PlayerID FROM Player WHERE Sport = %s AND AvaiStatus = %s AND RealTeam = %s ORDER BY PlayerID
+        """, (s['team_sport'], 'U', 'Boston Rams'), None),
+        ('trade player locks', """
+            SELECT PlayerID, TeamID, AvaiStatus, Sport, FantasyPoints FROM Player
+            WHERE PlayerID IN (%s, %s) ORDER BY PlayerID FOR UPDATE
+        """, (s['player_playerid'], s['player_playerid']), None),
+        ('trade team locks', """
+            SELECT TeamID, Manager, Sport FROM Team
+            WHERE TeamID IN (%s, %s) ORDER BY TeamID FOR UPDATE
+        """, (s['team_teamid'], s['team_teamid']), None),
+        ('trade player move', "UPDATE Player SET TeamID = TeamID, AvaiStatus = AvaiStatus WHERE PlayerID = %s",
+         (s['player_playerid'],), None),
+    ]
+
+
+MATCHES_SELECT = """
+    SELECT MatchID, MatchDate, FinalScore, Winner, HomeTeamName AS HomeTeam, AwayTeamName AS AwayTeam
+    FROM MatchSummary
+    WHERE Sport = %s
+"""
+
+LEAGUE_RANKINGS_SELECT = """
+    SELECT L.LeagueID, L.LeagueName, L.LeagueType, L.Commissioner, L.MaxNumber, L.DraftDate,
+           T.TeamID, T.TeamName, T.Manager, T.TotalPoints, T.LeagueRanking
+    FROM League AS L JOIN Team AS T ON L.LeagueID = T.LeagueID
+    WHERE L.LeagueType = %s AND L.Commissioner = %s
+    ORDER BY L.LeagueID, T.LeagueRanking
+"""
+
+MATCH_EVENTS_SELECT = """
+    SELECT PlayerID, EventType, EventTime, ImpactFantasyPoint
+    FROM MatchEvent
+    WHERE MatchID = %s
+"""
+
+
+def procedure_queries(s):
+    """
+    The bodies of the stored procedures the app calls, as (name, sql, params, allowed_scan_reason).
+    """
+    return [
+        ('GetUserPublicLeaguesAndTeamRankings', LEAGUE_RANKINGS_SELECT, ('P', s['commissioner_commissioner']), None),
+        ('GetUserPrivateLeaguesAndTeamRankings', LEAGUE_RANKINGS_SELECT, ('R', s['commissioner_commissioner']), None),
+        ('GetUserTeams', """
+            SELECT t.TeamID, t.TeamName, t.LeagueID, l.LeagueName, t.TotalPoints, t.LeagueRanking, t.TeamStatus
+            FROM Team t JOIN League l ON t.LeagueID = l.LeagueID
+            WHERE t.Manager = %s
+        """, (s['team_manager'],), None),
+        ('GetTeamInfoByName', """
+            SELECT t.TeamID, t.TeamName, t.LeagueID, l.LeagueName, l.LeagueType, l.DraftDate, t.Manager,
+                   u.FullName AS ManagerName, u.Email AS ManagerEmail, t.TotalPoints, t.LeagueRanking, t.TeamStatus
+            FROM Team t
+            JOIN League l ON t.LeagueID = l.LeagueID
+            JOIN User u ON t.Manager = u.UserID
+            WHERE t.TeamName = %s
+        """, (s['team_teamname'],), None),
+        ('GetMatches (Date)', MATCHES_SELECT + " ORDER BY MatchDate DESC",
+         (s['team_sport'],), 'the page lists every match of the sport'),
+        ('GetMatches (Team)', MATCHES_SELECT + " ORDER BY HomeTeamName ASC, AwayTeamName ASC",
+         (s['team_sport'],), 'the page lists every match of the sport'),
+        ('RefreshMatchSummary', "SELECT * FROM MatchSummarySource WHERE MatchID = %s", (s['match_matchid'],), None),
+        ('MatchSummary team rename', "UPDATE MatchSummary SET AwayTeamName = AwayTeamName WHERE AwayTeamID = %s",
+         (s['team_teamid'],), None),
+        ('GetMatchEvents (Time)', MATCH_EVENTS_SELECT + " ORDER BY EventTime", (s['match_matchid'],), None),
+        ('GetMatchEvents (Player)', MATCH_EVENTS_SELECT + " ORDER BY PlayerID", (s['match_matchid'],), None),
+        ('GetPlayerDetails', """
+            SELECT p.PlayerID, p.FullName, p.PhotoURL, p.Position, p.RealTeam, p.FantasyPoints, p.AvaiStatus,
+                   GROUP_CONCAT(ps.GameDate ORDER BY ps.GameDate DESC SEPARATOR ', ') AS GameDates
+            FROM Player p LEFT JOIN PlayerStats ps ON p.PlayerID = ps.PlayerID
+            WHERE p.PlayerID = %s
+            GROUP BY p.PlayerID, p.FullName, p.PhotoURL, p.Position, p.RealTeam, p.FantasyPoints, p.AvaiStatus
+        """, (s['player_playerid'],), None),
+        ('GetWaiverPlayers', """
+            SELECT w.WaiverID, p.PlayerID, p.FullName, p.Sport, p.FantasyPoints
+            FROM Player p JOIN Waiver w ON p.PlayerID = w.PlayerID
+            WHERE w.WaiverStatus = 'P'
+            ORDER BY p.FullName ASC
+        """, (), None),
+        ('GetWaiverDetails', """
+            SELECT w.WaiverID, w.TeamID, w.PlayerID, w.WaiverStatus, w.WaiverPickupDate
+            FROM Waiver w WHERE w.WaiverID = %s
+        """, (s['waiver_waiverid'],), None),
+        ('waiver run claims', """
+            SELECT WaiverID, TeamID, PlayerID, WaiverPickupDate FROM Waiver
+            WHERE WaiverStatus = 'P' AND WaiverPickupDate >= %s AND WaiverPickupDate <= %s
+            ORDER BY WaiverID
+        """, ('2024-03-01', '2024-03-07'), None),
+        ('UpdateWaiverStatus', "UPDATE Waiver SET WaiverStatus = WaiverStatus WHERE WaiverID = %s",
+         (s['waiver_waiverid'],), None),
+    ]
+
+
+class _RecordingCursor:
+    """
+    Passes everything through to a real cursor and records each executed statement.
+    """
+
+    def __init__(self, cursor, statements):
+        self._cursor = cursor
+        self._statements = statements
+
+    def execute(self, query, args=None):
+        self._statements.append(self._cursor.mogrify(query, args))
+        return self._cursor.execute(query, args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+
+class _RecordingConnection:
+    def __init__(self, connection):
+        self._connection = connection
+        self.statements = []
+
+    def cursor(self, *args):
+        return _RecordingCursor(self._connection.cursor(*args), self.statements)
+
+
+def paged_queries(connection):
+    """
+    Capture the SQL of the first, next and previous page of every paginated listing.
+    """
+    listings = [
+        ('players page', GetPlayerPage, PLAYER_SORT_KEYS),
+        ('trade page', GetTradePage, TRADE_SORT_KEYS),
+        ('draft page', GetDraftPage, DRAFT_SORT_KEYS),
+    ]
+    queries = []
+    for label, get_page, sort_keys in listings:
+        for order_by in sort_keys:
+            recorder = _RecordingConnection(connection)
+            page = get_page(recorder, order_by)
+            if page['next_cursor']:
+                page = get_page(recorder, order_by, after=page['next_cursor'])
+                if page['prev_cursor']:
+                    get_page(recorder, order_by, before=page['prev_cursor'])
+            for sql, direction in zip(recorder.statements, ('first', 'next', 'previous')):
+                queries.append((f'{label} ({order_by}, {direction})', sql, None, None))
+    return queries
+
+
+def full_scans(plan, sql, min_rows):
+    """
+    The plan rows that read a whole table (or a whole index without a LIMIT to stop early).
+    """
+    limited = 'LIMIT' in sql.upper()
+    scans = []
+    for row in plan:
+        table = row.get('table') or ''
+        if table.startswith('<'):
+            # derived tables and unions are materialized from plans listed separately
+            continue
+        access = row.get('type')
+        if access == 'ALL' or (access == 'index' and not limited):
+            if int(row.get('rows') or 0) >= min_rows:
+                scans.append({'table': table, 'type': access, 'rows': int(row['rows'])})
+    return scans
+
+
+def check(connection, queries, min_rows):
+    results = []
+    with connection.cursor() as cursor:
+        for name, sql, params, allowed in queries:
+            cursor.execute('EXPLAIN ' + sql, params)
+            plan = cursor.fetchall()
+            scans = full_scans(plan, sql, min_rows)
+            results.append({
+                'name': name,
+                'scans': scans,
+                'allowed': allowed,
+                'failed': bool(scans) and not allowed,
+                'plan': [{key: value for key, value in row.items() if value is not None} for row in plan],
+            })
+    # EXPLAIN of UPDATE/DELETE changes nothing, but don't leave a transaction open
+    connection.rollback()
+    return results
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--min-rows', type=int, default=1000,
+                        help='estimated rows at which a full scan fails the check')
+    parser.add_argument('--json', action='store_true', help='print the plans as JSON')
+    args = parser.parse_args(argv)
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        samples = load_samples(connection)
+        queries = app_queries(samples) + procedure_queries(samples) + paged_queries(connection)
+        results = check(connection, queries, args.min_rows)
+    finally:
+        connection.close()
+
+    failed = [result for result in results if result['failed']]
+    if args.json:
+        print(json.dumps({'min_rows': args.min_rows, 'results': results}, indent=2, default=str))
+    else:
+        for result in results:
+            status = 'FAIL' if result['failed'] else ('scan' if result['scans'] else 'ok')
+            print(f"{status:5} {result['name']}")
+            for scan in result['scans']:
+                print(f"        {scan['type']} on {scan['table']} (~{scan['rows']} rows)"
+                      + (f" allowed: {result['allowed']}" if result['allowed'] else ''))
+        print(f"{len(results)} queries, {len(failed)} with unexpected full scans.")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,280 @@
+"""
+Concurrency stress test of trade execution (trades.py).
+
+Worker threads, each on its own connection, trade players between a small set of teams
+of one sport as fast as they can. Every worker picks its trades from its own, possibly
+stale, view of the rosters, so many trades target the same players and teams at once and
+some are rejected because a player has already moved. Afterwards the script checks that
+no player was lost or duplicated:
+
+  - every team still has as many players as before (trades are one for one), and the
+    teams together hold exactly the players they started with;
+  - every committed trade has one Trade row, two PlayerTrade rows and two TeamTrade rows;
+  - every player's committed moves chain up: for each team, the moves into it and out of
+    it balance, except for the team the player started on and the one it ended on.
+  - the teams' TotalPoints add up to the same sum as before, and each team's TotalPoints
+    moved by the FantasyPoints of the players it gained minus those it lost.
+
+It writes to the configured database (load one with datagen first) and exits 1 when a
+check fails. --procedure runs the same load through the old ExecuteTrade procedure for
+comparison.
+
+    python -m benchmarks.stress_trades --teams 6 --workers 8 --trades 400
+"""
+import sys
+import time
+import random
+import argparse
+import datetime
+import threading
+from collections import Counter, defaultdict
+
+import pymysql
+
+from db import DB_CONFIG
+from ids import next_id
+from trades import execute_trade, TradeError
+
+
+def pick_teams(connection, sport, count):
+    """
+    :return: {TeamID: Manager} for `count` managed teams of the sport with the most
+        available players.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT t.TeamID, t.Manager FROM Team t
+            JOIN Player p ON p.TeamID = t.TeamID AND p.AvaiStatus = 'A'
+            WHERE t.Sport = %s AND t.Manager IS NOT NULL
+            GROUP BY t.TeamID, t.Manager
+            HAVING COUNT(*) >= 2
+            ORDER BY COUNT(*) DESC, t.TeamID
+            LIMIT %s
+        """, (sport, count))
+        return {int(row['TeamID']): int(row['Manager']) for row in cursor.fetchall()}
+
+
+def rosters(connection, team_ids):
+    """
+    :return: {PlayerID: (TeamID, AvaiStatus)} for the players of the teams.
+    """
+    placeholders = ', '.join(['%s'] * len(team_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT PlayerID, TeamID, AvaiStatus FROM Player WHERE TeamID IN ({placeholders})",
+                       sorted(team_ids))
+        return {int(row['PlayerID']): (int(row['TeamID']), row['AvaiStatus']) for row in cursor.fetchall()}
+
+
+def team_points(connection, team_ids):
+    """
+    :return: {TeamID: TotalPoints} for the teams.
+    """
+    placeholders = ', '.join(['%s'] * len(team_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT TeamID, TotalPoints FROM Team WHERE TeamID IN ({placeholders})", sorted(team_ids))
+        return {int(row['TeamID']): row['TotalPoints'] or 0 for row in cursor.fetchall()}
+
+
+def player_points(connection, player_ids):
+    """
+    :return: {PlayerID: FantasyPoints} for the players.
+    """
+    placeholders = ', '.join(['%s'] * len(player_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT PlayerID, FantasyPoints FROM Player WHERE PlayerID IN ({placeholders})",
+                       sorted(player_ids))
+        return {int(row['PlayerID']): row['FantasyPoints'] or 0 for row in cursor.fetchall()}
+
+
+def procedure_trade(connection, user_id, seller_team_id, player_id, your_player_id, trade_date):
+    trade_id = next_id('Trade')
+    with connection.cursor() as cursor:
+        cursor.callproc('ExecuteTrade', (user_id, seller_team_id, player_id, your_player_id, trade_date, trade_id))
+    connection.commit()
+    return {'TradeID': trade_id, 'Attempts': 1}
+
+
+class Worker(threading.Thread):
+
+    def __init__(self, teams, budget, seed, use_procedure):
+        super().__init__(daemon=True)
+        self.teams = teams
+        self.budget = budget
+        self.rng = random.Random(seed)
+        self.trade = procedure_trade if use_procedure else execute_trade
+        self.committed = []  # (TradeID, wanted player, seller team, offered player, buyer team)
+        self.rejected = 0
+        self.retries = 0
+        self.errors = []
+
+    def run(self):
+        connection = pymysql.connect(**DB_CONFIG)
+        try:
+            view = rosters(connection, self.teams)
+            today = datetime.date.today()
+            while self.budget.take():
+                buyer, seller = self.rng.sample(sorted(self.teams), 2)
+                offered = [p for p, (team, status) in view.items() if team == buyer and status == 'A']
+                wanted = [p for p, (team, status) in view.items() if team == seller and status == 'A']
+                if not offered or not wanted:
+                    connection.rollback()  # read past this connection's snapshot
+                    view = rosters(connection, self.teams)
+                    continue
+                player_id, your_player_id = self.rng.choice(wanted), self.rng.choice(offered)
+                try:
+                    result = self.trade(connection, self.teams[buyer], seller, player_id, your_player_id, today)
+                except TradeError:
+                    self.rejected += 1
+                    view = rosters(connection, self.teams)
+                    continue
+                except pymysql.MySQLError as e:
+                    connection.rollback()
+                    self.errors.append(str(e))
+                    continue
+                self.retries += result['Attempts'] - 1
+                self.committed.append((result['TradeID'], player_id, seller, your_player_id, buyer))
+                # only this worker's own trades are applied; other workers' stay unseen
+                view[player_id] = (buyer, 'U')
+                view[your_player_id] = (seller, 'A')
+        finally:
+            connection.close()
+
+
+class Budget:
+    """
+    Trade attempts shared by the workers.
+    """
+
+    def __init__(self, count):
+        self.count = count
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            if self.count <= 0:
+                return False
+            self.count -= 1
+            return True
+
+
+def check(connection, teams, before, points_before, committed):
+    """
+    :param points_before: {TeamID: TotalPoints} before the run.
+    :return: A list of failed checks.
+    """
+    failures = []
+    after = rosters(connection, teams)
+
+    if set(after) != set(before):
+        lost, extra = set(before) - set(after), set(after) - set(before)
+        failures.append(f"player set changed: {len(lost)} lost, {len(extra)} gained")
+    sizes_before = Counter(team for team, _ in before.values())
+    sizes_after = Counter(team for team, _ in after.values())
+    for team in teams:
+        if sizes_before[team] != sizes_after[team]:
+            failures.append(f"team {team} has {sizes_after[team]} players, had {sizes_before[team]}")
+
+    trade_ids = [trade[0] for trade in committed]
+    if len(set(trade_ids)) != len(trade_ids):
+        failures.append("a TradeID was used twice")
+    if trade_ids:
+        placeholders = ', '.join(['%s'] * len(trade_ids))
+        with connection.cursor() as cursor:
+            for table in ('Trade', 'PlayerTrade', 'TeamTrade'):
+                cursor.execute(f"SELECT TradeID, COUNT(*) AS n FROM {table} WHERE TradeID IN ({placeholders}) "
+                               f"GROUP BY TradeID", trade_ids)
+                counts = {int(row['TradeID']): row['n'] for row in cursor.fetchall()}
+                expected = 1 if table == 'Trade' else 2
+                wrong = [trade_id for trade_id in trade_ids if counts.get(trade_id) != expected]
+                if wrong:
+                    failures.append(f"{len(wrong)} trades without {expected} {table} row(s), e.g. {wrong[0]}")
+
+    # every committed move of a player, as flow between teams
+    balance = defaultdict(Counter)
+    for _, player_id, seller, your_player_id, buyer in committed:
+        balance[player_id][seller] -= 1
+        balance[player_id][buyer] += 1
+        balance[your_player_id][buyer] -= 1
+        balance[your_player_id][seller] += 1
+    broken = 0
+    for player_id, flow in balance.items():
+        expected = Counter()
+        start, end = before[player_id][0], after.get(player_id, (None, None))[0]
+        if start != end:
+            expected[start] -= 1
+            expected[end] += 1
+        if {team: n for team, n in flow.items() if n} != {team: n for team, n in expected.items() if n}:
+            broken += 1
+    if broken:
+        failures.append(f"{broken} players whose committed moves do not chain from their first to their last team")
+
+    # points follow the players; nothing else writes them during the run
+    points_after = team_points(connection, teams)
+    if sum(points_after.values()) != sum(points_before.values()):
+        failures.append(f"team points sum to {sum(points_after.values())}, was {sum(points_before.values())}")
+    if after:
+        points = player_points(connection, after)
+        expected = Counter()
+        for player_id, (team, _) in after.items():
+            start = before.get(player_id, (None, None))[0]
+            if start != team:
+                expected[team] += points[player_id]
+                expected[start] -= points[player_id]
+        drifted = [team for team in teams if points_after[team] - points_before[team] != expected[team]]
+        if drifted:
+            failures.append(f"{len(drifted)} teams whose TotalPoints did not move with their players, "
+                            f"e.g. team {drifted[0]}")
+    return failures
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sport', default='BB', choices=('FTB', 'BB', 'SB'))
+    parser.add_argument('--teams', type=int, default=6, help='teams to trade between (fewer means more conflicts)')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--trades', type=int, default=400, help='trade attempts across all workers')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--procedure', action='store_true', help='trade through the ExecuteTrade procedure')
+    args = parser.parse_args(argv)
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        teams = pick_teams(connection, args.sport, args.teams)
+        if len(teams) < 2:
+            print(f"Need at least two managed {args.sport} teams with available players; load a dataset first.",
+                  file=sys.stderr)
+            return 1
+        before = rosters(connection, teams)
+        points_before = team_points(connection, teams)
+
+        budget = Budget(args.trades)
+        workers = [Worker(teams, budget, args.seed + n, args.procedure) for n in range(args.workers)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        committed = [trade for worker in workers for trade in worker.committed]
+        errors = [error for worker in workers for error in worker.errors]
+        print(f"{len(teams)} teams, {args.workers} workers: {len(committed)} trades committed, "
+              f"{sum(w.rejected for w in workers)} rejected as stale, {sum(w.retries for w in workers)} retries, "
+              f"{len(errors)} errors in {elapsed:.2f}s ({len(committed) / elapsed:.0f} trades/s)")
+        for error in errors[:5]:
+            print(f"  error: {error}")
+
+        connection.commit()  # end the snapshot read before the workers ran
+        failures = check(connection, teams, before, points_before, committed)
+    finally:
+        connection.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    if not failures:
+        print("OK: no player lost or duplicated, team points moved with the players")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
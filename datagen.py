@@ -0,0 +1,501 @@
+"""
+Deterministic synthetic FSL data for scale testing.
+
+Generates Users, public and private Leagues across FTB/BB/SB, Teams, Drafts, Players,
+MatchDetail/MatchTeam pairs, MatchEvents, PlayerStats, Trades and Waivers with consistent
+keys: every foreign key points at a generated row, rosters only hold players of the team's
+sport, matches pair two teams of one league, and events belong to players of the two
+teams in the match. The same --seed and --scale always produce the same rows.
+
+Rows are written with multi-row INSERTs, or with LOAD DATA LOCAL INFILE when --load-data
+is given (the server must allow local_infile). Foreign key and unique checks are switched
+off for the loading session, since the generator guarantees both, and so are the per-row
+AFTER INSERT triggers (@fsl_bulk_load, migrations/015_bulk_load_trigger_switch.sql), whose
+points, counters, versions and match summaries finish() rebuilds in bulk.
+
+Derived data is rebuilt at the end: player points are the sum of their match events, team
+points the sum of their players, then the match summaries, league standings, ID sequences
+and row counters.
+Every user's password is 'password'; user1 is an admin.
+
+    python datagen.py --reset                   # about 10 million rows
+    python datagen.py --reset --scale 0.01      # a small development database
+    python datagen.py --reset --load-data --seed 7
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import datetime
+import tempfile
+from itertools import islice
+
+import pymysql
+from werkzeug.security import generate_password_hash
+
+from db import DB_CONFIG
+from player_import import PLAYER_POSITIONS
+from standings import rebuild_standings
+
+
+# row counts at --scale 1; teams, drafts, match sides and trade legs follow from these
+BASE_COUNTS = {
+    'User': 50000,
+    'League': 2000,
+    'Player': 400000,
+    'MatchDetail': 100000,
+    'MatchEvent': 4500000,
+    'PlayerStats': 4000000,
+    'Trade': 150000,
+    'Waiver': 150000,
+}
+
+SPORTS = ('FTB', 'BB', 'SB')
+ROSTER_SIZE = 15
+TEAMS_PER_LEAGUE = (8, 12)
+SEASON_START = datetime.date(2024, 1, 1)
+SEASON_DAYS = 365
+DEFAULT_PASSWORD = 'password'
+
+# tables in load order, and the order they are emptied by --reset
+TABLES = ('User', 'League', 'Team', 'Draft', 'Player', 'MatchDetail', 'MatchTeam', 'MatchEvent',
+          'PlayerStats', 'Trade', 'PlayerTrade', 'TeamTrade', 'Waiver')
+
+# tables not generated but keyed to generated rows, emptied by --reset as well: parsed stat
+# lines (011) would otherwise match reused StatsIDs, and archives (010) reused PlayerIDs
+DERIVED_TABLES = ('PlayerStatLine', 'PlayerArchive', 'PlayerStatsArchive', 'MatchEventArchive',
+                  'PlayerTradeArchive', 'WaiverArchive')
+
+# IdSequence name -> (table, key column)
+SEQUENCE_KEYS = {
+    'League': ('League', 'LeagueID'),
+    'Team': ('Team', 'TeamID'),
+    'Trade': ('Trade', 'TradeID'),
+    'User': ('User', 'UserID'),
+    'Player': ('Player', 'PlayerID'),
+    'Waiver': ('Waiver', 'WaiverID'),
+    'PlayerStats': ('PlayerStats', 'StatsID'),
+    'MatchEvent': ('MatchEvent', 'MatchEventID'),
+    'Draft': ('Draft', 'DraftID'),
+}
+
+FIRST_NAMES = ('James', 'Maria', 'Wei', 'Aisha', 'Lucas', 'Sofia', 'Kenji', 'Fatima', 'Diego', 'Emma',
+               'Noah', 'Olivia', 'Mateo', 'Amara', 'Leo', 'Yuki', 'Omar', 'Chloe', 'Ivan', 'Priya',
+               'Hugo', 'Zara', 'Elias', 'Mei', 'Samuel', 'Lena', 'Tariq', 'Nina', 'Felix', 'Ines')
+LAST_NAMES = ('Smith', 'Garcia', 'Wang', 'Okafor', 'Silva', 'Rossi', 'Tanaka', 'Haddad', 'Lopez', 'Muller',
+              'Johnson', 'Kim', 'Novak', 'Mensah', 'Dubois', 'Sato', 'Khan', 'Martin', 'Petrov', 'Patel',
+              'Costa', 'Ahmed', 'Berg', 'Chen', 'Walker', 'Fischer', 'Nasser', 'Ivanova', 'Moreau', 'Reyes')
+CITIES = ('Boston', 'Denver', 'Austin', 'Seattle', 'Miami', 'Chicago', 'Portland', 'Phoenix', 'Detroit',
+          'Atlanta', 'Houston', 'Oakland', 'Toronto', 'Madrid', 'Lyon', 'Milan', 'Porto', 'Leeds')
+MASCOTS = {
+    'FTB': ('Rams', 'Hawks', 'Bears', 'Titans', 'Chargers', 'Raiders'),
+    'BB': ('Suns', 'Bulls', 'Heat', 'Kings', 'Nets', 'Rockets'),
+    'SB': ('United', 'City', 'Rovers', 'Athletic', 'Wanderers', 'FC'),
+}
+LEAGUE_WORDS = ('Premier', 'Weekend', 'Office', 'Champions', 'Classic', 'Legends', 'Rookie', 'Elite')
+TEAM_WORDS = ('Thunder', 'Blaze', 'Comets', 'Giants', 'Sharks', 'Falcons', 'Storm', 'Vipers', 'Wolves')
+
+# event type -> typical fantasy impact, per sport
+EVENT_TYPES = {
+    'FTB': (('Touchdown', 6.0), ('Field Goal', 3.0), ('Passing Yards', 1.0), ('Rushing Yards', 1.0),
+            ('Interception', -2.0), ('Fumble', -2.0)),
+    'BB': (('Three Pointer', 3.0), ('Field Goal', 2.0), ('Free Throw', 1.0), ('Rebound', 1.2),
+           ('Assist', 1.5), ('Block', 3.0), ('Turnover', -1.0)),
+    'SB': (('Goal', 5.0), ('Assist', 3.0), ('Save', 1.0), ('Clean Sheet', 4.0),
+           ('Yellow Card', -1.0), ('Red Card', -3.0)),
+}
+PERFORMANCE_STATS = {
+    'FTB': '{a} yards, {b} TDs, {c} receptions',
+    'BB': '{a} pts, {b} reb, {c} ast',
+    'SB': '{b} goals, {a} passes, {c} shots',
+}
+
+
+def scaled_counts(scale):
+    return {name: max(1, round(count * scale)) for name, count in BASE_COUNTS.items()}
+
+
+class SyntheticFSL:
+    """
+    The shape of a generated database and the row generators for each table.
+
+    Keys are assigned contiguously: the teams of a league and the rostered players of a team
+    are consecutive IDs, so only their first ID and count are kept in memory. Every table
+    draws from its own random stream, seeded from the seed and the table name.
+
+    :param counts: Row counts per table, see BASE_COUNTS.
+    :param seed: The random seed.
+    """
+
+    def __init__(self, counts, seed):
+        self.counts = counts
+        self.seed = seed
+        rng = self.rng('shape')
+
+        self.league_sport = [SPORTS[i % len(SPORTS)] for i in range(counts['League'])]
+        self.league_size = [rng.randint(*TEAMS_PER_LEAGUE) for _ in range(counts['League'])]
+        self.league_first_team = []
+        team_sport, team_league = [], []
+        for league, size in enumerate(self.league_size):
+            self.league_first_team.append(len(team_sport) + 1)
+            team_sport.extend([self.league_sport[league]] * size)
+            team_league.extend([league + 1] * size)
+        self.team_sport = team_sport
+        self.team_league = team_league
+
+        # rostered players first (ROSTER_SIZE per team, in team order), then free agents
+        self.rostered = len(team_sport) * ROSTER_SIZE
+        counts['Player'] = max(counts['Player'], self.rostered)
+        self.free_agents = {sport: [] for sport in SPORTS}
+        for player_id in range(self.rostered + 1, counts['Player'] + 1):
+            self.free_agents[rng.choice(SPORTS)].append(player_id)
+
+        self.password = generate_password_hash(DEFAULT_PASSWORD)
+
+    def rng(self, table):
+        return random.Random(f'{self.seed}:{table}')
+
+    @property
+    def team_count(self):
+        return len(self.team_sport)
+
+    def roster(self, team_id):
+        first = (team_id - 1) * ROSTER_SIZE + 1
+        return range(first, first + ROSTER_SIZE)
+
+    def league_teams(self, league_id):
+        first = self.league_first_team[league_id - 1]
+        return range(first, first + self.league_size[league_id - 1])
+
+    @staticmethod
+    def day(rng):
+        return SEASON_START + datetime.timedelta(days=rng.randrange(SEASON_DAYS))
+
+    @staticmethod
+    def person(rng):
+        return f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+
+    def users(self):
+        rng = self.rng('User')
+        for user_id in range(1, self.counts['User'] + 1):
+            yield (user_id, self.person(rng), f'user{user_id}@example.com', f'user{user_id}', self.password,
+                   'A' if user_id == 1 else 'U', rng.choice(('Public', 'Private')))
+
+    def leagues(self):
+        rng = self.rng('League')
+        for league_id in range(1, self.counts['League'] + 1):
+            yield (league_id, f'{rng.choice(LEAGUE_WORDS)} League {league_id}', rng.choice('PPR'),
+                   rng.randint(1, self.counts['User']), TEAMS_PER_LEAGUE[1], self.day(rng),
+                   self.league_sport[league_id - 1])
+
+    def teams(self):
+        rng = self.rng('Team')
+        for team_id in range(1, self.team_count + 1):
+            yield (team_id, f'{rng.choice(TEAM_WORDS)} {team_id}', rng.randint(1, self.counts['User']),
+                   self.team_league[team_id - 1], 0, None, 'A', self.team_sport[team_id - 1])
+
+    def drafts(self):
+        # one completed draft per league, sharing the league's ID
+        rng = self.rng('Draft')
+        for league_id in range(1, self.counts['League'] + 1):
+            yield (league_id, league_id, self.day(rng), rng.choice('RS'), 'C')
+
+    def players(self):
+        rng = self.rng('Player')
+        real_teams = {sport: [f'{city} {mascot}' for city in CITIES for mascot in MASCOTS[sport]]
+                      for sport in SPORTS}
+        for team_id in range(1, self.team_count + 1):
+            sport = self.team_sport[team_id - 1]
+            positions = PLAYER_POSITIONS[sport]
+            for slot, player_id in enumerate(self.roster(team_id)):
+                status = 'U' if rng.random() < 0.05 else 'A'
+                yield (player_id, self.person(rng), None, sport, positions[slot % len(positions)],
+                       rng.choice(real_teams[sport]), 0, status, team_id, self.team_league[team_id - 1])
+        for sport, player_ids in self.free_agents.items():
+            for player_id in player_ids:
+                yield (player_id, self.person(rng), None, sport, rng.choice(PLAYER_POSITIONS[sport]),
+                       rng.choice(real_teams[sport]), 0, 'A', None, None)
+
+    def match_pairs(self):
+        """
+        (MatchID, date, home team, away team) for every match, drawn from one random stream
+        so MatchDetail, MatchTeam and MatchEvent agree.
+        """
+        rng = self.rng('MatchDetail')
+        for match_id in range(1, self.counts['MatchDetail'] + 1):
+            home, away = rng.sample(self.league_teams(rng.randint(1, self.counts['League'])), 2)
+            yield match_id, self.day(rng), home, away
+
+    def match_details(self):
+        rng = self.rng('MatchScore')
+        for match_id, match_date, _, _ in self.match_pairs():
+            home_score, away_score = rng.randint(0, 5), rng.randint(0, 5)
+            winner = 'Home' if home_score > away_score else 'Away' if away_score > home_score else 'Draw'
+            yield (match_id, match_date, f'{home_score}-{away_score}', winner)
+
+    def match_teams(self):
+        for match_id, _, home, away in self.match_pairs():
+            yield (match_id, home, 'Home')
+            yield (match_id, away, 'Away')
+
+    def match_events(self):
+        rng = self.rng('MatchEvent')
+        pairs = [(home, away) for _, _, home, away in self.match_pairs()]
+        for event_id in range(1, self.counts['MatchEvent'] + 1):
+            match_index = rng.randrange(len(pairs))
+            team_id = rng.choice(pairs[match_index])
+            event_type, impact = rng.choice(EVENT_TYPES[self.team_sport[team_id - 1]])
+            yield (event_id, event_type, datetime.time(rng.randrange(3), rng.randrange(60), rng.randrange(60)),
+                   rng.choice(self.roster(team_id)), match_index + 1, round(impact * rng.uniform(0.5, 1.5), 2))
+
+    def player_stats(self):
+        rng = self.rng('PlayerStats')
+        for stats_id in range(1, self.counts['PlayerStats'] + 1):
+            team_id = rng.randint(1, self.team_count)
+            text = PERFORMANCE_STATS[self.team_sport[team_id - 1]].format(
+                a=rng.randint(0, 120), b=rng.randint(0, 4), c=rng.randint(0, 12))
+            yield (stats_id, rng.choice(self.roster(team_id)), self.day(rng), text,
+                   'Y' if rng.random() < 0.03 else 'N')
+
+    def trade_legs(self):
+        """
+        (TradeID, date, team out, player out, team in, player in) for every trade, between
+        two teams of one league.
+        """
+        rng = self.rng('Trade')
+        for trade_id in range(1, self.counts['Trade'] + 1):
+            seller, buyer = rng.sample(self.league_teams(rng.randint(1, self.counts['League'])), 2)
+            yield (trade_id, self.day(rng), seller, rng.choice(self.roster(seller)),
+                   buyer, rng.choice(self.roster(buyer)))
+
+    def trades(self):
+        for trade_id, trade_date, _, _, _, _ in self.trade_legs():
+            yield (trade_id, trade_date)
+
+    def player_trades(self):
+        for trade_id, _, _, seller_player, _, buyer_player in self.trade_legs():
+            yield (trade_id, seller_player, 'To')
+            yield (trade_id, buyer_player, 'From')
+
+    def team_trades(self):
+        for trade_id, _, seller, _, buyer, _ in self.trade_legs():
+            yield (trade_id, buyer, 'In')
+            yield (trade_id, seller, 'Out')
+
+    def waivers(self):
+        rng = self.rng('Waiver')
+        for waiver_id in range(1, self.counts['Waiver'] + 1):
+            team_id = rng.randint(1, self.team_count)
+            pool = self.free_agents[self.team_sport[team_id - 1]] or list(self.roster(team_id))
+            # every fifth waiver is pending; finish() sets them to 'P' as well, for databases
+            # that still have the AutoApproveWaiver trigger
+            status = 'P' if waiver_id % 5 == 0 else rng.choice('AD')
+            yield (waiver_id, status, self.day(rng), team_id, rng.choice(pool))
+
+    def tables(self):
+        """
+        (table, columns, rows) in load order.
+        """
+        return [
+            ('User', ('UserID', 'FullName', 'Email', 'UserName', 'Pwd', 'Position', 'ProfileSetting'), self.users()),
+            ('League', ('LeagueID', 'LeagueName', 'LeagueType', 'Commissioner', 'MaxNumber', 'DraftDate', 'Sport'),
+             self.leagues()),
+            ('Team', ('TeamID', 'TeamName', 'Manager', 'LeagueID', 'TotalPoints', 'LeagueRanking', 'TeamStatus', 'Sport'),
+             self.teams()),
+            ('Draft', ('DraftID', 'LeagueID', 'DraftDate', 'DraftOrder', 'DraftStatus'), self.drafts()),
+            ('Player', ('PlayerID', 'FullName', 'PhotoURL', 'Sport', 'Position', 'RealTeam', 'FantasyPoints',
+                        'AvaiStatus', 'TeamID', 'DraftID'), self.players()),
+            ('MatchDetail', ('MatchID', 'MatchDate', 'FinalScore', 'Winner'), self.match_details()),
+            ('MatchTeam', ('MatchID', 'TeamID', 'HomeOrAway'), self.match_teams()),
+            ('MatchEvent', ('MatchEventID', 'EventType', 'EventTime', 'PlayerID', 'MatchID', 'ImpactFantasyPoint'),
+             self.match_events()),
+            ('PlayerStats', ('StatsID', 'PlayerID', 'GameDate', 'PerformanceStats', 'InjuryStatus'), self.player_stats()),
+            ('Trade', ('TradeID', 'TradeDate'), self.trades()),
+            ('PlayerTrade', ('TradeID', 'PlayerID', 'FromOrTo'), self.player_trades()),
+            ('TeamTrade', ('TradeID', 'TeamID', 'InOrOut'), self.team_trades()),
+            ('Waiver', ('WaiverID', 'WaiverStatus', 'WaiverPickupDate', 'TeamID', 'PlayerID'), self.waivers()),
+        ]
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class InsertLoader:
+    """
+    Loads rows with executemany, which pymysql sends as multi-row INSERT statements.
+    Each chunk is committed on its own to keep transactions small.
+    """
+
+    def __init__(self, connection, chunk_size):
+        self.connection = connection
+        self.chunk_size = chunk_size
+
+    def load(self, table, columns, rows):
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        count = 0
+        with self.connection.cursor() as cursor:
+            for chunk in chunked(rows, self.chunk_size):
+                cursor.executemany(sql, chunk)
+                self.connection.commit()
+                count += len(chunk)
+        return count
+
+
+def _tsv_field(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+class LoadDataLoader(InsertLoader):
+    """
+    Loads rows through temporary tab-separated files and LOAD DATA LOCAL INFILE, in chunks
+    of `chunk_size * 20` rows.
+    """
+
+    def load(self, table, columns, rows):
+        count = 0
+        with self.connection.cursor() as cursor:
+            for chunk in chunked(rows, self.chunk_size * 20):
+                with tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='', suffix='.tsv',
+                                                 delete=False) as handle:
+                    for row in chunk:
+                        handle.write('\t'.join(_tsv_field(value) for value in row) + '\n')
+                try:
+                    cursor.execute(f"""
+                        LOAD DATA LOCAL INFILE %s INTO TABLE {table}
+                        CHARACTER SET utf8mb4
+                        FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n'
+                        ({', '.join(columns)})
+                    """, (handle.name,))
+                finally:
+                    os.remove(handle.name)
+                self.connection.commit()
+                count += len(chunk)
+        return count
+
+
+def reset(connection):
+    """
+    Empty every generated table and the tables derived from them.
+    """
+    with connection.cursor() as cursor:
+        for table in DERIVED_TABLES + tuple(reversed(TABLES)):
+            cursor.execute(f"TRUNCATE TABLE {table}")
+    connection.commit()
+
+
+def finish(connection):
+    """
+    Rebuild the data derived from the generated rows.
+    """
+    with connection.cursor() as cursor:
+        # points follow the events, clamped to NUMERIC(6,2)
+        cursor.execute("""
+            UPDATE Player p
+            LEFT JOIN (
+                SELECT PlayerID, SUM(ImpactFantasyPoint) AS Total FROM MatchEvent GROUP BY PlayerID
+            ) e ON e.PlayerID = p.PlayerID
+            SET p.FantasyPoints = LEAST(GREATEST(COALESCE(e.Total, 0), -9999.99), 9999.99)
+        """)
+        cursor.execute("""
+            UPDATE Team t
+            LEFT JOIN (
+                SELECT TeamID, SUM(FantasyPoints) AS Total FROM Player WHERE TeamID IS NOT NULL GROUP BY TeamID
+            ) p ON p.TeamID = t.TeamID
+            SET t.TotalPoints = LEAST(GREATEST(COALESCE(p.Total, 0), -9999.99), 9999.99)
+        """)
+        cursor.execute("UPDATE Waiver SET WaiverStatus = 'P' WHERE MOD(WaiverID, 5) = 0")
+
+        for name, (table, column) in SEQUENCE_KEYS.items():
+            cursor.execute(f"""
+                UPDATE IdSequence SET NextID = (SELECT IFNULL(MAX({column}), 0) + 1 FROM {table})
+                WHERE Name = %s
+            """, (name,))
+
+        # neither TRUNCATE nor the load fired the insert triggers, so recount and
+        # invalidate every cached version
+        cursor.execute("DELETE FROM RowCounter WHERE Name IN ('PlayerTrade', 'Draft')")
+        cursor.execute("INSERT INTO RowCounter (Name, Shard, Total) SELECT 'PlayerTrade', 0, COUNT(*) FROM PlayerTrade")
+        cursor.execute("INSERT INTO RowCounter (Name, Shard, Total) SELECT 'Draft', 0, COUNT(*) FROM Draft")
+        cursor.execute("CALL RebuildMatchSummary()")
+        cursor.execute("UPDATE TableVersion SET Version = Version + 1")
+    connection.commit()
+
+    rebuild_standings(connection)
+
+
+def generate(connection, dataset, loader, reset_first=False, log=print):
+    """
+    Load a generated dataset into an empty database.
+
+    :param connection: MySQL connection object.
+    :param dataset: A SyntheticFSL.
+    :param loader: An InsertLoader or LoadDataLoader on the same connection.
+    :param reset_first: Empty the generated tables first.
+    :param log: Called with a progress line per table.
+    :return: Rows written per table.
+    """
+    with connection.cursor() as cursor:
+        # the generator guarantees keys and uniqueness itself
+        cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+        if reset_first:
+            reset(connection)
+        cursor.execute("SELECT COUNT(*) AS count FROM User")
+        if cursor.fetchone()['count']:
+            raise ValueError("The database already has data; use --reset to replace it.")
+        # per-row insert triggers stand down; finish() derives what they would maintain
+        cursor.execute("SET @fsl_bulk_load = 1")
+
+    try:
+        written = {}
+        for table, columns, rows in dataset.tables():
+            start = time.perf_counter()
+            written[table] = loader.load(table, columns, rows)
+            log(f"{table}: {written[table]} rows in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        finish(connection)
+        log(f"derived points, standings and sequences in {time.perf_counter() - start:.1f}s")
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SET @fsl_bulk_load = NULL")
+    return written
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier for BASE_COUNTS (1 is about 10M rows)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='empty the generated tables first')
+    parser.add_argument('--load-data', action='store_true', help='load with LOAD DATA LOCAL INFILE')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='rows per INSERT batch')
+    args = parser.parse_args(argv)
+
+    dataset = SyntheticFSL(scaled_counts(args.scale), args.seed)
+    connection = pymysql.connect(**DB_CONFIG, local_infile=args.load_data)
+    try:
+        loader_class = LoadDataLoader if args.load_data else InsertLoader
+        start = time.perf_counter()
+        written = generate(connection, dataset, loader_class(connection, args.chunk_size), reset_first=args.reset)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        connection.close()
+
+    print(f"{sum(written.values())} rows in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
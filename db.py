@@ -0,0 +1,261 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+import pymysql
+from flask import g, current_app
+
+
+# default connection settings, overridable through the environment
+DB_CONFIG = {
+    'host': os.environ.get('FSL_DB_HOST', 'localhost'),
+    'user': os.environ.get('FSL_DB_USER', 'root'),
+    'password': os.environ.get('FSL_DB_PASSWORD', ''),
+    'db': os.environ.get('FSL_DB_NAME', 'FSL'),
+    'cursorclass': pymysql.cursors.DictCursor,  # Returns rows as dictionaries
+}
+
+# MySQL errors that only mean "try again": deadlock, lock wait timeout
+RETRY_ERRORS = (1213, 1205)
+
+
+class PoolTimeout(Exception):
+    """
+    Raised when no connection became available within the pool's wait timeout.
+    """
+
+
+class ConnectionPool:
+    """
+    A bounded pool of pymysql connections.
+
+    Idle connections are reused most-recently-used first, pinged before reuse once they
+    have been idle for longer than `health_check_interval`, and closed once they have been
+    idle for longer than `idle_timeout`. At most `size` connections exist at any time;
+    callers block for up to `timeout` seconds when all of them are checked out.
+
+    :param size: Maximum number of open connections.
+    :param timeout: Seconds to wait for a free connection before raising PoolTimeout.
+    :param idle_timeout: Seconds an idle connection is kept before it is closed.
+    :param health_check_interval: Idle seconds after which a connection is pinged before reuse.
+    :param connection_class: The pymysql Connection (sub)class new connections are made with.
+    :param connect_kwargs: Arguments passed through to pymysql.connect.
+    """
+
+    def __init__(self, size=10, timeout=5.0, idle_timeout=300.0, health_check_interval=30.0,
+                 connection_class=pymysql.connections.Connection, **connect_kwargs):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1.")
+        self.size = size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.connection_class = connection_class
+        self.connect_kwargs = connect_kwargs or dict(DB_CONFIG)
+
+        self._idle = deque()  # (connection, last_used) pairs, most recently used on the right
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+        # pool metrics
+        self._created = 0
+        self._closed = 0
+        self._acquired = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._failed_checks = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def _connect(self):
+        connection = self.connection_class(**self.connect_kwargs)
+        with self._cond:
+            self._created += 1
+        return connection
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._closed += 1
+
+    def _evict_idle(self, now):
+        """
+        Remove connections idle for longer than idle_timeout. Must be called with the lock held.
+        """
+        expired = []
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            expired.append(self._idle.popleft()[0])
+        return expired
+
+    def acquire(self):
+        """
+        Check a connection out of the pool, opening a new one if the pool is not full.
+
+        :return: An open pymysql connection.
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        connection = None
+        last_used = None
+
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                expired = self._evict_idle(now)
+                if expired:
+                    self._closed += len(expired)
+                    for stale in expired:
+                        try:
+                            stale.close()
+                        except Exception:
+                            pass
+                if self._idle:
+                    connection, last_used = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use + len(self._idle) < self.size:
+                    # reserve a slot, the connection itself is opened outside the lock
+                    self._in_use += 1
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"No database connection available after {self.timeout} seconds.")
+                waited = True
+                self._cond.wait(remaining)
+
+            wait_time = time.monotonic() - start
+            self._acquired += 1
+            if waited:
+                self._waits += 1
+            self._wait_time_total += wait_time
+            self._wait_time_max = max(self._wait_time_max, wait_time)
+
+        try:
+            if connection is not None and time.monotonic() - last_used > self.health_check_interval:
+                try:
+                    connection.ping(reconnect=False)
+                except Exception:
+                    logging.warning("Discarding pooled connection that failed its health check.")
+                    with self._cond:
+                        self._failed_checks += 1
+                    self._close(connection)
+                    connection = None
+            if connection is None:
+                connection = self._connect()
+        except Exception:
+            # give the reserved slot back so waiters are not starved
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        return connection
+
+    def release(self, connection, discard=False):
+        """
+        Return a connection to the pool. Any open transaction is rolled back first.
+
+        :param connection: A connection previously returned by acquire().
+        :param discard: Close the connection instead of keeping it for reuse.
+        """
+        if not discard:
+            try:
+                connection.rollback()
+            except Exception:
+                discard = True
+
+        if discard:
+            self._close(connection)
+
+        with self._cond:
+            self._in_use -= 1
+            if not discard:
+                self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def close_all(self):
+        """
+        Close every idle connection. Checked out connections are closed when released.
+        """
+        with self._cond:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+        for connection in idle:
+            self._close(connection)
+
+    def stats(self):
+        """
+        Snapshot of the pool metrics.
+
+        :return: A dictionary of counters and gauges.
+        """
+        with self._cond:
+            return {
+                'size': self.size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'created': self._created,
+                'closed': self._closed,
+                'acquired': self._acquired,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'failed_health_checks': self._failed_checks,
+                'wait_time_total': self._wait_time_total,
+                'wait_time_max': self._wait_time_max,
+                'wait_time_avg': self._wait_time_total / self._acquired if self._acquired else 0.0,
+            }
+
+
+def init_app(app):
+    """
+    Create the application's connection pool and register the teardown that returns
+    the request's connection to it.
+
+    Pool settings are read from app.config (DB_POOL_SIZE, DB_POOL_TIMEOUT,
+    DB_POOL_IDLE_TIMEOUT, DB_POOL_HEALTH_CHECK_INTERVAL) with environment fallbacks.
+    """
+    app.config.setdefault('DB_POOL_SIZE', int(os.environ.get('FSL_DB_POOL_SIZE', 10)))
+    app.config.setdefault('DB_POOL_TIMEOUT', float(os.environ.get('FSL_DB_POOL_TIMEOUT', 5)))
+    app.config.setdefault('DB_POOL_IDLE_TIMEOUT', float(os.environ.get('FSL_DB_POOL_IDLE_TIMEOUT', 300)))
+    app.config.setdefault('DB_POOL_HEALTH_CHECK_INTERVAL', float(os.environ.get('FSL_DB_POOL_HEALTH_CHECK_INTERVAL', 30)))
+
+    app.extensions['db_pool'] = ConnectionPool(
+        size=app.config['DB_POOL_SIZE'],
+        timeout=app.config['DB_POOL_TIMEOUT'],
+        idle_timeout=app.config['DB_POOL_IDLE_TIMEOUT'],
+        health_check_interval=app.config['DB_POOL_HEALTH_CHECK_INTERVAL'],
+        **DB_CONFIG
+    )
+    app.teardown_appcontext(release_db)
+
+
+def get_pool():
+    return current_app.extensions['db_pool']
+
+
+def get_db():
+    """
+    Return the connection bound to the current request, borrowing one from the pool on first use.
+    """
+    if 'db' not in g:
+        start = time.perf_counter()
+        g.db = get_pool().acquire()
+        g.db_acquire_time = time.perf_counter() - start
+    return g.db
+
+
+def release_db(exception=None):
+    """
+    Return the current request's connection to the pool, if it borrowed one.
+    """
+    connection = g.pop('db', None)
+    if connection is not None:
+        discard = isinstance(exception, (pymysql.err.OperationalError, pymysql.err.InterfaceError))
+        get_pool().release(connection, discard=discard)
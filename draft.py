@@ -0,0 +1,297 @@
+"""
+Set-based draft engine.
+
+Computes the same assignment as the StartDraft stored procedure in one pass in memory
+and applies it with one bulk UPDATE per team, instead of the procedure's per-player
+WHILE loop (COUNT(*), ORDER BY ... LIMIT 1, single-row UPDATE and DELETE per pick).
+
+Like StartDraft, a draft leaves Team.TotalPoints and the standings alone: a whole pool
+of season points would overflow the NUMERIC(6,2) team totals. recompute.py brings the
+totals back in line with the rosters, clamped to the column's range.
+
+Pick rules, identical to StartDraft:
+  * teams of the league are ordered by LeagueRanking (NULLs first, ties broken by TeamID);
+  * every available player (AvaiStatus = 'A') is drafted, in PlayerID order;
+  * 'R' (round-robin) gives pick k to team k % n; 'S' (snake) reverses the team order on
+    every second round.
+
+simulate_draft() previews a draft without writing anything: the league's teams and the
+available pool are read once, and the picks are replayed in memory, as often as asked,
+with the ties in LeagueRanking broken at random instead of by TeamID.
+"""
+import time
+import random
+from array import array
+
+import pymysql
+
+from ids import next_id
+
+
+VALID_ORDERS = ('R', 'S')
+
+# maximum number of PlayerIDs in a single UPDATE ... WHERE PlayerID IN (...)
+UPDATE_CHUNK_SIZE = 5000
+
+
+def draft_slots(pick_count, team_count, order):
+    """
+    Team position (0-based, in draft order) for each pick.
+
+    :param pick_count: Number of players to draft.
+    :param team_count: Number of teams in the league.
+    :param order: 'R' for round-robin or 'S' for snake.
+    :return: A list of `pick_count` team positions.
+    """
+    if order not in VALID_ORDERS:
+        raise ValueError("Invalid draft order. Use 'R' or 'S'.")
+    if team_count < 1:
+        raise ValueError("No teams found for the specified LeagueID.")
+
+    if order == 'R':
+        return [pick % team_count for pick in range(pick_count)]
+
+    slots = []
+    for pick in range(pick_count):
+        position = pick % team_count
+        if (pick // team_count) % 2 == 1:
+            position = team_count - 1 - position
+        slots.append(position)
+    return slots
+
+
+def plan_draft(team_ids, player_ids, order):
+    """
+    Assign players to teams.
+
+    :param team_ids: TeamIDs in draft order.
+    :param player_ids: PlayerIDs in pick order.
+    :param order: 'R' for round-robin or 'S' for snake.
+    :return: A dictionary mapping TeamID to the list of PlayerIDs it drafted, in pick order.
+    """
+    rosters = {team_id: [] for team_id in team_ids}
+    for player_id, slot in zip(player_ids, draft_slots(len(player_ids), len(team_ids), order)):
+        rosters[team_ids[slot]].append(player_id)
+    return rosters
+
+
+def team_draft_order(teams, rng=None):
+    """
+    Sort teams the way StartDraft's ROW_NUMBER() OVER (ORDER BY LeagueRanking) does,
+    with TeamID as a deterministic tie-break.
+
+    :param teams: Rows with TeamID and LeagueRanking.
+    :param rng: Optional random.Random; when given, teams with equal rankings are shuffled
+        instead of ordered by TeamID.
+    :return: TeamIDs in draft order.
+    """
+    ordered = sorted(
+        teams,
+        key=lambda team: (team['LeagueRanking'] is not None, team['LeagueRanking'] or 0,
+                          rng.random() if rng is not None else team['TeamID'])
+    )
+    return [team['TeamID'] for team in ordered]
+
+
+def run_draft(connection, league_id, draft_date, draft_order):
+    """
+    Create a draft for a league and assign every available player, in one transaction.
+
+    :param connection: MySQL connection object.
+    :param league_id: The ID of the league to draft for.
+    :param draft_date: The date of the draft.
+    :param draft_order: 'R' for round-robin or 'S' for snake.
+    :return: The new DraftID.
+    :raises ValueError: If the league does not exist, has no teams, or the order is invalid.
+    """
+    if draft_order not in VALID_ORDERS:
+        raise ValueError("Invalid draft order. Use 'R' or 'S'.")
+
+    try:
+        with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute("SELECT 1 FROM League WHERE LeagueID = %s", (league_id,))
+            if not cursor.fetchone():
+                raise ValueError("LeagueID does not exist.")
+
+            cursor.execute("SELECT TeamID, LeagueRanking FROM Team WHERE LeagueID = %s", (league_id,))
+            team_ids = team_draft_order(cursor.fetchall())
+            if not team_ids:
+                raise ValueError("No teams found for the specified LeagueID.")
+
+            # lock the pool for the (short) duration of the bulk assignment
+            cursor.execute("SELECT PlayerID FROM Player WHERE AvaiStatus = 'A' ORDER BY PlayerID FOR UPDATE")
+            player_ids = [row['PlayerID'] for row in cursor.fetchall()]
+
+            draft_id = next_id('Draft')
+            cursor.execute("""
+                INSERT INTO Draft (DraftID, LeagueID, DraftDate, DraftOrder, DraftStatus)
+                VALUES (%s, %s, %s, %s, 'I')
+            """, (draft_id, league_id, draft_date, draft_order))
+
+            rosters = plan_draft(team_ids, player_ids, draft_order)
+            for team_id, roster in rosters.items():
+                for start in range(0, len(roster), UPDATE_CHUNK_SIZE):
+                    chunk = roster[start:start + UPDATE_CHUNK_SIZE]
+                    placeholders = ', '.join(['%s'] * len(chunk))
+                    cursor.execute(f"""
+                        UPDATE Player
+                        SET TeamID = %s, DraftID = %s, AvaiStatus = 'U'
+                        WHERE PlayerID IN ({placeholders})
+                    """, [team_id, draft_id] + chunk)
+
+            cursor.execute("UPDATE Draft SET DraftStatus = 'C' WHERE DraftID = %s", (draft_id,))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+    return draft_id
+
+
+def load_draft_pool(connection, league_id):
+    """
+    Read what a draft of the league would work with, without locking anything.
+
+    :param connection: MySQL connection object.
+    :param league_id: The ID of the league.
+    :return: A (teams, pool) pair. teams are rows with TeamID, TeamName and LeagueRanking;
+        pool is a dictionary of parallel sequences (PlayerID, FullName, Position and
+        FantasyPoints as an array of floats) holding the available players in pick order.
+    :raises ValueError: If the league does not exist or has no teams.
+    """
+    with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+        cursor.execute("SELECT 1 FROM League WHERE LeagueID = %s", (league_id,))
+        if not cursor.fetchone():
+            raise ValueError("LeagueID does not exist.")
+
+        cursor.execute("SELECT TeamID, TeamName, LeagueRanking FROM Team WHERE LeagueID = %s", (league_id,))
+        teams = cursor.fetchall()
+        if not teams:
+            raise ValueError("No teams found for the specified LeagueID.")
+
+        cursor.execute("""
+            SELECT PlayerID, FullName, Position, FantasyPoints FROM Player
+            WHERE AvaiStatus = 'A'
+            ORDER BY PlayerID
+        """)
+        rows = cursor.fetchall()
+
+    pool = {
+        'PlayerID': array('q', (int(row['PlayerID']) for row in rows)),
+        'FullName': [row['FullName'] for row in rows],
+        'Position': [row['Position'] for row in rows],
+        'FantasyPoints': array('d', (float(row['FantasyPoints'] or 0) for row in rows)),
+    }
+    return teams, pool
+
+
+def simulate_draft(teams, points, order, simulations=0, seed=None):
+    """
+    Replay a draft in memory.
+
+    The picks only depend on the draft position, so the points each position collects are
+    summed once; every simulation then only reorders the teams over the positions.
+
+    :param teams: Rows with TeamID and LeagueRanking.
+    :param points: FantasyPoints of the available players, in pick order.
+    :param order: 'R' for round-robin or 'S' for snake.
+    :param simulations: Extra runs with the LeagueRanking ties broken at random.
+    :param seed: Seed for the random tie-breaks.
+    :return: A dictionary with the draft order StartDraft would use ('team_order'), the draft
+        position of every pick ('slots'), the points and player count of every position, and
+        per TeamID the projected points of each simulation ('outcomes', empty without
+        simulations).
+    """
+    slots = draft_slots(len(points), len(teams), order)
+    position_points = [0.0] * len(teams)
+    position_counts = [0] * len(teams)
+    for value, slot in zip(points, slots):
+        position_points[slot] += value
+        position_counts[slot] += 1
+
+    outcomes = {team['TeamID']: [] for team in teams} if simulations else {}
+    rng = random.Random(seed)
+    for _ in range(simulations):
+        for position, team_id in enumerate(team_draft_order(teams, rng)):
+            outcomes[team_id].append(position)
+
+    return {
+        'order': order,
+        'team_order': team_draft_order(teams),
+        'slots': slots,
+        'position_points': position_points,
+        'position_counts': position_counts,
+        'outcomes': outcomes,
+    }
+
+
+def draft_preview(connection, league_id, orders=VALID_ORDERS, simulations=0, seed=None, roster_limit=None):
+    """
+    Project every team's roster and points for each draft order, without side effects.
+
+    :param connection: MySQL connection object.
+    :param league_id: The ID of the league.
+    :param orders: Draft orders to preview.
+    :param simulations: Runs with random LeagueRanking tie-breaks per order, summarised per team.
+    :param seed: Seed for the random tie-breaks.
+    :param roster_limit: List at most this many players per team (the counts stay complete).
+    :return: A JSON-ready dictionary.
+    :raises ValueError: If the league does not exist, has no teams, or an order is invalid.
+    """
+    for order in orders:
+        if order not in VALID_ORDERS:
+            raise ValueError("Invalid draft order. Use 'R' or 'S'.")
+
+    started = time.perf_counter()
+    teams, pool = load_draft_pool(connection, league_id)
+    loaded = time.perf_counter()
+    names = {team['TeamID']: team['TeamName'] for team in teams}
+
+    previews = {}
+    for order in orders:
+        result = simulate_draft(teams, pool['FantasyPoints'], order, simulations, seed)
+        rosters = plan_draft(result['team_order'], range(len(pool['PlayerID'])), order)
+        projection = []
+        for position, team_id in enumerate(result['team_order']):
+            picks = rosters[team_id] if roster_limit is None else rosters[team_id][:roster_limit]
+            projection.append({
+                'TeamID': int(team_id),
+                'TeamName': names[team_id],
+                'position': position + 1,
+                'points': round(result['position_points'][position], 2),
+                'player_count': result['position_counts'][position],
+                'players': [
+                    {'PlayerID': pool['PlayerID'][i], 'FullName': pool['FullName'][i],
+                     'Position': pool['Position'][i], 'FantasyPoints': pool['FantasyPoints'][i]}
+                    for i in picks
+                ],
+            })
+        preview = {'projection': projection}
+
+        if simulations:
+            summary = []
+            for team_id, positions in result['outcomes'].items():
+                team_points = [result['position_points'][position] for position in positions]
+                histogram = {}
+                for position in positions:
+                    histogram[position + 1] = histogram.get(position + 1, 0) + 1
+                summary.append({
+                    'TeamID': int(team_id),
+                    'TeamName': names[team_id],
+                    'mean_points': round(sum(team_points) / len(team_points), 2),
+                    'min_points': round(min(team_points), 2),
+                    'max_points': round(max(team_points), 2),
+                    'positions': histogram,
+                })
+            summary.sort(key=lambda team: -team['mean_points'])
+            preview['simulations'] = {'count': simulations, 'seed': seed, 'teams': summary}
+        previews[order] = preview
+
+    return {
+        'league_id': league_id,
+        'teams': len(teams),
+        'pool_size': len(pool['PlayerID']),
+        'orders': previews,
+        'load_ms': round((loaded - started) * 1000, 2),
+        'simulate_ms': round((time.perf_counter() - loaded) * 1000, 2),
+    }
@@ -0,0 +1,227 @@
+"""
+Streaming data export: players, trade history and match events as CSV or JSON Lines.
+
+Rows are read through an unbuffered server-side cursor (pymysql SSCursor) in chunks and
+written out as they arrive, so memory stays flat however many rows there are and the first
+bytes go out before the query has finished. An export holds its own connection for as long
+as it streams; an unbuffered connection cannot run anything else until its result is read,
+so it is never a pooled one.
+
+Admins download exports from /export/<dataset>; the same code runs from the command line:
+
+    python export.py players --format csv > players.csv
+    python export.py trades --format jsonl -o trades.jsonl
+    python export.py match_events --match 12
+"""
+import io
+import sys
+import csv
+import json
+import argparse
+import datetime
+from decimal import Decimal
+
+import pymysql
+
+from db import DB_CONFIG
+
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+# rows fetched from the server, and written out, per chunk
+CHUNK_SIZE = 1000
+
+# dataset -> (SELECT without WHERE, ORDER BY, output columns, {filter name: column})
+DATASETS = {
+    'players': (
+        """
+            SELECT PlayerID, FullName, Sport, Position, RealTeam, FantasyPoints, AvaiStatus, TeamID, DraftID
+            FROM Player
+        """,
+        "PlayerID",
+        ('PlayerID', 'FullName', 'Sport', 'Position', 'RealTeam', 'FantasyPoints', 'AvaiStatus', 'TeamID', 'DraftID'),
+        {'sport': 'Sport', 'status': 'AvaiStatus'},
+    ),
+    # the join the /trade listing shows
+    'trades': (
+        """
+            SELECT pt.TradeID, tr.TradeDate, pt.PlayerID, p.FullName, p.RealTeam, p.FantasyPoints,
+                   pt.FromOrTo, t.TeamID, t.TeamName, t.Sport
+            FROM PlayerTrade pt
+            JOIN Player p ON pt.PlayerID = p.PlayerID
+            JOIN Trade tr ON pt.TradeID = tr.TradeID
+            JOIN Team t ON p.TeamID = t.TeamID
+        """,
+        "pt.TradeID, pt.PlayerID",
+        ('TradeID', 'TradeDate', 'PlayerID', 'FullName', 'RealTeam', 'FantasyPoints', 'FromOrTo', 'TeamID',
+         'TeamName', 'Sport'),
+        {'sport': 't.Sport'},
+    ),
+    'match_events': (
+        """
+            SELECT MatchEventID, MatchID, EventTime, EventType, PlayerID, ImpactFantasyPoint
+            FROM MatchEvent
+        """,
+        "MatchID, EventTime, MatchEventID",
+        ('MatchEventID', 'MatchID', 'EventTime', 'EventType', 'PlayerID', 'ImpactFantasyPoint'),
+        {'match': 'MatchID', 'player': 'PlayerID'},
+    ),
+}
+
+
+def build_query(dataset, filters=None):
+    """
+    :param dataset: A key of DATASETS.
+    :param filters: Optional {filter name: value}; None values are ignored.
+    :return: A (sql, params, columns) triple.
+    :raises ValueError: For an unknown dataset or filter.
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset '{dataset}'. Use {', '.join(DATASETS)}.")
+    select, order_by, columns, allowed = DATASETS[dataset]
+
+    conditions = []
+    params = []
+    for name, value in (filters or {}).items():
+        if value is None:
+            continue
+        if name not in allowed:
+            raise ValueError(f"{dataset} cannot be filtered by '{name}'.")
+        conditions.append(f"{allowed[name]} = %s")
+        params.append(value)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return f"{select} {where} ORDER BY {order_by}", params, columns
+
+
+def stream_rows(connection, sql, params, chunk_size=CHUNK_SIZE):
+    """
+    Read a query's rows through an unbuffered cursor.
+
+    :return: A generator of row tuples.
+    """
+    with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+
+
+def _text(value):
+    if isinstance(value, datetime.timedelta):
+        # TIME columns arrive as timedelta
+        seconds = int(value.total_seconds())
+        return f"{seconds // 3600:02}:{seconds % 3600 // 60:02}:{seconds % 60:02}"
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        # NUMERIC(8) keys stay integers, NUMERIC(6,2) points become numbers
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    return _text(value)
+
+
+def format_rows(columns, rows, fmt, chunk_size=CHUNK_SIZE):
+    """
+    Encode rows as CSV (with a header row) or JSON Lines.
+
+    :param columns: The column names.
+    :param rows: An iterable of tuples in column order.
+    :param fmt: 'csv' or 'jsonl'.
+    :return: A generator of UTF-8 chunks of about chunk_size rows each; for CSV the header
+        comes first, on its own.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer is not None:
+        writer.writerow(columns)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+    pending = 0
+    for row in rows:
+        if writer is not None:
+            writer.writerow([_text(value) for value in row])
+        else:
+            buffer.write(json.dumps({column: _json_value(value) for column, value in zip(columns, row)},
+                                    ensure_ascii=False))
+            buffer.write('\n')
+        pending += 1
+        if pending >= chunk_size:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue().encode('utf-8')
+
+
+def export(dataset, fmt, filters=None, chunk_size=CHUNK_SIZE, **connect_kwargs):
+    """
+    Stream one dataset. The query is checked before anything is read, so invalid requests
+    fail before the first chunk; the connection is opened on the first chunk and closed
+    when the generator is exhausted or closed.
+
+    :param dataset: A key of DATASETS.
+    :param fmt: A key of FORMATS.
+    :param filters: Optional {filter name: value}.
+    :param connect_kwargs: Arguments passed through to pymysql.connect; DB_CONFIG by default.
+    :return: A generator of UTF-8 chunks.
+    :raises ValueError: For an unknown dataset, format or filter.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'. Use {', '.join(FORMATS)}.")
+    sql, params, columns = build_query(dataset, filters)
+    connect_kwargs = connect_kwargs or dict(DB_CONFIG)
+
+    def generate():
+        connection = pymysql.connect(**connect_kwargs)
+        try:
+            yield from format_rows(columns, stream_rows(connection, sql, params, chunk_size), fmt, chunk_size)
+        finally:
+            connection.close()
+
+    return generate()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dataset', choices=sorted(DATASETS))
+    parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+    parser.add_argument('-o', '--output', help='file to write (default: standard output)')
+    parser.add_argument('--sport', help='players and trades: only this sport')
+    parser.add_argument('--status', help='players: only this AvaiStatus')
+    parser.add_argument('--match', type=int, help='match_events: only this match')
+    parser.add_argument('--player', type=int, help='match_events: only this player')
+    args = parser.parse_args(argv)
+
+    filters = {name: getattr(args, name) for name in ('sport', 'status', 'match', 'player')
+               if getattr(args, name) is not None}
+    try:
+        chunks = export(args.dataset, args.format, filters)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+        else:
+            output.flush()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
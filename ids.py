@@ -0,0 +1,155 @@
+"""
+ID allocation backed by the IdSequence table (migrations/004_id_sequences.sql).
+
+Each process reserves IDs in blocks with one
+
+    UPDATE IdSequence SET NextID = LAST_INSERT_ID(NextID + n) WHERE Name = ...
+
+on its own autocommit connection, then hands them out from memory. Writers never lock
+the target table or wait on each other's transactions to get a key, unlike the old
+MAX(ID) + 1 triggers. IDs left in a block when a process exits are skipped, so keys are
+unique and increasing per process but may have gaps.
+"""
+import os
+import threading
+
+import pymysql
+
+from db import DB_CONFIG
+
+
+# IDs reserved per round trip to IdSequence
+DEFAULT_BLOCK_SIZE = 20
+
+# sequences seeded by the migration, one per table key
+SEQUENCES = ('League', 'Team', 'Trade', 'User', 'Player', 'Waiver', 'PlayerStats', 'MatchEvent', 'Draft')
+
+
+class IdAllocator:
+    """
+    Hands out IDs from blocks reserved in IdSequence.
+
+    :param block_size: Number of IDs reserved per round trip.
+    :param connect_kwargs: Arguments passed through to pymysql.connect.
+    """
+
+    def __init__(self, block_size=DEFAULT_BLOCK_SIZE, **connect_kwargs):
+        if block_size < 1:
+            raise ValueError("Block size must be at least 1.")
+        self.block_size = block_size
+        self.connect_kwargs = connect_kwargs or dict(DB_CONFIG)
+
+        self._blocks = {}  # sequence name -> [next_id, end_id)
+        self._connection = None
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _check_fork(self):
+        """
+        Drop state inherited from a parent process so a forked worker never reuses the
+        parent's block or connection. Must be called with the lock held.
+        """
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._blocks.clear()
+            self._connection = None
+
+    def _reserve(self, name, count):
+        """
+        Reserve `count` consecutive IDs in the database. Must be called with the lock held.
+
+        :return: A (first_id, end_id) pair, end exclusive.
+        """
+        if name not in SEQUENCES:
+            raise ValueError(f"Unknown ID sequence: {name}")
+
+        if self._connection is None or not self._connection.open:
+            self._connection = pymysql.connect(**dict(self.connect_kwargs, autocommit=True))
+
+        try:
+            with self._connection.cursor() as cursor:
+                cursor.execute(
+                    "UPDATE IdSequence SET NextID = LAST_INSERT_ID(NextID + %s) WHERE Name = %s",
+                    (count, name)
+                )
+                if cursor.rowcount != 1:
+                    raise ValueError(f"ID sequence {name} is missing, run python migrate.py.")
+                cursor.execute("SELECT LAST_INSERT_ID() AS end_id")
+                end_id = int(cursor.fetchone()['end_id'])
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            # reconnect on the next reservation
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+            raise
+
+        return end_id - count, end_id
+
+    def next_id(self, name):
+        """
+        :param name: Sequence name, e.g. 'Team'.
+        :return: A new, unused ID.
+        """
+        return self.reserve(name, 1)[0]
+
+    def reserve(self, name, count):
+        """
+        Allocate several IDs at once, e.g. for a bulk insert.
+
+        Requests of at least a block are reserved directly as one consecutive range.
+
+        :param name: Sequence name, e.g. 'Player'.
+        :param count: Number of IDs needed.
+        :return: A list of `count` new IDs in increasing order.
+        """
+        if count < 1:
+            return []
+
+        with self._lock:
+            self._check_fork()
+
+            if count >= self.block_size:
+                first_id, end_id = self._reserve(name, count)
+                return list(range(first_id, end_id))
+
+            ids = []
+            while len(ids) < count:
+                block = self._blocks.get(name)
+                if block is None or block[0] >= block[1]:
+                    block = list(self._reserve(name, self.block_size))
+                    self._blocks[name] = block
+                take = min(count - len(ids), block[1] - block[0])
+                ids.extend(range(block[0], block[0] + take))
+                block[0] += take
+            return ids
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                try:
+                    self._connection.close()
+                except Exception:
+                    pass
+                self._connection = None
+
+
+# one allocator per process
+allocator = IdAllocator()
+
+
+def init_app(app):
+    """
+    Configure the process allocator from app.config (ID_BLOCK_SIZE) with an environment fallback.
+    """
+    app.config.setdefault('ID_BLOCK_SIZE', int(os.environ.get('FSL_ID_BLOCK_SIZE', DEFAULT_BLOCK_SIZE)))
+    allocator.block_size = app.config['ID_BLOCK_SIZE']
+
+
+def next_id(name):
+    return allocator.next_id(name)
+
+
+def reserve_ids(name, count):
+    return allocator.reserve(name, count)
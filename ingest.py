@@ -0,0 +1,596 @@
+"""
+Live match-event ingestion.
+
+Events arrive in batches (over HTTP, or from a file or pipe through the CLI) and are
+queued in memory. A background writer coalesces whatever is queued into batches and
+writes each batch in one transaction:
+
+  * one multi-row INSERT INTO MatchEvent;
+  * one UPDATE adding the summed ImpactFantasyPoint per player to Player.FantasyPoints;
+  * one UPDATE adding the same deltas, summed per owning team, to Team.TotalPoints,
+    followed by a re-rank of the affected leagues (standings.py).
+
+The queue is bounded. When it is full, submit() waits up to its timeout and then raises
+Backpressure, which the HTTP endpoint turns into 503 with a Retry-After header.
+
+Batches share their Player and Team row locks with trades, waiver runs and recomputes,
+so a batch chosen as a deadlock victim or timing out on a lock is retried after a short
+random back-off. When the retries run out the batch is appended to the dead-letter file
+(FSL_INGEST_DEAD_LETTER, one JSON event per line, replayable with the CLI) or, without
+one, put back at the head of the queue. A batch failing with any other error is not
+retried; it goes to the dead-letter file too, or is dropped without one. Point sums are
+clamped to the NUMERIC(6,2) range, so a player or team at the cap takes no error.
+
+Usage:
+    python ingest.py events.jsonl
+    nc -l 9000 | python ingest.py -        # one JSON event per line from a socket
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import datetime
+import threading
+from collections import deque
+from decimal import Decimal, InvalidOperation
+
+import pymysql
+
+from db import DB_CONFIG, RETRY_ERRORS
+from ids import reserve_ids
+from standings import refresh_team_standings
+
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_MAX_PENDING = 20000
+DEFAULT_FLUSH_INTERVAL = 0.2
+
+# tries per batch when its transaction is chosen as a deadlock victim or times out
+DEFAULT_WRITE_ATTEMPTS = 5
+
+MAX_EVENT_TYPE_LENGTH = 50
+
+# Player.FantasyPoints and Team.TotalPoints are NUMERIC(6,2)
+MAX_POINTS = Decimal('9999.99')
+
+
+class Backpressure(Exception):
+    """
+    Raised when the ingestion queue has no room for a batch within the wait timeout.
+    """
+
+
+def _parse_time(value):
+    if isinstance(value, datetime.time):
+        return value
+    try:
+        return datetime.time.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f"Invalid EventTime '{value}'. Use HH:MM:SS.")
+
+
+def _parse_id(row, column):
+    value = row.get(column)
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{column} must be an integer.")
+    if number < 1:
+        raise ValueError(f"{column} must be positive.")
+    return number
+
+
+def validate_event(row):
+    """
+    Check and normalise one incoming event.
+
+    :param row: A dictionary with EventType, EventTime, PlayerID, MatchID and ImpactFantasyPoint.
+    :return: The normalised event.
+    :raises ValueError: With a readable message when the event is invalid.
+    """
+    if not isinstance(row, dict):
+        raise ValueError("An event must be a JSON object.")
+
+    event_type = str(row.get('EventType') or 'Unknown').strip()
+    if len(event_type) > MAX_EVENT_TYPE_LENGTH:
+        raise ValueError(f"EventType is longer than {MAX_EVENT_TYPE_LENGTH} characters.")
+
+    if row.get('EventTime') in (None, ''):
+        raise ValueError("EventTime is required.")
+
+    try:
+        impact = Decimal(str(row.get('ImpactFantasyPoint', 0)))
+    except InvalidOperation:
+        raise ValueError("ImpactFantasyPoint must be a number.")
+    if not impact.is_finite() or abs(impact) >= 1000000:
+        raise ValueError("ImpactFantasyPoint is out of range.")
+
+    return {
+        'EventType': event_type,
+        'EventTime': _parse_time(row['EventTime']),
+        'PlayerID': _parse_id(row, 'PlayerID'),
+        'MatchID': _parse_id(row, 'MatchID'),
+        'ImpactFantasyPoint': impact,
+    }
+
+
+def validate_events(rows):
+    """
+    :param rows: A list of raw events.
+    :return: A (valid_events, errors) pair; errors are {'index', 'error'} dictionaries.
+    """
+    events = []
+    errors = []
+    for index, row in enumerate(rows):
+        try:
+            events.append(validate_event(row))
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+    return events, errors
+
+
+def apply_point_deltas(cursor, table, key, column, deltas, limit=MAX_POINTS):
+    """
+    Add a delta to one numeric column of many rows with a single UPDATE ... JOIN.
+
+    Rows are listed in key order so concurrent writers lock them in the same order. Sums are
+    clamped to +/- limit, as recompute.py and datagen.py clamp, so a row at the edge of its
+    column's range stays there instead of failing the whole statement.
+
+    :param table: 'Player' or 'Team'.
+    :param key: The key column, e.g. 'PlayerID'.
+    :param column: The column to increment, e.g. 'FantasyPoints'.
+    :param deltas: A dictionary mapping key to delta. Zero deltas are skipped.
+    :param limit: The largest absolute value the column holds.
+    """
+    items = sorted((k, d) for k, d in deltas.items() if d)
+    if not items:
+        return
+    derived = ' UNION ALL '.join(['SELECT %s AS RowKey, %s AS Delta'] * len(items))
+    params = [value for item in items for value in item]
+    cursor.execute(f"""
+        UPDATE {table} t
+        JOIN ({derived}) d ON t.{key} = d.RowKey
+        SET t.{column} = LEAST(GREATEST(t.{column} + d.Delta, %s), %s)
+    """, params + [-limit, limit])
+
+
+def _lock_player_teams(cursor, player_ids):
+    """
+    Lock players in key order.
+
+    :return: A list of rows with PlayerID, TeamID and FantasyPoints.
+    """
+    placeholders = ', '.join(['%s'] * len(player_ids))
+    cursor.execute(f"""
+        SELECT PlayerID, TeamID, FantasyPoints FROM Player
+        WHERE PlayerID IN ({placeholders})
+        ORDER BY PlayerID
+        FOR UPDATE
+    """, player_ids)
+    return cursor.fetchall()
+
+
+def _apply_player_deltas(cursor, rows, deltas):
+    player_deltas = {}
+    team_deltas = {}
+    for row in rows:
+        delta = deltas.get(row['PlayerID'])
+        if not delta:
+            continue
+        player_deltas[row['PlayerID']] = delta
+        if row['TeamID'] is not None:
+            team_deltas[row['TeamID']] = team_deltas.get(row['TeamID'], 0) + delta
+
+    apply_point_deltas(cursor, 'Player', 'PlayerID', 'FantasyPoints', player_deltas)
+    apply_point_deltas(cursor, 'Team', 'TeamID', 'TotalPoints', team_deltas)
+    refresh_team_standings(cursor, team_deltas)
+    return player_deltas
+
+
+def add_player_points(cursor, deltas):
+    """
+    Add changes to Player.FantasyPoints. The owning teams' TotalPoints move by the same
+    amounts and their leagues are re-ranked. Runs inside the caller's transaction.
+
+    The changes are added to whatever the players hold once they are locked, so points that
+    events add between the caller's read and the lock are kept.
+
+    :param deltas: A dictionary mapping PlayerID to the change (Decimal).
+    :return: A dictionary mapping PlayerID to the change applied, for the players that exist.
+    """
+    player_ids = sorted(player_id for player_id, delta in deltas.items() if delta)
+    if not player_ids:
+        return {}
+    return _apply_player_deltas(cursor, _lock_player_teams(cursor, player_ids), deltas)
+
+
+def set_player_points(cursor, points):
+    """
+    Set Player.FantasyPoints to recomputed values. The owning teams' TotalPoints move by the
+    same differences and their leagues are re-ranked. Runs inside the caller's transaction.
+
+    The players are locked in key order and the differences are taken from their points
+    under the lock, so the values overwrite whatever the players hold. The caller must
+    compute them under the same lock (recompute.py locks the players before summing their
+    events); targets computed from an earlier read would discard points added since, so
+    such callers pass differences to add_player_points instead.
+
+    :param points: A dictionary mapping PlayerID to the new FantasyPoints (Decimal).
+    :return: A dictionary mapping PlayerID to the change applied, for the players that changed.
+    """
+    player_ids = sorted(points)
+    if not player_ids:
+        return {}
+    rows = _lock_player_teams(cursor, player_ids)
+    deltas = {row['PlayerID']: points[row['PlayerID']] - (row['FantasyPoints'] or 0) for row in rows}
+    return _apply_player_deltas(cursor, rows, deltas)
+
+
+def write_batch(connection, events):
+    """
+    Store a batch of validated events and apply their fantasy point deltas, in one transaction.
+
+    Events for players or matches that do not exist are dropped and reported.
+
+    :param connection: MySQL connection object.
+    :param events: Events returned by validate_event.
+    :return: A (written, rejected) pair of counts.
+    """
+    if not events:
+        return 0, 0
+
+    player_ids = sorted({event['PlayerID'] for event in events})
+    match_ids = sorted({event['MatchID'] for event in events})
+
+    try:
+        with connection.cursor() as cursor:
+            # lock the players in key order; their TeamID decides which team gets the points
+            players = _lock_player_teams(cursor, player_ids)
+            known_players = {row['PlayerID'] for row in players}
+
+            placeholders = ', '.join(['%s'] * len(match_ids))
+            cursor.execute(f"SELECT MatchID FROM MatchDetail WHERE MatchID IN ({placeholders})", match_ids)
+            known_matches = {row['MatchID'] for row in cursor.fetchall()}
+
+            accepted = [event for event in events
+                        if event['PlayerID'] in known_players and event['MatchID'] in known_matches]
+            if accepted:
+                rows = [
+                    (event_id, event['EventType'], event['EventTime'], event['PlayerID'],
+                     event['MatchID'], event['ImpactFantasyPoint'])
+                    for event_id, event in zip(reserve_ids('MatchEvent', len(accepted)), accepted)
+                ]
+                cursor.executemany("""
+                    INSERT INTO MatchEvent (MatchEventID, EventType, EventTime, PlayerID, MatchID, ImpactFantasyPoint)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, rows)
+
+                player_deltas = {}
+                for event in accepted:
+                    impact = event['ImpactFantasyPoint']
+                    player_deltas[event['PlayerID']] = player_deltas.get(event['PlayerID'], 0) + impact
+                _apply_player_deltas(cursor, players, player_deltas)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+    return len(accepted), len(events) - len(accepted)
+
+
+class EventIngestor:
+    """
+    Bounded in-memory queue of events drained by one background writer thread.
+
+    :param batch_size: Maximum events written per transaction.
+    :param max_pending: Maximum events queued before submit() applies backpressure.
+    :param flush_interval: Seconds the writer waits for a batch to fill before writing what it has.
+    :param write_attempts: Tries per batch before a deadlock or lock wait timeout is given up on.
+    :param dead_letter: Path of a JSON Lines file for batches that still fail after those tries
+        (when None they are requeued instead) and for batches that fail otherwise.
+    :param connect_kwargs: Arguments passed through to pymysql.connect for the writer's connection.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, max_pending=DEFAULT_MAX_PENDING,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, write_attempts=DEFAULT_WRITE_ATTEMPTS,
+                 dead_letter=None, **connect_kwargs):
+        if batch_size < 1 or max_pending < batch_size:
+            raise ValueError("max_pending must be at least batch_size, which must be at least 1.")
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.write_attempts = max(1, write_attempts)
+        self.dead_letter = dead_letter
+        self.connect_kwargs = connect_kwargs or dict(DB_CONFIG)
+
+        self._pending = deque()
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._connection = None
+
+        # ingestion metrics
+        self._accepted = 0
+        self._written = 0
+        self._rejected = 0
+        self._failed = 0
+        self._retries = 0
+        self._requeued = 0
+        self._dead_lettered = 0
+        self._batches = 0
+        self._refused = 0
+        self._write_time = 0.0
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='event-ingestor', daemon=True)
+            self._thread.start()
+
+    def submit(self, events, timeout=0.0):
+        """
+        Queue validated events for writing.
+
+        :param events: Events returned by validate_event.
+        :param timeout: Seconds to wait for room in the queue; None waits indefinitely.
+        :raises Backpressure: If the queue has no room for the whole batch in time.
+        """
+        if len(events) > self.max_pending:
+            raise ValueError(f"A batch may contain at most {self.max_pending} events.")
+        self.start()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while len(self._pending) + len(events) > self.max_pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._refused += len(events)
+                    raise Backpressure("The ingestion queue is full, retry shortly.")
+                self._cond.wait(remaining)
+            self._pending.extend(events)
+            self._accepted += len(events)
+            self._cond.notify_all()
+
+    def _take_batch(self):
+        """
+        Wait for events and take up to batch_size of them. Must be called with the lock held.
+        """
+        if not self._pending and not self._stopping:
+            self._cond.wait()
+        # give a partial batch a moment to fill up
+        deadline = time.monotonic() + self.flush_interval
+        while len(self._pending) < self.batch_size and not self._stopping:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._cond.wait(remaining)
+
+        batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+        self._in_flight = len(batch)
+        self._cond.notify_all()
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopping and not self._pending:
+                    return
+                batch = self._take_batch()
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        written = rejected = failed = retries = 0
+        requeue = False
+        for attempt in range(1, self.write_attempts + 1):
+            try:
+                if self._connection is None or not self._connection.open:
+                    self._connection = pymysql.connect(**self.connect_kwargs)
+                written, rejected = write_batch(self._connection, batch)
+                break
+            except pymysql.err.OperationalError as e:
+                if e.args[0] in RETRY_ERRORS:
+                    if attempt < self.write_attempts:
+                        retries += 1
+                        time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+                        continue
+                    logging.warning(f"Gave up writing {len(batch)} match events after {attempt} attempts: {e}")
+                    requeue = not self._write_dead_letter(batch)
+                    break
+                logging.error(f"Failed to write {len(batch)} match events: {e}")
+                failed = 0 if self._write_dead_letter(batch) else len(batch)
+                self._drop_connection()
+                break
+            except Exception as e:
+                logging.error(f"Failed to write {len(batch)} match events: {e}")
+                failed = 0 if self._write_dead_letter(batch) else len(batch)
+                if isinstance(e, pymysql.err.InterfaceError):
+                    self._drop_connection()
+                break
+
+        with self._cond:
+            if requeue:
+                self._pending.extendleft(reversed(batch))
+                self._requeued += len(batch)
+            self._written += written
+            self._rejected += rejected
+            self._failed += failed
+            self._retries += retries
+            self._batches += 1
+            self._write_time += time.perf_counter() - start
+            self._in_flight = 0
+            self._cond.notify_all()
+
+    def _drop_connection(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except pymysql.err.Error:
+                pass  # already closed by the server
+            self._connection = None
+
+    def _write_dead_letter(self, batch):
+        """
+        Append a batch to the dead-letter file, in the CLI's input format.
+
+        :return: True if the batch was written there; False without a file or on an I/O error.
+        """
+        if not self.dead_letter:
+            return False
+        try:
+            with open(self.dead_letter, 'a', encoding='utf-8') as f:
+                for event in batch:
+                    f.write(json.dumps({
+                        'EventType': event['EventType'],
+                        'EventTime': event['EventTime'].isoformat(),
+                        'PlayerID': event['PlayerID'],
+                        'MatchID': event['MatchID'],
+                        'ImpactFantasyPoint': str(event['ImpactFantasyPoint']),
+                    }) + '\n')
+        except OSError as e:
+            logging.error(f"Failed to write {len(batch)} match events to {self.dead_letter}: {e}")
+            return False
+        with self._cond:
+            self._dead_lettered += len(batch)
+        return True
+
+    def flush(self, timeout=None):
+        """
+        Wait until every queued event has been written.
+
+        :return: True if the queue drained within the timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout=None):
+        """
+        Write what is queued, then stop the writer thread.
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def stats(self):
+        """
+        Snapshot of the ingestion metrics.
+
+        :return: A dictionary of counters and gauges.
+        """
+        with self._cond:
+            return {
+                'pending': len(self._pending),
+                'max_pending': self.max_pending,
+                'accepted': self._accepted,
+                'written': self._written,
+                'rejected': self._rejected,
+                'failed': self._failed,
+                'retries': self._retries,
+                'requeued': self._requeued,
+                'dead_lettered': self._dead_lettered,
+                'refused': self._refused,
+                'batches': self._batches,
+                'write_time_total': self._write_time,
+            }
+
+
+def init_app(app):
+    """
+    Create the application's event ingestor. Settings are read from app.config
+    (INGEST_BATCH_SIZE, INGEST_MAX_PENDING, INGEST_FLUSH_INTERVAL, INGEST_DEAD_LETTER, INGEST_TOKEN)
+    with environment fallbacks.
+    The writer thread starts with the first submitted batch.
+    """
+    app.config.setdefault('INGEST_BATCH_SIZE', int(os.environ.get('FSL_INGEST_BATCH_SIZE', DEFAULT_BATCH_SIZE)))
+    app.config.setdefault('INGEST_MAX_PENDING', int(os.environ.get('FSL_INGEST_MAX_PENDING', DEFAULT_MAX_PENDING)))
+    app.config.setdefault('INGEST_FLUSH_INTERVAL',
+                          float(os.environ.get('FSL_INGEST_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)))
+    app.config.setdefault('INGEST_DEAD_LETTER', os.environ.get('FSL_INGEST_DEAD_LETTER'))
+    app.config.setdefault('INGEST_TOKEN', os.environ.get('FSL_INGEST_TOKEN'))
+
+    app.extensions['event_ingestor'] = EventIngestor(
+        batch_size=app.config['INGEST_BATCH_SIZE'],
+        max_pending=app.config['INGEST_MAX_PENDING'],
+        flush_interval=app.config['INGEST_FLUSH_INTERVAL'],
+        dead_letter=app.config['INGEST_DEAD_LETTER'],
+        **DB_CONFIG
+    )
+
+
+def read_feed(stream):
+    """
+    Parse a feed of one JSON event per line.
+
+    :return: A generator of (line_number, event_or_error) pairs; invalid lines yield a ValueError.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, validate_event(json.loads(line))
+        except ValueError as e:
+            yield line_number, e
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Ingest match events from a JSON Lines file or stdin.")
+    parser.add_argument('path', help="a .jsonl file, or - for stdin")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING)
+    parser.add_argument('--dead-letter', default=os.environ.get('FSL_INGEST_DEAD_LETTER'),
+                        help="file for batches that keep deadlocking (default: retry them until they go through)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    ingestor = EventIngestor(batch_size=args.batch_size, max_pending=args.max_pending, dead_letter=args.dead_letter)
+    stream = sys.stdin if args.path == '-' else open(args.path, encoding='utf-8')
+    invalid = 0
+    try:
+        chunk = []
+        for line_number, event in read_feed(stream):
+            if isinstance(event, ValueError):
+                invalid += 1
+                print(f"line {line_number}: {event}", file=sys.stderr)
+                continue
+            chunk.append(event)
+            if len(chunk) >= args.batch_size:
+                # a slow database blocks the reader instead of growing the queue
+                ingestor.submit(chunk, timeout=None)
+                chunk = []
+        if chunk:
+            ingestor.submit(chunk, timeout=None)
+        ingestor.flush()
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        ingestor.stop()
+
+    stats = ingestor.stats()
+    print(f"{stats['written']} events written in {stats['batches']} batches, "
+          f"{stats['rejected']} for unknown players or matches, {stats['failed']} failed, {invalid} invalid, "
+          f"{stats['retries']} retries, {stats['dead_lettered']} sent to the dead-letter file.")
+    return 0 if not (stats['failed'] or stats['rejected'] or stats['dead_lettered'] or invalid) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,342 @@
+"""
+Per-request instrumentation, exported in the Prometheus text format at /metrics.
+
+The pool's connections are made with InstrumentedConnection, which times every statement
+sent while a request is active (including the hidden SET/CALL statements of callproc and
+the extra result sets of a procedure) and counts the rows it returned. Template rendering
+is timed through Flask's render signals, and the time spent getting a pooled connection
+comes from db.get_db. At the end of the request the totals are added to per-endpoint
+histograms.
+
+Modes (METRICS_MODE, environment FSL_METRICS):
+  * 'basic' (default): per-endpoint request, DB, connect and render time, statement and
+    row counts. Costs two perf_counter() calls per statement; safe for production.
+  * 'detailed': also splits DB time by stored procedure or statement type, e.g. to see how
+    much of /draft/new is StartDraft. Parses the start of every statement.
+  * 'off': nothing is recorded; /metrics only reports the pool and cache gauges.
+
+The slow-query log and repeated-query detector (querylog.py) use the same hook.
+"""
+import os
+import time
+import threading
+
+import pymysql
+from flask import g, request, before_render_template, template_rendered
+
+
+MODES = ('off', 'basic', 'detailed')
+
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+# the current request's RequestStats, per thread
+_current = threading.local()
+
+
+class RequestStats:
+    """
+    Totals of one request, filled in while it runs.
+
+    With a query log (querylog.py) attached, slow statements are reported as they finish
+    and, for sampled requests, every statement and connection is kept for the repeat check.
+    """
+    __slots__ = ('statements', 'rows', 'db_time', 'render_time', 'render_started', 'by_statement', 'detailed',
+                 'route', 'query_log', 'log', 'connections')
+
+    def __init__(self, detailed=False, route=None, query_log=None):
+        self.statements = 0
+        self.rows = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.render_started = None
+        self.by_statement = {}  # procedure or statement type -> [count, seconds]
+        self.detailed = detailed
+        self.route = route
+        self.query_log = query_log
+        sampled = query_log is not None and query_log.sample()
+        self.log = [] if sampled else None  # (sql, seconds) per statement
+        self.connections = set() if sampled else None
+
+    def add(self, sql, elapsed, result, statement=True, connection=None):
+        if statement:
+            self.statements += 1
+        self.db_time += elapsed
+        if result is not None and result.rows is not None:
+            self.rows += len(result.rows)
+        if sql is None:
+            return
+        if self.detailed:
+            totals = self.by_statement.setdefault(statement_label(sql), [0, 0.0])
+            totals[0] += 1
+            totals[1] += elapsed
+        if self.query_log is not None:
+            if elapsed >= self.query_log.slow_threshold:
+                self.query_log.slow(self.route, sql, elapsed)
+            if self.log is not None:
+                self.log.append((sql, elapsed))
+                self.connections.add(id(connection))
+
+
+def statement_label(sql):
+    """
+    'CALL GetMatches(...)' -> 'GetMatches'; other statements -> their verb, e.g. 'SELECT'.
+    """
+    if isinstance(sql, bytes):
+        sql = sql[:200].decode('utf-8', 'replace')
+    words = sql.lstrip(' \t\r\n(').split(None, 1)
+    if not words:
+        return 'OTHER'
+    verb = words[0].upper()
+    if verb == 'CALL' and len(words) > 1:
+        return words[1].split('(', 1)[0].strip().strip('`')
+    return verb
+
+
+def current_stats():
+    """
+    :return: The RequestStats of the request running on this thread, or None.
+    """
+    return getattr(_current, 'stats', None)
+
+
+class InstrumentedConnection(pymysql.connections.Connection):
+    """
+    A pymysql connection that records its statements in the current request's stats.
+    Outside a request it behaves exactly like a plain connection.
+    """
+
+    def query(self, sql, unbuffered=False):
+        stats = getattr(_current, 'stats', None)
+        if stats is None:
+            return super().query(sql, unbuffered)
+        start = time.perf_counter()
+        try:
+            return super().query(sql, unbuffered)
+        finally:
+            stats.add(sql, time.perf_counter() - start, self._result, connection=self)
+
+    def next_result(self, unbuffered=False):
+        stats = getattr(_current, 'stats', None)
+        if stats is None:
+            return super().next_result(unbuffered)
+        start = time.perf_counter()
+        try:
+            return super().next_result(unbuffered)
+        finally:
+            # further result sets of the same CALL, counted in its time but not as a statement
+            stats.add(None, time.perf_counter() - start, self._result, statement=False)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Histogram:
+    """
+    A Prometheus histogram with a fixed set of buckets per label combination.
+    """
+
+    def __init__(self, name, documentation, buckets, labels=('endpoint',)):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labels = labels
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, label_values, value):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for label_values, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(self.labels, label_values, ("le", bound))} {cumulative}')
+            lines.append(f'{self.name}_bucket{_labels(self.labels, label_values, ("le", "+Inf"))} {series[-1]}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, label_values)} {series[-2]}')
+            lines.append(f'{self.name}_count{_labels(self.labels, label_values)} {series[-1]}')
+        return lines
+
+
+class Counter:
+    """
+    A Prometheus counter per label combination.
+    """
+
+    def __init__(self, name, documentation, labels=('endpoint',)):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._series = {}
+
+    def inc(self, label_values, amount=1):
+        self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for label_values, value in sorted(self._series.items()):
+            lines.append(f'{self.name}{_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+class RequestMetrics:
+    """
+    Per-endpoint aggregates of the finished requests.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = Counter('fsl_requests_total', 'Requests handled.', ('endpoint', 'status'))
+        self.duration = Histogram('fsl_request_duration_seconds', 'Time to handle a request.', DURATION_BUCKETS)
+        self.db_time = Histogram('fsl_request_db_seconds', 'Time per request spent in database statements.',
+                                 DURATION_BUCKETS)
+        self.connect_time = Histogram('fsl_request_db_connect_seconds',
+                                      'Time per request spent getting a pooled connection.', DURATION_BUCKETS)
+        self.render_time = Histogram('fsl_request_render_seconds', 'Time per request spent rendering templates.',
+                                     DURATION_BUCKETS)
+        self.statements = Histogram('fsl_request_statements', 'SQL statements sent per request.', STATEMENT_BUCKETS)
+        self.rows = Counter('fsl_request_rows_fetched_total', 'Rows returned by the database.')
+        self.statement_time = Counter('fsl_db_statement_seconds_total',
+                                      'Database time by stored procedure or statement type (detailed mode).',
+                                      ('endpoint', 'statement'))
+        self.statement_count = Counter('fsl_db_statements_total',
+                                       'Statements by stored procedure or statement type (detailed mode).',
+                                       ('endpoint', 'statement'))
+
+    def record(self, endpoint, status, duration, stats, connect_time):
+        key = (endpoint,)
+        with self._lock:
+            self.requests.inc((endpoint, str(status)))
+            self.duration.observe(key, duration)
+            self.db_time.observe(key, stats.db_time)
+            self.connect_time.observe(key, connect_time)
+            self.render_time.observe(key, stats.render_time)
+            self.statements.observe(key, stats.statements)
+            self.rows.inc(key, stats.rows)
+            for label, (count, seconds) in stats.by_statement.items():
+                self.statement_count.inc((endpoint, label), count)
+                self.statement_time.inc((endpoint, label), seconds)
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.duration, self.db_time, self.connect_time, self.render_time,
+                           self.statements, self.rows, self.statement_count, self.statement_time):
+                lines.extend(metric.render())
+            return lines
+
+
+def _gauges(name, documentation, values, labels=None):
+    lines = [f'# HELP {name} {documentation}', f'# TYPE {name} gauge']
+    for label, value in values:
+        lines.append(f'{name}{_labels((labels,), (label,)) if labels else ""} {value}')
+    return lines
+
+
+def render_metrics(app):
+    """
+    The request metrics plus the pool, cache, ingestion and search index gauges, in the Prometheus text format.
+    """
+    from utils import match_cache
+    from page_cache import page_cache
+
+    lines = app.extensions['request_metrics'].render()
+
+    pool = app.extensions['db_pool'].stats()
+    lines += _gauges('fsl_db_pool', 'Connection pool counters and gauges.',
+                     [(key, value) for key, value in sorted(pool.items())], 'stat')
+    for name, cache in (('match', match_cache), ('page', page_cache)):
+        lines += _gauges(f'fsl_{name}_cache', f'{name.capitalize()} cache counters and gauges.',
+                         sorted(cache.stats().items()), 'stat')
+    ingestor = app.extensions.get('event_ingestor')
+    if ingestor is not None:
+        lines += _gauges('fsl_ingest', 'Match event ingestion counters and gauges.',
+                         sorted(ingestor.stats().items()), 'stat')
+    search_index = app.extensions.get('player_search')
+    if search_index is not None:
+        lines += _gauges('fsl_player_search', 'Player search index counters and gauges.',
+                         sorted(search_index.stats().items()), 'stat')
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """
+    Install the instrumentation. The mode is read from app.config (METRICS_MODE) with the
+    FSL_METRICS environment variable as fallback. Call it after db.init_app and, when the
+    query log is used, after querylog.init_app.
+    """
+    app.config.setdefault('METRICS_MODE', os.environ.get('FSL_METRICS', 'basic'))
+    app.config.setdefault('METRICS_TOKEN', os.environ.get('FSL_METRICS_TOKEN'))
+    mode = app.config['METRICS_MODE']
+    if mode not in MODES:
+        raise ValueError(f"Invalid METRICS_MODE '{mode}'. Use 'off', 'basic' or 'detailed'.")
+
+    app.extensions['request_metrics'] = RequestMetrics()
+    query_log = app.extensions.get('query_log')
+    if mode == 'off' and query_log is None:
+        return
+
+    pool = app.extensions['db_pool']
+    pool.close_all()
+    pool.connection_class = InstrumentedConnection
+    detailed = mode == 'detailed'
+
+    @app.before_request
+    def start_request():
+        _current.stats = RequestStats(detailed=detailed, route=f'{request.method} {request.endpoint or "unmatched"}',
+                                      query_log=query_log)
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def remember_status(response):
+        g.response_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_request(exception=None):
+        stats = getattr(_current, 'stats', None)
+        _current.stats = None
+        started = g.get('request_started')
+        if stats is None or started is None:
+            return
+        status = 500 if exception is not None else g.get('response_status', 500)
+        if mode != 'off':
+            app.extensions['request_metrics'].record(
+                request.endpoint or 'unmatched', status, time.perf_counter() - started, stats,
+                g.get('db_acquire_time', 0.0)
+            )
+        if stats.log is not None:
+            query_log.analyze(stats.route, stats.log, len(stats.connections))
+
+    def render_started(sender, template, context, **extra):
+        stats = getattr(_current, 'stats', None)
+        if stats is not None:
+            stats.render_started = time.perf_counter()
+
+    def render_finished(sender, template, context, **extra):
+        stats = getattr(_current, 'stats', None)
+        if stats is not None and stats.render_started is not None:
+            stats.render_time += time.perf_counter() - stats.render_started
+            stats.render_started = None
+
+    before_render_template.connect(render_started, app, weak=False)
+    template_rendered.connect(render_finished, app, weak=False)
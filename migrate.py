@@ -0,0 +1,135 @@
+"""
+Apply the versioned schema migrations in migrations/ to the FSL database.
+
+COMMANDS.sql creates the baseline schema and data; every later schema change lives in
+migrations/NNN_description.sql and is applied once, in order, by this script.
+Applied versions are recorded in the SchemaVersion table.
+
+Usage:
+    python migrate.py            # apply all pending migrations
+    python migrate.py --list     # show applied and pending migrations
+"""
+import os
+import re
+import sys
+import logging
+
+import pymysql
+
+from db import DB_CONFIG
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+def split_statements(sql):
+    """
+    Split a SQL script into statements, honouring mysql-client style DELIMITER lines
+    so that procedure and trigger bodies are kept whole.
+
+    :param sql: The script text.
+    :return: A list of statements without their trailing delimiter.
+    """
+    statements = []
+    delimiter = ';'
+    buffer = []
+
+    for line in sql.splitlines():
+        stripped = line.strip()
+        match = re.match(r'^DELIMITER\s+(\S+)\s*$', stripped, re.IGNORECASE)
+        if match:
+            delimiter = match.group(1)
+            continue
+        if not buffer and (not stripped or stripped.startswith('--')):
+            continue
+
+        buffer.append(line)
+        if stripped.endswith(delimiter):
+            statement = '\n'.join(buffer).rstrip()
+            statement = statement[:-len(delimiter)].strip()
+            if statement:
+                statements.append(statement)
+            buffer = []
+
+    leftover = '\n'.join(buffer).strip()
+    if leftover:
+        statements.append(leftover)
+    return statements
+
+
+def list_migrations():
+    """
+    :return: A sorted list of (version, path) pairs found in migrations/.
+    """
+    migrations = []
+    for name in os.listdir(MIGRATIONS_DIR):
+        match = re.match(r'^(\d+)_.*\.sql$', name)
+        if match:
+            migrations.append((match.group(1), os.path.join(MIGRATIONS_DIR, name)))
+    return sorted(migrations)
+
+
+def applied_versions(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS SchemaVersion (
+                Version VARCHAR(10) PRIMARY KEY,
+                Name VARCHAR(255) NOT NULL,
+                AppliedAt DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("SELECT Version FROM SchemaVersion")
+        return {row['Version'] for row in cursor.fetchall()}
+
+
+def migrate(connection):
+    """
+    Apply every pending migration in order. Each file is recorded only after all of its
+    statements succeed.
+
+    :param connection: MySQL connection object.
+    :return: The list of versions applied.
+    """
+    done = applied_versions(connection)
+    applied = []
+
+    for version, path in list_migrations():
+        if version in done:
+            continue
+        with open(path, encoding='utf-8') as f:
+            statements = split_statements(f.read())
+
+        logging.info(f"Applying migration {os.path.basename(path)} ({len(statements)} statements)")
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO SchemaVersion (Version, Name) VALUES (%s, %s)",
+                (version, os.path.basename(path))
+            )
+        connection.commit()
+        applied.append(version)
+
+    return applied
+
+
+def main(argv):
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        if '--list' in argv:
+            done = applied_versions(connection)
+            for version, path in list_migrations():
+                state = 'applied' if version in done else 'pending'
+                print(f"{os.path.basename(path)}: {state}")
+            return 0
+
+        applied = migrate(connection)
+        print(f"Applied {len(applied)} migration(s).")
+        return 0
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
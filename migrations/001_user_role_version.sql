@@ -0,0 +1,20 @@
+-- Role version stamp for cached session roles.
+-- The app caches User.Position in the session together with RoleVersion and
+-- reloads it once the stamp no longer matches.
+
+ALTER TABLE User ADD COLUMN RoleVersion INT NOT NULL DEFAULT 0;
+
+
+-- Bump RoleVersion whenever a user's Position changes, so cached roles go stale
+DELIMITER //
+
+CREATE OR REPLACE TRIGGER trg_user_role_version
+BEFORE UPDATE ON User
+FOR EACH ROW
+BEGIN
+    IF NOT (NEW.Position <=> OLD.Position) THEN
+        SET NEW.RoleVersion = OLD.RoleVersion + 1;
+    END IF;
+END //
+
+DELIMITER ;
@@ -0,0 +1,38 @@
+-- Keyset pagination for the player listing.
+-- Every sort order of /players is (sort column, PlayerID); these indexes let each page
+-- seek straight to its first row instead of scanning and discarding earlier ones.
+
+UPDATE Player SET FantasyPoints = 0.00 WHERE FantasyPoints IS NULL;
+ALTER TABLE Player MODIFY FantasyPoints NUMERIC(6,2) NOT NULL DEFAULT 0.00;
+
+CREATE INDEX idx_player_name ON Player (FullName, PlayerID);
+CREATE INDEX idx_player_points ON Player (FantasyPoints, PlayerID);
+CREATE INDEX idx_player_sport ON Player (Sport, PlayerID);
+
+
+-- GetAllPlayerStats without the needless DISTINCT (PlayerID is the primary key)
+DELIMITER //
+
+CREATE OR REPLACE PROCEDURE GetAllPlayerStats(
+    IN order_by_field VARCHAR(50)
+)
+BEGIN
+    IF order_by_field = 'Name' THEN
+        SELECT p.PlayerID, p.FullName, p.PhotoURL, p.Sport, p.FantasyPoints
+        FROM Player p
+        ORDER BY p.FullName ASC, p.PlayerID ASC;
+    ELSEIF order_by_field = 'Fantasy Points' THEN
+        SELECT p.PlayerID, p.FullName, p.PhotoURL, p.Sport, p.FantasyPoints
+        FROM Player p
+        ORDER BY p.FantasyPoints DESC, p.PlayerID DESC;
+    ELSEIF order_by_field = 'Sport' THEN
+        SELECT p.PlayerID, p.FullName, p.PhotoURL, p.Sport, p.FantasyPoints
+        FROM Player p
+        ORDER BY p.Sport ASC, p.PlayerID ASC;
+    ELSE
+        -- if the order_by_field is invalid, return an error message
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Invalid order_by_field. Use "Name", "Fantasy Points", or "Sport".';
+    END IF;
+END //
+
+DELIMITER ;
@@ -0,0 +1,68 @@
+-- Seek pagination for /trade and /draft, with listing totals kept in a counter table.
+--
+-- RowCounter is sharded on CONNECTION_ID() so concurrent writers update different rows
+-- instead of queueing on one hot counter row; the total is the sum over the shards.
+
+CREATE TABLE RowCounter (
+    Name VARCHAR(50) NOT NULL,
+    Shard TINYINT NOT NULL,
+    Total BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Name, Shard)
+);
+
+INSERT INTO RowCounter (Name, Shard, Total)
+SELECT 'PlayerTrade', 0, COUNT(*) FROM PlayerTrade;
+
+INSERT INTO RowCounter (Name, Shard, Total)
+SELECT 'Draft', 0, COUNT(*) FROM Draft;
+
+
+DELIMITER //
+
+CREATE OR REPLACE TRIGGER trg_count_playertrade_insert
+AFTER INSERT ON PlayerTrade
+FOR EACH ROW
+BEGIN
+    INSERT INTO RowCounter (Name, Shard, Total)
+    VALUES ('PlayerTrade', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Total = Total + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_count_playertrade_delete
+AFTER DELETE ON PlayerTrade
+FOR EACH ROW
+BEGIN
+    INSERT INTO RowCounter (Name, Shard, Total)
+    VALUES ('PlayerTrade', CONNECTION_ID() % 16, -1)
+    ON DUPLICATE KEY UPDATE Total = Total - 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_count_draft_insert
+AFTER INSERT ON Draft
+FOR EACH ROW
+BEGIN
+    INSERT INTO RowCounter (Name, Shard, Total)
+    VALUES ('Draft', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Total = Total + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_count_draft_delete
+AFTER DELETE ON Draft
+FOR EACH ROW
+BEGIN
+    INSERT INTO RowCounter (Name, Shard, Total)
+    VALUES ('Draft', CONNECTION_ID() % 16, -1)
+    ON DUPLICATE KEY UPDATE Total = Total - 1;
+END //
+
+DELIMITER ;
+
+
+-- Seek indexes for each sort mode of /trade and /draft
+CREATE INDEX idx_trade_date ON Trade (TradeDate, TradeID);
+CREATE INDEX idx_playertrade_player ON PlayerTrade (PlayerID, TradeID);
+
+CREATE INDEX idx_draft_date ON Draft (DraftDate, DraftID);
+CREATE INDEX idx_draft_order ON Draft (DraftOrder, DraftID);
+CREATE INDEX idx_draft_status ON Draft (DraftStatus, DraftID);
+CREATE INDEX idx_league_type ON League (LeagueType, LeagueID);
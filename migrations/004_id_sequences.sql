@@ -0,0 +1,275 @@
+-- Sequence-table ID allocation, replacing the MAX(ID) + 1 triggers.
+--
+-- The app reserves blocks of IDs per process (ids.py) on its own autocommit connection,
+-- so the IdSequence row is locked only for the length of one UPDATE. The triggers stay
+-- as a fallback for inserts that do not supply an ID (ad hoc SQL, RegisterNewUser).
+-- The keys are NUMERIC(8)/NUMERIC(10) with foreign keys pointing at them, so they are
+-- kept as they are instead of being converted to AUTO_INCREMENT integers.
+
+CREATE TABLE IdSequence (
+    Name VARCHAR(30) PRIMARY KEY,
+    NextID BIGINT NOT NULL
+);
+
+INSERT INTO IdSequence (Name, NextID) SELECT 'League', IFNULL(MAX(LeagueID), 0) + 1 FROM League;
+INSERT INTO IdSequence (Name, NextID) SELECT 'Team', IFNULL(MAX(TeamID), 0) + 1 FROM Team;
+INSERT INTO IdSequence (Name, NextID) SELECT 'Trade', IFNULL(MAX(TradeID), 0) + 1 FROM Trade;
+INSERT INTO IdSequence (Name, NextID) SELECT 'User', IFNULL(MAX(UserID), 0) + 1 FROM User;
+INSERT INTO IdSequence (Name, NextID) SELECT 'Player', IFNULL(MAX(PlayerID), 0) + 1 FROM Player;
+INSERT INTO IdSequence (Name, NextID) SELECT 'Waiver', IFNULL(MAX(WaiverID), 0) + 1 FROM Waiver;
+INSERT INTO IdSequence (Name, NextID) SELECT 'PlayerStats', IFNULL(MAX(StatsID), 0) + 1 FROM PlayerStats;
+INSERT INTO IdSequence (Name, NextID) SELECT 'MatchEvent', IFNULL(MAX(MatchEventID), 0) + 1 FROM MatchEvent;
+INSERT INTO IdSequence (Name, NextID) SELECT 'Draft', IFNULL(MAX(DraftID), 0) + 1 FROM Draft;
+
+
+DELIMITER //
+
+-- Take one ID from a sequence. Used by the fallback triggers and procedures.
+CREATE OR REPLACE FUNCTION NextId(p_Name VARCHAR(30))
+RETURNS BIGINT
+NOT DETERMINISTIC
+MODIFIES SQL DATA
+BEGIN
+    DECLARE v_ID BIGINT;
+
+    UPDATE IdSequence SET NextID = NextID + 1 WHERE Name = p_Name;
+    SELECT NextID - 1 INTO v_ID FROM IdSequence WHERE Name = p_Name;
+
+    RETURN v_ID;
+END //
+
+CREATE OR REPLACE TRIGGER trg_increment_league_id
+BEFORE INSERT ON League
+FOR EACH ROW
+BEGIN
+    IF NEW.LeagueID IS NULL OR NEW.LeagueID = 0 THEN
+        SET NEW.LeagueID = NextId('League');
+    END IF;
+END //
+
+CREATE OR REPLACE TRIGGER trg_increment_team_id
+BEFORE INSERT ON Team
+FOR EACH ROW
+BEGIN
+    IF NEW.TeamID IS NULL OR NEW.TeamID = 0 THEN
+        SET NEW.TeamID = NextId('Team');
+    END IF;
+END //
+
+CREATE OR REPLACE TRIGGER trg_increment_trade_id
+BEFORE INSERT ON Trade
+FOR EACH ROW
+BEGIN
+    IF NEW.TradeID IS NULL OR NEW.TradeID = 0 THEN
+        SET NEW.TradeID = NextId('Trade');
+    END IF;
+END //
+
+CREATE OR REPLACE TRIGGER trg_increment_user_id
+BEFORE INSERT ON User
+FOR EACH ROW
+BEGIN
+    IF NEW.UserID IS NULL OR NEW.UserID = 0 THEN
+        SET NEW.UserID = NextId('User');
+    END IF;
+END //
+
+CREATE OR REPLACE TRIGGER trg_increment_player_id
+BEFORE INSERT ON Player
+FOR EACH ROW
+BEGIN
+    IF NEW.PlayerID IS NULL OR NEW.PlayerID = 0 THEN
+        SET NEW.PlayerID = NextId('Player');
+    END IF;
+END //
+
+CREATE OR REPLACE TRIGGER trg_increment_waiver_id
+BEFORE INSERT ON Waiver
+FOR EACH ROW
+BEGIN
+    IF NEW.WaiverID IS NULL OR NEW.WaiverID = 0 THEN
+        SET NEW.WaiverID = NextId('Waiver');
+    END IF;
+END //
+
+CREATE OR REPLACE TRIGGER trg_increment_playerstats_id
+BEFORE INSERT ON PlayerStats
+FOR EACH ROW
+BEGIN
+    IF NEW.StatsID IS NULL OR NEW.StatsID = 0 THEN
+        SET NEW.StatsID = NextId('PlayerStats');
+    END IF;
+END //
+
+CREATE OR REPLACE TRIGGER trg_increment_matchevent_id
+BEFORE INSERT ON MatchEvent
+FOR EACH ROW
+BEGIN
+    IF NEW.MatchEventID IS NULL OR NEW.MatchEventID = 0 THEN
+        SET NEW.MatchEventID = NextId('MatchEvent');
+    END IF;
+END //
+
+
+-- The caller now supplies the TradeID (reserved by the app); NULL falls back to the sequence.
+-- Replaces the @new_trade_id session variable set by the old Trade trigger.
+CREATE OR REPLACE PROCEDURE ExecuteTrade(
+    IN p_UserID INT,
+    IN p_SellerTeamID INT,
+    IN p_PlayerID INT,
+    IN p_YourPlayerID INT,
+    IN p_TradeDate DATE,
+    IN p_TradeID BIGINT
+)
+BEGIN
+    DECLARE v_BuyerTeamID INT;
+    DECLARE v_NewTradeID BIGINT;
+
+    START TRANSACTION;
+
+    -- get the buyer team ID
+    SELECT TeamID INTO v_BuyerTeamID
+    FROM Team
+    WHERE Manager = p_UserID
+    LIMIT 1;
+
+    -- validate the buyer team
+    IF v_BuyerTeamID IS NULL THEN
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Buyer team not found for the given UserID.';
+    END IF;
+
+    -- insert a new trade record
+    SET v_NewTradeID = IFNULL(p_TradeID, NextId('Trade'));
+    INSERT INTO Trade (TradeID, TradeDate) VALUES (v_NewTradeID, p_TradeDate);
+
+    -- update the player's team ID and availability status to the buyer team
+    UPDATE Player
+    SET TeamID = v_BuyerTeamID, AvaiStatus = 'U'
+    WHERE PlayerID = p_PlayerID;
+
+    -- update the user's player's team ID and availability status to the seller team
+    UPDATE Player
+    SET TeamID = p_SellerTeamID, AvaiStatus = 'A'
+    WHERE PlayerID = p_YourPlayerID;
+
+    -- insert player trade records
+    INSERT INTO PlayerTrade (TradeID, PlayerID, FromOrTo)
+    VALUES
+        (v_NewTradeID, p_PlayerID, 'To'),
+        (v_NewTradeID, p_YourPlayerID, 'From');
+
+    -- insert team trade records
+    INSERT INTO TeamTrade (TradeID, TeamID, InOrOut)
+    VALUES
+        (v_NewTradeID, v_BuyerTeamID, 'In'),
+        (v_NewTradeID, p_SellerTeamID, 'Out');
+
+    COMMIT;
+END //
+
+
+-- StartDraft takes its DraftID from the sequence as well.
+CREATE OR REPLACE PROCEDURE StartDraft(
+    IN p_LeagueID INT,            -- LeagueID
+    IN p_DraftDate DATE,         -- Draft Date
+    IN p_Order CHAR(1)            -- Type of draft order ('R' for round-robin, 'S' for snake)
+)
+BEGIN
+    DECLARE v_DraftID INT;
+    DECLARE team_count INT;
+    DECLARE player_count INT DEFAULT 0;
+    DECLARE round INT DEFAULT 1;
+    DECLARE team_index INT;
+    DECLARE current_team_id INT;
+    DECLARE current_player_id INT;
+
+    START TRANSACTION;
+
+    -- Step 1: check if the LeagueID exists
+    IF NOT EXISTS (SELECT 1 FROM League WHERE LeagueID = p_LeagueID) THEN
+        ROLLBACK;
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'LeagueID does not exist.';
+    END IF;
+
+    -- Step 2: assign a new DraftID
+    SET v_DraftID = NextId('Draft');
+
+    -- Step 3: insert a new draft record
+    INSERT INTO Draft (DraftID, LeagueID, DraftDate, DraftOrder, DraftStatus)
+    VALUES (v_DraftID, p_LeagueID, p_DraftDate, p_Order, 'I');
+
+    -- Step 4: create a temporary table TempTeamOrder, order by LeagueRanking
+    CREATE TEMPORARY TABLE TempTeamOrder AS
+        SELECT TeamID, ROW_NUMBER() OVER (ORDER BY LeagueRanking ASC) AS RowNum
+        FROM Team
+        WHERE LeagueID = p_LeagueID;
+
+    -- Step 5: get the number of teams
+    SELECT COUNT(*) INTO team_count FROM TempTeamOrder;
+
+    -- Step 6: check if there are teams in the league
+    IF team_count = 0 THEN
+        DROP TEMPORARY TABLE TempTeamOrder;
+        ROLLBACK;
+        SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'No teams found for the specified LeagueID.';
+    END IF;
+
+    -- Step 7: create a temporary table TempPlayerDraft, order by FantasyPoints
+    CREATE TEMPORARY TABLE TempPlayerDraft AS
+        SELECT PlayerID
+        FROM Player
+        WHERE AvaiStatus = 'A' -- 'A' is for Available
+        ORDER BY FantasyPoints DESC;
+
+    -- Step 8: start the draft process
+    WHILE (SELECT COUNT(*) FROM TempPlayerDraft) > 0 DO
+        SET team_index = CASE 
+            WHEN p_Order = 'R' THEN (player_count % team_count) + 1
+            WHEN p_Order = 'S' THEN 
+                CASE 
+                    WHEN round % 2 = 1 THEN (player_count % team_count) + 1 
+                    ELSE (team_count - (player_count % team_count)) 
+                END
+            ELSE 1
+        END;
+
+        -- get TeamID for the current index
+        SELECT TeamID INTO current_team_id 
+        FROM TempTeamOrder 
+        WHERE RowNum = team_index;
+
+        -- get PlayerID for the current index
+        SELECT PlayerID INTO current_player_id 
+        FROM TempPlayerDraft 
+        ORDER BY PlayerID 
+        LIMIT 1;
+
+        -- update Player's TeamID, DraftID and AvaiStatus
+        UPDATE Player
+        SET TeamID = current_team_id, DraftID = v_DraftID, AvaiStatus = 'U' -- 'U' 表示 Unavailable/Drafted
+        WHERE PlayerID = current_player_id;
+
+        -- delete the drafted player from TempPlayerDraft
+        DELETE FROM TempPlayerDraft WHERE PlayerID = current_player_id;
+
+        -- increment player_count
+        SET player_count = player_count + 1;
+        IF p_Order = 'S' AND player_count % team_count = 0 THEN
+            SET round = round + 1;
+        END IF;
+    END WHILE;
+
+    -- Step 9: update DraftStatus to 'C' (Completed)
+    UPDATE Draft SET DraftStatus = 'C' WHERE DraftID = v_DraftID;
+
+    -- Step 10: drop temporary tables
+    DROP TEMPORARY TABLE IF EXISTS TempTeamOrder;
+    DROP TEMPORARY TABLE IF EXISTS TempPlayerDraft;
+
+    COMMIT;
+
+    -- return DraftID
+    SELECT v_DraftID AS DraftID;
+END //
+
+DELIMITER ;
@@ -0,0 +1,4 @@
+-- Lookup index for the bulk player import's upsert, which matches existing players
+-- on (FullName, RealTeam, Sport).
+
+CREATE INDEX idx_player_identity ON Player (FullName, RealTeam, Sport);
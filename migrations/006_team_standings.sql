@@ -0,0 +1,15 @@
+-- League standings maintained from TotalPoints (standings.py).
+--
+-- Ranking a league reads its teams in (TotalPoints, TeamID) order; the index keeps that
+-- to the league's own rows. The existing seed rankings are replaced by computed ones.
+
+CREATE INDEX idx_team_league_points ON Team (LeagueID, TotalPoints, TeamID);
+
+UPDATE Team t
+JOIN (
+    SELECT TeamID,
+           ROW_NUMBER() OVER (PARTITION BY LeagueID ORDER BY TotalPoints DESC, TeamID ASC) AS NewRanking
+    FROM Team
+    WHERE LeagueID IS NOT NULL
+) r ON t.TeamID = r.TeamID
+SET t.LeagueRanking = r.NewRanking;
@@ -0,0 +1,110 @@
+-- Data versions for cached query results (utils.ResultCache).
+--
+-- Every write to a tracked table bumps its version, so a cached result can be checked
+-- against the versions it was built from with one small read. Like RowCounter, the
+-- counter is sharded on CONNECTION_ID() so concurrent writers do not queue on one row;
+-- shards only ever increase, so the sum over the shards is monotonic.
+--
+-- MatchEvent is versioned per match ('MatchEvent:<MatchID>'), so live events for one
+-- match leave the cached events of every other match valid. A missing row reads as 0.
+
+CREATE TABLE TableVersion (
+    Name VARCHAR(50) NOT NULL,
+    Shard TINYINT NOT NULL,
+    Version BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Name, Shard)
+);
+
+INSERT INTO TableVersion (Name, Shard, Version)
+VALUES ('MatchDetail', 0, 0), ('MatchTeam', 0, 0);
+
+
+DELIMITER //
+
+CREATE OR REPLACE TRIGGER trg_version_matchdetail_insert
+AFTER INSERT ON MatchDetail
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('MatchDetail', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_matchdetail_update
+AFTER UPDATE ON MatchDetail
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('MatchDetail', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_matchdetail_delete
+AFTER DELETE ON MatchDetail
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('MatchDetail', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_matchteam_insert
+AFTER INSERT ON MatchTeam
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('MatchTeam', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_matchteam_update
+AFTER UPDATE ON MatchTeam
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('MatchTeam', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_matchteam_delete
+AFTER DELETE ON MatchTeam
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('MatchTeam', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_matchevent_insert
+AFTER INSERT ON MatchEvent
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES (CONCAT('MatchEvent:', NEW.MatchID), CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_matchevent_update
+AFTER UPDATE ON MatchEvent
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES (CONCAT('MatchEvent:', OLD.MatchID), CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+    IF NOT (NEW.MatchID <=> OLD.MatchID) THEN
+        INSERT INTO TableVersion (Name, Shard, Version)
+        VALUES (CONCAT('MatchEvent:', NEW.MatchID), CONNECTION_ID() % 16, 1)
+        ON DUPLICATE KEY UPDATE Version = Version + 1;
+    END IF;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_matchevent_delete
+AFTER DELETE ON MatchEvent
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES (CONCAT('MatchEvent:', OLD.MatchID), CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+DELIMITER ;
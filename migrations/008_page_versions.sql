@@ -0,0 +1,199 @@
+-- Data versions for the cached listing pages (page_cache.py): players, trades, drafts
+-- and waivers. Same scheme as migrations/007_table_versions.sql.
+
+INSERT INTO TableVersion (Name, Shard, Version)
+VALUES ('Player', 0, 0), ('Team', 0, 0), ('Trade', 0, 0), ('PlayerTrade', 0, 0), ('Draft', 0, 0), ('League', 0, 0), ('Waiver', 0, 0);
+
+
+DELIMITER //
+
+CREATE OR REPLACE TRIGGER trg_version_player_insert
+AFTER INSERT ON Player
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('Player', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_player_update
+AFTER UPDATE ON Player
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('Player', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_player_delete
+AFTER DELETE ON Player
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('Player', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_team_insert
+AFTER INSERT ON Team
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('Team', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_team_update
+AFTER UPDATE ON Team
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('Team', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_team_delete
+AFTER DELETE ON Team
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('Team', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_trade_insert
+AFTER INSERT ON Trade
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('Trade', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_trade_update
+AFTER UPDATE ON Trade
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('Trade', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_trade_delete
+AFTER DELETE ON Trade
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('Trade', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_playertrade_insert
+AFTER INSERT ON PlayerTrade
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('PlayerTrade', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_playertrade_update
+AFTER UPDATE ON PlayerTrade
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('PlayerTrade', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_playertrade_delete
+AFTER DELETE ON PlayerTrade
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('PlayerTrade', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_draft_insert
+AFTER INSERT ON Draft
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('Draft', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_draft_update
+AFTER UPDATE ON Draft
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('Draft', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_draft_delete
+AFTER DELETE ON Draft
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('Draft', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_league_insert
+AFTER INSERT ON League
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('League', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_league_update
+AFTER UPDATE ON League
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('League', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_league_delete
+AFTER DELETE ON League
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('League', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_waiver_insert
+AFTER INSERT ON Waiver
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('Waiver', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_waiver_update
+AFTER UPDATE ON Waiver
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('Waiver', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_waiver_delete
+AFTER DELETE ON Waiver
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('Waiver', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+DELIMITER ;
@@ -0,0 +1,46 @@
+-- Composite and covering indexes for the app's hot lookups.
+--
+-- InnoDB already indexes every foreign key column on its own; the composites below add
+-- the filter and sort columns the queries use next, and replace those single-column FK
+-- indexes where they start with the same column. benchmarks/explain_plans.py checks the
+-- resulting plans.
+
+-- start_trade / ExecuteTrade / GetUserTeams: teams by manager
+CREATE INDEX idx_team_manager ON Team (Manager, TeamID, TeamName);
+
+-- GetTeamInfoByName and create_team's duplicate name check
+CREATE INDEX idx_team_name ON Team (TeamName, LeagueID);
+
+-- GetMatches filters both sides of a match on Team.Sport
+CREATE INDEX idx_team_sport ON Team (Sport, TeamID, TeamName);
+
+-- GetUserPublicLeaguesAndTeamRankings / GetUserPrivateLeaguesAndTeamRankings
+CREATE INDEX idx_league_commissioner ON League (Commissioner, LeagueType, LeagueID);
+
+-- new_draft lists leagues by name
+CREATE INDEX idx_league_name ON League (LeagueName, LeagueID, LeagueType);
+
+-- rosters of available players per team (start_trade)
+CREATE INDEX idx_player_team_status ON Player (TeamID, AvaiStatus, PlayerID);
+
+-- the draft pool: available players in PlayerID order
+CREATE INDEX idx_player_status ON Player (AvaiStatus, PlayerID);
+
+-- draft_detail: players of a draft
+CREATE INDEX idx_player_draft ON Player (DraftID, TeamID);
+
+-- GetMatchEvents, ordered by time or by player
+CREATE INDEX idx_matchevent_match_time ON MatchEvent (MatchID, EventTime);
+CREATE INDEX idx_matchevent_match_player ON MatchEvent (MatchID, PlayerID);
+
+-- GetWaiverPlayers: pending waivers
+CREATE INDEX idx_waiver_status ON Waiver (WaiverStatus, PlayerID);
+
+-- GetPlayerDetails: a player's game dates, newest first
+CREATE INDEX idx_playerstats_player_date ON PlayerStats (PlayerID, GameDate);
+
+-- GetMatches: the home and away side of a match
+CREATE INDEX idx_matchteam_match_side ON MatchTeam (MatchID, HomeOrAway, TeamID);
+
+-- GetMatches ordered by date
+CREATE INDEX idx_matchdetail_date ON MatchDetail (MatchDate, MatchID);
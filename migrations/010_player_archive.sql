@@ -0,0 +1,23 @@
+-- Archive tables for bulk player clean-up (player_archive.py).
+--
+-- Each archive table has the columns and indexes of its source table plus ArchivedAt,
+-- and no foreign keys, so archived history stays queryable with the same joins after the
+-- players are gone (or after the tables are dumped and loaded elsewhere).
+
+CREATE TABLE PlayerArchive LIKE Player;
+ALTER TABLE PlayerArchive ADD COLUMN ArchivedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+CREATE TABLE PlayerStatsArchive LIKE PlayerStats;
+ALTER TABLE PlayerStatsArchive ADD COLUMN ArchivedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+CREATE TABLE MatchEventArchive LIKE MatchEvent;
+ALTER TABLE MatchEventArchive ADD COLUMN ArchivedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+CREATE TABLE PlayerTradeArchive LIKE PlayerTrade;
+ALTER TABLE PlayerTradeArchive ADD COLUMN ArchivedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+CREATE TABLE WaiverArchive LIKE Waiver;
+ALTER TABLE WaiverArchive ADD COLUMN ArchivedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+-- selecting players to clean up by sport, status and real team
+CREATE INDEX idx_player_sport_status_team ON Player (Sport, AvaiStatus, RealTeam, PlayerID);
@@ -0,0 +1,37 @@
+-- Typed stat columns parsed from PlayerStats.PerformanceStats (scoring.py).
+--
+-- One row per PlayerStats row. Every sport shares the table; columns a sport does not
+-- use stay 0, so a scoring pass reads one table into one matrix. SourceCrc is the CRC32
+-- of the text the row was parsed from, so rows whose text changed are found with one
+-- comparison. Deleting or archiving PlayerStats removes the parsed row with it.
+
+CREATE TABLE PlayerStatLine (
+    StatsID NUMERIC(10) PRIMARY KEY,
+    PlayerID NUMERIC(8) NOT NULL,
+    GameDate DATE,
+    Sport CHAR(3) NOT NULL,
+    PassingYards SMALLINT NOT NULL DEFAULT 0,
+    RushingYards SMALLINT NOT NULL DEFAULT 0,
+    ReceivingYards SMALLINT NOT NULL DEFAULT 0,
+    Touchdowns SMALLINT NOT NULL DEFAULT 0,
+    Interceptions SMALLINT NOT NULL DEFAULT 0,
+    FieldGoals SMALLINT NOT NULL DEFAULT 0,
+    Receptions SMALLINT NOT NULL DEFAULT 0,
+    Points SMALLINT NOT NULL DEFAULT 0,
+    Rebounds SMALLINT NOT NULL DEFAULT 0,
+    Assists SMALLINT NOT NULL DEFAULT 0,
+    Blocks SMALLINT NOT NULL DEFAULT 0,
+    Goals SMALLINT NOT NULL DEFAULT 0,
+    Saves SMALLINT NOT NULL DEFAULT 0,
+    Tackles SMALLINT NOT NULL DEFAULT 0,
+    Clearances SMALLINT NOT NULL DEFAULT 0,
+    Passes SMALLINT NOT NULL DEFAULT 0,
+    Shots SMALLINT NOT NULL DEFAULT 0,
+    CleanSheets SMALLINT NOT NULL DEFAULT 0,
+    Parsed BOOLEAN NOT NULL DEFAULT FALSE, -- at least one stat was recognised
+    SourceCrc INT UNSIGNED NOT NULL,
+    FOREIGN KEY (StatsID) REFERENCES PlayerStats(StatsID) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_statline_player ON PlayerStatLine (PlayerID, GameDate);
+CREATE INDEX idx_statline_sport ON PlayerStatLine (Sport, PlayerID);
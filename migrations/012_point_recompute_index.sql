@@ -0,0 +1,7 @@
+-- Covering index for the fantasy point recompute (recompute.py): the per-player sums of
+-- ImpactFantasyPoint are read from the index alone, without touching the event rows.
+
+CREATE INDEX idx_matchevent_player_points ON MatchEvent (PlayerID, ImpactFantasyPoint);
+
+-- team totals are summed per sport from the players they own
+CREATE INDEX idx_player_team_points ON Player (TeamID, FantasyPoints);
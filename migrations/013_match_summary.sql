@@ -0,0 +1,207 @@
+-- Denormalised match listing for GetMatches.
+--
+-- GetMatches joined MatchTeam and Team twice per match, once for each side, only to read
+-- the two team names and filter on their sport. MatchSummary holds one row per match with
+-- both sides already resolved, indexed for both sort orders of /matches. It is kept in
+-- step by triggers: a change to MatchDetail or MatchTeam re-derives that match's row, and
+-- renaming a team (or moving it to another sport) rewrites the rows it appears in.
+--
+-- Like the old query, a match only gets a row once it has a home and an away side of the
+-- same sport. GetMatches now reads MatchSummary alone and is cached on its version.
+
+CREATE TABLE MatchSummary (
+    MatchID NUMERIC(8) PRIMARY KEY,
+    MatchDate DATE,
+    Sport CHAR(3) NOT NULL,
+    HomeTeamID NUMERIC(8) NOT NULL,
+    HomeTeamName VARCHAR(25) NOT NULL,
+    AwayTeamID NUMERIC(8) NOT NULL,
+    AwayTeamName VARCHAR(25) NOT NULL,
+    FinalScore VARCHAR(10),
+    Winner VARCHAR(100)
+);
+
+-- GetMatches ordered by date, and by home then away team
+CREATE INDEX idx_matchsummary_sport_date ON MatchSummary (Sport, MatchDate);
+CREATE INDEX idx_matchsummary_sport_home ON MatchSummary (Sport, HomeTeamName, AwayTeamName);
+
+-- rewriting a team's rows when it is renamed
+CREATE INDEX idx_matchsummary_home_team ON MatchSummary (HomeTeamID);
+CREATE INDEX idx_matchsummary_away_team ON MatchSummary (AwayTeamID);
+
+-- The join MatchSummary is derived from, defined once for the triggers and the rebuild.
+-- It has no aggregates, so a WHERE on it is merged into the join.
+CREATE OR REPLACE VIEW MatchSummarySource AS
+SELECT
+    md.MatchID,
+    md.MatchDate,
+    t_home.Sport,
+    t_home.TeamID AS HomeTeamID,
+    t_home.TeamName AS HomeTeamName,
+    t_away.TeamID AS AwayTeamID,
+    t_away.TeamName AS AwayTeamName,
+    md.FinalScore,
+    md.Winner
+FROM MatchDetail md
+JOIN MatchTeam mt_home ON md.MatchID = mt_home.MatchID AND mt_home.HomeOrAway = 'Home'
+JOIN Team t_home ON mt_home.TeamID = t_home.TeamID
+JOIN MatchTeam mt_away ON md.MatchID = mt_away.MatchID AND mt_away.HomeOrAway = 'Away'
+JOIN Team t_away ON mt_away.TeamID = t_away.TeamID
+WHERE t_home.Sport = t_away.Sport;
+
+INSERT INTO TableVersion (Name, Shard, Version)
+VALUES ('MatchSummary', 0, 0);
+
+
+DELIMITER //
+
+-- Re-derive one match's row. A match has one home and one away side; should the data
+-- ever hold more, the first pair found is kept.
+CREATE OR REPLACE PROCEDURE RefreshMatchSummary(
+    IN p_MatchID NUMERIC(8)
+)
+BEGIN
+    DELETE FROM MatchSummary WHERE MatchID = p_MatchID;
+
+    INSERT INTO MatchSummary (MatchID, MatchDate, Sport, HomeTeamID, HomeTeamName, AwayTeamID, AwayTeamName,
+                              FinalScore, Winner)
+    SELECT MatchID, MatchDate, Sport, HomeTeamID, HomeTeamName, AwayTeamID, AwayTeamName, FinalScore, Winner
+    FROM MatchSummarySource
+    WHERE MatchID = p_MatchID
+    ON DUPLICATE KEY UPDATE MatchSummary.MatchID = MatchSummary.MatchID;
+END //
+
+-- Rebuild every row; for bulk loads (datagen.py) and TRUNCATE, which fire no triggers.
+CREATE OR REPLACE PROCEDURE RebuildMatchSummary()
+BEGIN
+    DELETE FROM MatchSummary;
+
+    INSERT INTO MatchSummary (MatchID, MatchDate, Sport, HomeTeamID, HomeTeamName, AwayTeamID, AwayTeamName,
+                              FinalScore, Winner)
+    SELECT MatchID, MatchDate, Sport, HomeTeamID, HomeTeamName, AwayTeamID, AwayTeamName, FinalScore, Winner
+    FROM MatchSummarySource
+    ON DUPLICATE KEY UPDATE MatchSummary.MatchID = MatchSummary.MatchID;
+END //
+
+CREATE OR REPLACE TRIGGER trg_matchsummary_matchdetail_insert
+AFTER INSERT ON MatchDetail
+FOR EACH ROW
+BEGIN
+    CALL RefreshMatchSummary(NEW.MatchID);
+END //
+
+CREATE OR REPLACE TRIGGER trg_matchsummary_matchdetail_update
+AFTER UPDATE ON MatchDetail
+FOR EACH ROW
+BEGIN
+    IF NOT (NEW.MatchID <=> OLD.MatchID) THEN
+        DELETE FROM MatchSummary WHERE MatchID = OLD.MatchID;
+    END IF;
+    CALL RefreshMatchSummary(NEW.MatchID);
+END //
+
+CREATE OR REPLACE TRIGGER trg_matchsummary_matchdetail_delete
+AFTER DELETE ON MatchDetail
+FOR EACH ROW
+BEGIN
+    DELETE FROM MatchSummary WHERE MatchID = OLD.MatchID;
+END //
+
+CREATE OR REPLACE TRIGGER trg_matchsummary_matchteam_insert
+AFTER INSERT ON MatchTeam
+FOR EACH ROW
+BEGIN
+    CALL RefreshMatchSummary(NEW.MatchID);
+END //
+
+CREATE OR REPLACE TRIGGER trg_matchsummary_matchteam_update
+AFTER UPDATE ON MatchTeam
+FOR EACH ROW
+BEGIN
+    IF NOT (NEW.MatchID <=> OLD.MatchID) THEN
+        CALL RefreshMatchSummary(OLD.MatchID);
+    END IF;
+    CALL RefreshMatchSummary(NEW.MatchID);
+END //
+
+CREATE OR REPLACE TRIGGER trg_matchsummary_matchteam_delete
+AFTER DELETE ON MatchTeam
+FOR EACH ROW
+BEGIN
+    CALL RefreshMatchSummary(OLD.MatchID);
+END //
+
+-- Team rows are updated all the time (points, rankings); only a new name or sport
+-- touches MatchSummary.
+CREATE OR REPLACE TRIGGER trg_matchsummary_team_update
+AFTER UPDATE ON Team
+FOR EACH ROW
+BEGIN
+    IF NOT (NEW.Sport <=> OLD.Sport) THEN
+        -- the team's matches may now appear under another sport, or not at all
+        DELETE FROM MatchSummary WHERE HomeTeamID = OLD.TeamID;
+        DELETE FROM MatchSummary WHERE AwayTeamID = OLD.TeamID;
+
+        INSERT INTO MatchSummary (MatchID, MatchDate, Sport, HomeTeamID, HomeTeamName, AwayTeamID, AwayTeamName,
+                                  FinalScore, Winner)
+        SELECT MatchID, MatchDate, Sport, HomeTeamID, HomeTeamName, AwayTeamID, AwayTeamName, FinalScore, Winner
+        FROM MatchSummarySource
+        WHERE MatchID IN (SELECT MatchID FROM MatchTeam WHERE TeamID = NEW.TeamID)
+        ON DUPLICATE KEY UPDATE MatchSummary.MatchID = MatchSummary.MatchID;
+    ELSEIF NOT (NEW.TeamName <=> OLD.TeamName) THEN
+        UPDATE MatchSummary SET HomeTeamName = NEW.TeamName WHERE HomeTeamID = NEW.TeamID;
+        UPDATE MatchSummary SET AwayTeamName = NEW.TeamName WHERE AwayTeamID = NEW.TeamID;
+    END IF;
+END //
+
+-- Data version for cached GetMatches results, as in migrations/007_table_versions.sql.
+-- Team renames reach the cache through these as well.
+CREATE OR REPLACE TRIGGER trg_version_matchsummary_insert
+AFTER INSERT ON MatchSummary
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('MatchSummary', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_matchsummary_update
+AFTER UPDATE ON MatchSummary
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('MatchSummary', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+CREATE OR REPLACE TRIGGER trg_version_matchsummary_delete
+AFTER DELETE ON MatchSummary
+FOR EACH ROW
+BEGIN
+    INSERT INTO TableVersion (Name, Shard, Version)
+    VALUES ('MatchSummary', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END //
+
+-- GetMatches without the double MatchTeam/Team join. The sort orders are unchanged.
+CREATE OR REPLACE PROCEDURE GetMatches(
+    IN p_sport CHAR(3),
+    IN p_order_by VARCHAR(10)
+)
+BEGIN
+    IF p_order_by = 'Team' THEN
+        SELECT MatchID, MatchDate, FinalScore, Winner, HomeTeamName AS HomeTeam, AwayTeamName AS AwayTeam
+        FROM MatchSummary
+        WHERE Sport = p_sport
+        ORDER BY HomeTeamName ASC, AwayTeamName ASC;
+    ELSE
+        SELECT MatchID, MatchDate, FinalScore, Winner, HomeTeamName AS HomeTeam, AwayTeamName AS AwayTeam
+        FROM MatchSummary
+        WHERE Sport = p_sport
+        ORDER BY MatchDate DESC;
+    END IF;
+END //
+
+DELIMITER ;
+
+CALL RebuildMatchSummary();
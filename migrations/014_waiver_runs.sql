@@ -0,0 +1,10 @@
+-- Batch waiver runs (waivers.py).
+--
+-- AutoApproveWaiver approved every claim as it was inserted, so claims on the same player
+-- were never weighed against each other. Claims now stay pending until a waiver run
+-- settles them by priority.
+
+DROP TRIGGER IF EXISTS AutoApproveWaiver;
+
+-- a run's window: pending claims by pickup date
+CREATE INDEX idx_waiver_status_pickup ON Waiver (WaiverStatus, WaiverPickupDate, WaiverID);
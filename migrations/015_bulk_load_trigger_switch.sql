@@ -0,0 +1,207 @@
+-- A session switch for bulk loads: per-row AFTER INSERT triggers do nothing while
+-- @fsl_bulk_load is set.
+--
+-- datagen.py sets it for its loading session. Without it every generated Player added 20
+-- points to its team (AddPlayerPointsToTeam), every row bumped a TableVersion or RowCounter
+-- shard, and every MatchDetail and MatchTeam row re-derived its MatchSummary row, all of
+-- which datagen.finish() rebuilds in a few set-based statements afterwards anyway. The
+-- switch is a user variable, so it only affects the connection that sets it; the app never
+-- sets it. The BEFORE INSERT key triggers (004) are left alone, as they do nothing when the
+-- insert supplies its key.
+--
+-- The bodies below are unchanged apart from the guard.
+
+
+DELIMITER //
+
+-- as in COMMANDS.sql
+CREATE OR REPLACE TRIGGER AddPlayerPointsToTeam
+AFTER INSERT ON Player
+FOR EACH ROW
+BEGIN
+    IF @fsl_bulk_load IS NULL THEN
+        IF NEW.TeamID IS NOT NULL THEN
+            UPDATE Team
+            SET TotalPoints = TotalPoints + 20
+            WHERE TeamID = NEW.TeamID;
+        END IF;
+    END IF;
+END //
+
+-- as in 008_page_versions.sql
+CREATE OR REPLACE TRIGGER trg_version_player_insert
+AFTER INSERT ON Player
+FOR EACH ROW
+BEGIN
+    IF @fsl_bulk_load IS NULL THEN
+        INSERT INTO TableVersion (Name, Shard, Version)
+        VALUES ('Player', CONNECTION_ID() % 16, 1)
+        ON DUPLICATE KEY UPDATE Version = Version + 1;
+    END IF;
+END //
+
+-- as in 008_page_versions.sql
+CREATE OR REPLACE TRIGGER trg_version_team_insert
+AFTER INSERT ON Team
+FOR EACH ROW
+BEGIN
+    IF @fsl_bulk_load IS NULL THEN
+        INSERT INTO TableVersion (Name, Shard, Version)
+        VALUES ('Team', CONNECTION_ID() % 16, 1)
+        ON DUPLICATE KEY UPDATE Version = Version + 1;
+    END IF;
+END //
+
+-- as in 008_page_versions.sql
+CREATE OR REPLACE TRIGGER trg_version_league_insert
+AFTER INSERT ON League
+FOR EACH ROW
+BEGIN
+    IF @fsl_bulk_load IS NULL THEN
+        INSERT INTO TableVersion (Name, Shard, Version)
+        VALUES ('League', CONNECTION_ID() % 16, 1)
+        ON DUPLICATE KEY UPDATE Version = Version + 1;
+    END IF;
+END //
+
+-- as in 003_trade_draft_pagination.sql
+CREATE OR REPLACE TRIGGER trg_count_draft_insert
+AFTER INSERT ON Draft
+FOR EACH ROW
+BEGIN
+    IF @fsl_bulk_load IS NULL THEN
+        INSERT INTO RowCounter (Name, Shard, Total)
+        VALUES ('Draft', CONNECTION_ID() % 16, 1)
+        ON DUPLICATE KEY UPDATE Total = Total + 1;
+    END IF;
+END //
+
+-- as in 008_page_versions.sql
+CREATE OR REPLACE TRIGGER trg_version_draft_insert
+AFTER INSERT ON Draft
+FOR EACH ROW
+BEGIN
+    IF @fsl_bulk_load IS NULL THEN
+        INSERT INTO TableVersion (Name, Shard, Version)
+        VALUES ('Draft', CONNECTION_ID() % 16, 1)
+        ON DUPLICATE KEY UPDATE Version = Version + 1;
+    END IF;
+END //
+
+-- as in 007_table_versions.sql
+CREATE OR REPLACE TRIGGER trg_version_matchdetail_insert
+AFTER INSERT ON MatchDetail
+FOR EACH ROW
+BEGIN
+    IF @fsl_bulk_load IS NULL THEN
+        INSERT INTO TableVersion (Name, Shard, Version)
+        VALUES ('MatchDetail', CONNECTION_ID() % 16, 1)
+        ON DUPLICATE KEY UPDATE Version = Version + 1;
+    END IF;
+END //
+
+-- as in 013_match_summary.sql
+CREATE OR REPLACE TRIGGER trg_matchsummary_matchdetail_insert
+AFTER INSERT ON MatchDetail
+FOR EACH ROW
+BEGIN
+    IF @fsl_bulk_load IS NULL THEN
+        CALL RefreshMatchSummary(NEW.MatchID);
+    END IF;
+END //
+
+-- as in 007_table_versions.sql
+CREATE OR REPLACE TRIGGER trg_version_matchteam_insert
+AFTER INSERT ON MatchTeam
+FOR EACH ROW
+BEGIN
+    IF @fsl_bulk_load IS NULL THEN
+        INSERT INTO TableVersion (Name, Shard, Version)
+        VALUES ('MatchTeam', CONNECTION_ID() % 16, 1)
+        ON DUPLICATE KEY UPDATE Version = Version + 1;
+    END IF;
+END //
+
+-- as in 013_match_summary.sql
+CREATE OR REPLACE TRIGGER trg_matchsummary_matchteam_insert
+AFTER INSERT ON MatchTeam
+FOR EACH ROW
+BEGIN
+    IF @fsl_bulk_load IS NULL THEN
+        CALL RefreshMatchSummary(NEW.MatchID);
+    END IF;
+END //
+
+-- as in 007_table_versions.sql
+CREATE OR REPLACE TRIGGER trg_version_matchevent_insert
+AFTER INSERT ON MatchEvent
+FOR EACH ROW
+BEGIN
+    IF @fsl_bulk_load IS NULL THEN
+        INSERT INTO TableVersion (Name, Shard, Version)
+        VALUES (CONCAT('MatchEvent:', NEW.MatchID), CONNECTION_ID() % 16, 1)
+        ON DUPLICATE KEY UPDATE Version = Version + 1;
+    END IF;
+END //
+
+-- as in 008_page_versions.sql
+CREATE OR REPLACE TRIGGER trg_version_trade_insert
+AFTER INSERT ON Trade
+FOR EACH ROW
+BEGIN
+    IF @fsl_bulk_load IS NULL THEN
+        INSERT INTO TableVersion (Name, Shard, Version)
+        VALUES ('Trade', CONNECTION_ID() % 16, 1)
+        ON DUPLICATE KEY UPDATE Version = Version + 1;
+    END IF;
+END //
+
+-- as in 003_trade_draft_pagination.sql
+CREATE OR REPLACE TRIGGER trg_count_playertrade_insert
+AFTER INSERT ON PlayerTrade
+FOR EACH ROW
+BEGIN
+    IF @fsl_bulk_load IS NULL THEN
+        INSERT INTO RowCounter (Name, Shard, Total)
+        VALUES ('PlayerTrade', CONNECTION_ID() % 16, 1)
+        ON DUPLICATE KEY UPDATE Total = Total + 1;
+    END IF;
+END //
+
+-- as in 008_page_versions.sql
+CREATE OR REPLACE TRIGGER trg_version_playertrade_insert
+AFTER INSERT ON PlayerTrade
+FOR EACH ROW
+BEGIN
+    IF @fsl_bulk_load IS NULL THEN
+        INSERT INTO TableVersion (Name, Shard, Version)
+        VALUES ('PlayerTrade', CONNECTION_ID() % 16, 1)
+        ON DUPLICATE KEY UPDATE Version = Version + 1;
+    END IF;
+END //
+
+-- as in 008_page_versions.sql
+CREATE OR REPLACE TRIGGER trg_version_waiver_insert
+AFTER INSERT ON Waiver
+FOR EACH ROW
+BEGIN
+    IF @fsl_bulk_load IS NULL THEN
+        INSERT INTO TableVersion (Name, Shard, Version)
+        VALUES ('Waiver', CONNECTION_ID() % 16, 1)
+        ON DUPLICATE KEY UPDATE Version = Version + 1;
+    END IF;
+END //
+
+-- as in 013_match_summary.sql
+CREATE OR REPLACE TRIGGER trg_version_matchsummary_insert
+AFTER INSERT ON MatchSummary
+FOR EACH ROW
+BEGIN
+    IF @fsl_bulk_load IS NULL THEN
+        INSERT INTO TableVersion (Name, Shard, Version)
+        VALUES ('MatchSummary', CONNECTION_ID() % 16, 1)
+        ON DUPLICATE KEY UPDATE Version = Version + 1;
+    END IF;
+END //
+
+DELIMITER ;
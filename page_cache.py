@@ -0,0 +1,79 @@
+"""
+Rendered-page cache for the public listing pages.
+
+A page is cached under its endpoint, its query arguments and any per-user variant (such
+as whether the viewer is an admin), together with the data versions of the tables it
+shows (see utils.GetTableVersions). A write to any of those tables makes the entry stale.
+Responses carry a strong ETag computed from the body, and a matching If-None-Match is
+answered with 304 without rendering anything.
+
+Pages are never cached or served from the cache while flash messages are pending,
+because the messages are part of the rendered page.
+"""
+import hashlib
+from functools import wraps
+
+from flask import request, session, make_response, get_flashed_messages
+
+from db import get_db
+from utils import GetTableVersions, ResultCache
+
+
+# process-wide cache of rendered pages
+page_cache = ResultCache(max_entries=512, ttl=300.0)
+
+
+def _has_flashes():
+    return bool(session.get('_flashes'))
+
+
+def _flashed_during_request():
+    # messages flashed by the view are either still in the session or, once the template
+    # has shown them, remembered for the rest of the request by get_flashed_messages()
+    return _has_flashes() or bool(get_flashed_messages())
+
+
+def _respond(body, etag, mimetype):
+    response = make_response(body)
+    response.mimetype = mimetype
+    response.set_etag(etag)
+    # every use revalidates, and per-user variants must not be shared by proxies
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+
+def cached_page(tables, vary=()):
+    """
+    Cache the rendered response of a GET view.
+
+    :param tables: Version names of the tables the page shows, e.g. ('Player',).
+    :param vary: Zero-argument callables whose results select a per-user variant, e.g. (user_is_admin,).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or _has_flashes():
+                return view(*args, **kwargs)
+
+            key = (
+                request.endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple(sorted(request.args.items(multi=True))),
+                tuple(variant() for variant in vary),
+            )
+            versions = GetTableVersions(get_db(), tables)
+
+            cached = page_cache.lookup(key, versions)
+            if cached is not None:
+                return _respond(*cached)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed or _flashed_during_request():
+                return response
+
+            body = response.get_data()
+            etag = hashlib.sha256(body).hexdigest()
+            page_cache.store(key, versions, (body, etag, response.mimetype))
+            return _respond(body, etag, response.mimetype)
+        return wrapper
+    return decorator
@@ -0,0 +1,194 @@
+import json
+import time
+import base64
+import threading
+
+
+def encode_cursor(values):
+    """
+    Encode the sort-key values of a row as an opaque, URL-safe page cursor.
+    """
+    raw = json.dumps(values, default=str, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, size):
+    """
+    Decode a page cursor produced by encode_cursor.
+
+    :param token: The cursor string from the query string.
+    :param size: The number of sort keys the cursor must contain.
+    :return: The list of key values, or None if the cursor is missing or malformed.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
+
+
+def _direction(direction, backwards):
+    if backwards:
+        return 'DESC' if direction == 'ASC' else 'ASC'
+    return direction
+
+
+def _after(expression, direction, value):
+    # MySQL sorts NULL before every value ascending and after every value descending
+    if direction == 'ASC':
+        if value is None:
+            return f"{expression} IS NOT NULL", []
+        return f"{expression} > %s", [value]
+    if value is None:
+        return "FALSE", []
+    return f"({expression} < %s OR {expression} IS NULL)", [value]
+
+
+def _from(expression, direction, value):
+    if direction == 'ASC':
+        if value is None:
+            return None, []
+        return f"{expression} >= %s", [value]
+    if value is None:
+        return f"{expression} IS NULL", []
+    return f"({expression} <= %s OR {expression} IS NULL)", [value]
+
+
+def seek_condition(keys, values, backwards=False):
+    """
+    Build the WHERE fragment selecting the rows strictly after `values` in the key order.
+
+    For keys (k1, k2) the condition is `k1 > v1 OR (k1 = v1 AND k2 > v2)`, with `<` for
+    DESC keys, prefixed by `k1 >= v1` so the optimizer can range-scan the leading column.
+    Keys may be NULL (e.g. a missing TradeDate): equality is `<=>`, and NULLs are placed
+    where ORDER BY puts them, first ascending and last descending.
+
+    :param keys: A list of (sql_expression, 'ASC' | 'DESC', row_field) tuples.
+    :param values: The key values of the last row of the previous page.
+    :param backwards: Seek in the opposite direction (rows strictly before `values`).
+    :return: A (sql, params) pair.
+    """
+    branches = []
+    params = []
+    for i, (expression, direction, _) in enumerate(keys):
+        parts = [f"{keys[j][0]} <=> %s" for j in range(i)]
+        params.extend(values[:i])
+        condition, condition_params = _after(expression, _direction(direction, backwards), values[i])
+        parts.append(condition)
+        params.extend(condition_params)
+        branches.append('(' + ' AND '.join(parts) + ')')
+
+    leading_expression, leading_direction, _ = keys[0]
+    leading, leading_params = _from(leading_expression, _direction(leading_direction, backwards), values[0])
+    sql = '(' + ' OR '.join(branches) + ')'
+    if leading is not None:
+        sql = f"{leading} AND {sql}"
+    return sql, leading_params + params
+
+
+def order_clause(keys, backwards=False):
+    return ', '.join(f"{expression} {_direction(direction, backwards)}" for expression, direction, _ in keys)
+
+
+def fetch_page(cursor, select, keys, after=None, before=None, per_page=20, where=None, params=()):
+    """
+    Fetch one page of rows using seek (keyset) pagination.
+
+    Only `per_page + 1` rows are read no matter how deep the page is; the extra row tells
+    whether another page exists.
+
+    :param cursor: An open database cursor returning dictionaries.
+    :param select: The SELECT ... FROM ... part of the query, without WHERE or ORDER BY.
+    :param keys: The sort keys as (sql_expression, 'ASC' | 'DESC', row_field) tuples. The last
+                 key must be unique so that the order is total.
+    :param after: Cursor of the last row of the previous page (page forward).
+    :param before: Cursor of the first row of the next page (page backward).
+    :param per_page: The page size.
+    :param where: Optional extra filter applied to every page.
+    :param params: Parameters for `where`.
+    :return: A dict with 'rows', 'next_cursor' and 'prev_cursor' (None when there is no such page).
+    """
+    after_values = decode_cursor(after, len(keys))
+    before_values = decode_cursor(before, len(keys)) if after_values is None else None
+    backwards = before_values is not None
+    seek_values = before_values if backwards else after_values
+
+    conditions = []
+    query_params = []
+    if where:
+        conditions.append(f"({where})")
+        query_params.extend(params)
+    if seek_values is not None:
+        sql, seek_params = seek_condition(keys, seek_values, backwards)
+        conditions.append(sql)
+        query_params.extend(seek_params)
+
+    query = select
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += f" ORDER BY {order_clause(keys, backwards)} LIMIT %s"
+    query_params.append(per_page + 1)
+
+    cursor.execute(query, query_params)
+    rows = list(cursor.fetchall())
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if backwards:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, seek_values is not None
+
+    def key_of(row):
+        return encode_cursor([row[field] for _, _, field in keys])
+
+    return {
+        'rows': rows,
+        'next_cursor': key_of(rows[-1]) if rows and has_next else None,
+        'prev_cursor': key_of(rows[0]) if rows and has_prev else None,
+    }
+
+
+class CountCache:
+    """
+    Keeps expensive row counts for a short time so page views don't recount the table.
+
+    :param ttl: Seconds a count is reused before it is recomputed.
+    """
+
+    def __init__(self, ttl=60.0):
+        self.ttl = ttl
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, loader):
+        """
+        :param name: Cache key, e.g. 'players'.
+        :param loader: Zero-argument callable returning the current count.
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._counts.get(name)
+            if cached is not None and now - cached[1] < self.ttl:
+                return cached[0]
+        count = loader()
+        with self._lock:
+            self._counts[name] = (count, now)
+        return count
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self._counts.clear()
+            else:
+                self._counts.pop(name, None)
+
+
+# process-wide cache of listing totals
+row_counts = CountCache()
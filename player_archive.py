@@ -0,0 +1,353 @@
+"""
+Bulk archive or delete of players and their history.
+
+Players are chosen by PlayerID or by a filter on Sport, AvaiStatus and RealTeam, and
+processed in batches of players. For each batch, the history rows (PlayerStats,
+MatchEvent, PlayerTrade, Waiver) are moved in chunks of at most `chunk_size` rows, each
+chunk in its own short transaction: its keys are locked, copied to the *Archive table
+(unless deleting) and deleted. A player with a long MatchEvent history therefore never
+holds locks for more than one chunk. The Player rows go last, in one transaction per
+batch that first moves any history written in the meantime.
+
+Archived rows keep their columns and gain ArchivedAt (migrations/010_player_archive.sql).
+Like the single-player delete, no fantasy points are recalculated.
+
+Usage:
+    python player_archive.py --sport FTB --status U             # archive
+    python player_archive.py --ids 12,13,14 --delete            # delete without archiving
+    python player_archive.py --real-team "Boston Rams" --dry-run
+"""
+import sys
+import time
+import logging
+import argparse
+import threading
+import itertools
+
+import pymysql
+
+from db import DB_CONFIG
+
+
+# history tables in the order they are cleared, with their key columns
+HISTORY_TABLES = (
+    ('PlayerStats', ('StatsID',)),
+    ('MatchEvent', ('MatchEventID',)),
+    ('PlayerTrade', ('TradeID', 'PlayerID')),
+    ('Waiver', ('WaiverID',)),
+)
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_BATCH_SIZE = 100
+
+# keep at most this many finished jobs for the status page
+MAX_FINISHED_JOBS = 20
+
+
+def select_players(connection, player_ids=None, sport=None, avai_status=None, real_team=None):
+    """
+    Find the players to process.
+
+    :param player_ids: Explicit PlayerIDs; combined with the filters if both are given.
+    :param sport: 'FTB', 'BB' or 'SB'.
+    :param avai_status: 'A' or 'U'.
+    :param real_team: Exact RealTeam name.
+    :return: The matching PlayerIDs in increasing order.
+    :raises ValueError: If neither IDs nor a filter were given.
+    """
+    conditions = []
+    params = []
+    if player_ids:
+        conditions.append(f"PlayerID IN ({', '.join(['%s'] * len(player_ids))})")
+        params.extend(player_ids)
+    for column, value in (('Sport', sport), ('AvaiStatus', avai_status), ('RealTeam', real_team)):
+        if value:
+            conditions.append(f"{column} = %s")
+            params.append(value)
+    if not conditions:
+        raise ValueError("Choose players by PlayerID, Sport, AvaiStatus or RealTeam.")
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT PlayerID FROM Player WHERE {' AND '.join(conditions)} ORDER BY PlayerID", params)
+        return [int(row['PlayerID']) for row in cursor.fetchall()]
+
+
+def _key_condition(keys, rows):
+    """
+    A WHERE fragment matching exactly the given rows by key.
+    """
+    if len(keys) == 1:
+        return f"{keys[0]} IN ({', '.join(['%s'] * len(rows))})", [row[keys[0]] for row in rows]
+    row_placeholder = '(' + ', '.join(['%s'] * len(keys)) + ')'
+    condition = f"({', '.join(keys)}) IN ({', '.join([row_placeholder] * len(rows))})"
+    return condition, [row[key] for row in rows for key in keys]
+
+
+def move_rows(cursor, table, keys, player_ids, limit, archive):
+    """
+    Archive (or just delete) at most `limit` history rows of some players. Runs inside the
+    caller's transaction.
+
+    :return: The number of rows moved.
+    """
+    placeholders = ', '.join(['%s'] * len(player_ids))
+    cursor.execute(f"""
+        SELECT {', '.join(keys)} FROM {table}
+        WHERE PlayerID IN ({placeholders})
+        LIMIT %s
+        FOR UPDATE
+    """, list(player_ids) + [limit])
+    rows = cursor.fetchall()
+    if not rows:
+        return 0
+
+    condition, params = _key_condition(keys, rows)
+    if archive:
+        cursor.execute(f"INSERT INTO {table}Archive SELECT t.*, CURRENT_TIMESTAMP FROM {table} t WHERE {condition}",
+                       params)
+    cursor.execute(f"DELETE FROM {table} WHERE {condition}", params)
+    return len(rows)
+
+
+def archive_players(connection, player_ids, archive=True, chunk_size=DEFAULT_CHUNK_SIZE,
+                    batch_size=DEFAULT_BATCH_SIZE, progress=None, should_stop=None):
+    """
+    Move players and their history to the archive tables, or delete them.
+
+    :param connection: MySQL connection object; committed after every chunk.
+    :param player_ids: The players to process.
+    :param archive: Copy rows to the *Archive tables before deleting them.
+    :param chunk_size: Maximum history rows per transaction.
+    :param batch_size: Players whose history is cleared together.
+    :param progress: Optional callable receiving the report after every chunk.
+    :param should_stop: Optional callable; when it returns True the run stops after the current chunk.
+    :return: A report with 'players_total', 'players_done', 'rows' (per table), 'chunks',
+             'elapsed' and 'stopped'.
+    """
+    player_ids = sorted(set(int(player_id) for player_id in player_ids))
+    report = {
+        'players_total': len(player_ids),
+        'players_done': 0,
+        'rows': {table: 0 for table, _ in HISTORY_TABLES} | {'Player': 0},
+        'chunks': 0,
+        'elapsed': 0.0,
+        'stopped': False,
+    }
+    start = time.perf_counter()
+
+    def step(moves):
+        # one short transaction
+        try:
+            with connection.cursor() as cursor:
+                moved = moves(cursor)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        report['chunks'] += 1
+        report['elapsed'] = time.perf_counter() - start
+        if progress is not None:
+            progress(report)
+        return moved
+
+    for first in range(0, len(player_ids), batch_size):
+        batch = player_ids[first:first + batch_size]
+
+        for table, keys in HISTORY_TABLES:
+            while True:
+                if should_stop is not None and should_stop():
+                    report['stopped'] = True
+                    return report
+                moved = step(lambda cursor: move_rows(cursor, table, keys, batch, chunk_size, archive))
+                report['rows'][table] += moved
+                if moved < chunk_size:
+                    break
+
+        def move_players(cursor):
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f"SELECT PlayerID FROM Player WHERE PlayerID IN ({placeholders}) FOR UPDATE", batch)
+            present = [row['PlayerID'] for row in cursor.fetchall()]
+            if not present:
+                return 0
+            # history added since its chunks were moved; the player locks keep new rows out now
+            for table, keys in HISTORY_TABLES:
+                while True:
+                    moved = move_rows(cursor, table, keys, present, chunk_size, archive)
+                    report['rows'][table] += moved
+                    if moved < chunk_size:
+                        break
+            condition, params = _key_condition(('PlayerID',), [{'PlayerID': player_id} for player_id in present])
+            if archive:
+                cursor.execute(f"INSERT INTO PlayerArchive SELECT t.*, CURRENT_TIMESTAMP FROM Player t WHERE {condition}",
+                               params)
+            cursor.execute(f"DELETE FROM Player WHERE {condition}", params)
+            return len(present)
+
+        report['rows']['Player'] += step(move_players)
+        report['players_done'] += len(batch)
+
+    report['elapsed'] = time.perf_counter() - start
+    return report
+
+
+class ArchiveJob:
+    """
+    One bulk archive or delete, run on a background thread with its own connection.
+    """
+
+    def __init__(self, job_id, player_ids, archive, description, chunk_size=DEFAULT_CHUNK_SIZE,
+                 batch_size=DEFAULT_BATCH_SIZE, on_done=None, **connect_kwargs):
+        self.job_id = job_id
+        self.player_ids = player_ids
+        self.archive = archive
+        self.description = description
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.on_done = on_done
+        self.connect_kwargs = connect_kwargs or dict(DB_CONFIG)
+
+        self.state = 'queued'  # queued, running, done, failed, cancelled
+        self.error = None
+        self.report = {'players_total': len(player_ids), 'players_done': 0, 'rows': {}, 'chunks': 0,
+                       'elapsed': 0.0, 'stopped': False}
+        self.started_at = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f'player-archive-{job_id}', daemon=True)
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _progress(self, report):
+        with self._lock:
+            self.report = dict(report, rows=dict(report['rows']))
+
+    def _run(self):
+        self.state = 'running'
+        connection = None
+        try:
+            connection = pymysql.connect(**self.connect_kwargs)
+            report = archive_players(connection, self.player_ids, self.archive, self.chunk_size,
+                                     self.batch_size, progress=self._progress, should_stop=self._cancel.is_set)
+            self._progress(report)
+            self.state = 'cancelled' if report['stopped'] else 'done'
+        except Exception as e:
+            logging.error(f"Player archive job {self.job_id} failed: {e}")
+            self.error = str(e)
+            self.state = 'failed'
+        finally:
+            if connection is not None:
+                connection.close()
+            if self.on_done is not None:
+                self.on_done(self)
+
+    @property
+    def running(self):
+        return self.state in ('queued', 'running')
+
+    def status(self):
+        with self._lock:
+            report = dict(self.report, rows=dict(self.report['rows']))
+        return {
+            'job_id': self.job_id,
+            'description': self.description,
+            'mode': 'archive' if self.archive else 'delete',
+            'state': self.state,
+            'error': self.error,
+            'started_at': self.started_at,
+            **report,
+        }
+
+
+class ArchiveJobs:
+    """
+    The process's archive jobs. One job runs at a time, so two clean-ups never compete
+    for the same locks.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self, player_ids, archive, description, on_done=None, **kwargs):
+        """
+        :return: The started ArchiveJob.
+        :raises ValueError: If another job is still running.
+        """
+        with self._lock:
+            if any(job.running for job in self._jobs.values()):
+                raise ValueError("Another archive job is still running.")
+            job = ArchiveJob(next(self._ids), player_ids, archive, description, on_done=on_done, **kwargs)
+            self._jobs[job.job_id] = job
+            finished = [job_id for job_id, other in self._jobs.items() if not other.running]
+            for job_id in finished[:-MAX_FINISHED_JOBS]:
+                del self._jobs[job_id]
+        job.start()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def recent(self):
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: -job.job_id)
+
+
+def init_app(app):
+    app.extensions['archive_jobs'] = ArchiveJobs()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Archive or delete players and their history in chunks.")
+    parser.add_argument('--ids', help='comma separated PlayerIDs')
+    parser.add_argument('--sport', choices=('FTB', 'BB', 'SB'))
+    parser.add_argument('--status', choices=('A', 'U'), help='AvaiStatus')
+    parser.add_argument('--real-team')
+    parser.add_argument('--delete', action='store_true', help='delete without archiving')
+    parser.add_argument('--dry-run', action='store_true', help='only count the matching players')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='history rows per transaction')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='players per batch')
+    args = parser.parse_args(argv)
+
+    try:
+        player_ids = [int(value) for value in args.ids.split(',') if value.strip()] if args.ids else None
+    except ValueError:
+        print("Error: --ids must be comma separated integers.", file=sys.stderr)
+        return 1
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        try:
+            selected = select_players(connection, player_ids, args.sport, args.status, args.real_team)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        if args.dry_run:
+            print(f"{len(selected)} players match.")
+            return 0
+
+        def progress(report):
+            moved = sum(report['rows'].values())
+            print(f"\r{report['players_done']}/{report['players_total']} players, {moved} rows, "
+                  f"{report['chunks']} chunks, {report['elapsed']:.1f}s", end='', file=sys.stderr)
+
+        report = archive_players(connection, selected, archive=not args.delete, chunk_size=args.chunk_size,
+                                 batch_size=args.batch_size, progress=progress)
+    finally:
+        connection.close()
+
+    print(file=sys.stderr)
+    verb = 'deleted' if args.delete else 'archived'
+    print(f"{report['rows']['Player']} players {verb} in {report['elapsed']:.1f}s: "
+          + ', '.join(f"{count} {table}" for table, count in report['rows'].items() if table != 'Player'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,290 @@
+"""
+Bulk player import from CSV or JSON Lines.
+
+The file is read as a stream, one row at a time. Valid rows are written in chunks with
+executemany inside a single transaction, with IDs reserved a chunk at a time from the ID
+sequence. Invalid rows are reported with their line number and skipped; they never abort
+the load.
+
+With `upsert`, a row whose (FullName, RealTeam, Sport) matches an existing player updates
+that player instead of inserting a new one.
+
+Usage:
+    python player_import.py roster.csv
+    python player_import.py roster.jsonl --upsert --chunk-size 2000
+"""
+import io
+import os
+import csv
+import sys
+import json
+import logging
+import argparse
+from decimal import Decimal, InvalidOperation
+
+import pymysql
+
+from db import DB_CONFIG
+from ids import reserve_ids
+
+
+# positions used by each sport
+PLAYER_POSITIONS = {
+    'FTB': ('QB', 'RB', 'WR', 'TE', 'K'),
+    'BB': ('GUA', 'FWD', 'CEN'),
+    'SB': ('GK', 'DF', 'MF', 'FW'),
+}
+
+AVAILABILITY_STATUSES = ('A', 'U')
+
+# column -> maximum length, as declared on Player
+TEXT_LIMITS = {'FullName': 50, 'RealTeam': 50, 'PhotoURL': 2048}
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# keep at most this many per-row errors in the report
+MAX_REPORTED_ERRORS = 1000
+
+
+def detect_format(filename):
+    """
+    :param filename: Name of the uploaded or local file.
+    :return: 'csv' or 'jsonl'.
+    """
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    raise ValueError("Unsupported file type. Use .csv or .jsonl.")
+
+
+def read_rows(stream, fmt):
+    """
+    Iterate over the rows of a text stream.
+
+    :param stream: A text file object.
+    :param fmt: 'csv' (with a header line) or 'jsonl' (one object per line).
+    :return: A generator of (line_number, row) pairs. A row is None when the line could not be parsed.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def _text(row, column):
+    value = row.get(column)
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def validate_row(row):
+    """
+    Check and normalise one input row.
+
+    :param row: A dictionary keyed by Player column names.
+    :return: A dictionary with FullName, Sport, Position, RealTeam, FantasyPoints, AvaiStatus and PhotoURL.
+    :raises ValueError: With a readable message when the row is invalid.
+    """
+    if row is None:
+        raise ValueError("Malformed line.")
+
+    player = {
+        'FullName': _text(row, 'FullName'),
+        'Sport': _text(row, 'Sport').upper(),
+        'Position': _text(row, 'Position').upper(),
+        'RealTeam': _text(row, 'RealTeam'),
+        'AvaiStatus': _text(row, 'AvaiStatus').upper() or 'A',
+        'PhotoURL': _text(row, 'PhotoURL') or None,
+    }
+
+    if not player['FullName']:
+        raise ValueError("FullName is required.")
+    if not player['RealTeam']:
+        raise ValueError("RealTeam is required.")
+    if player['Sport'] not in PLAYER_POSITIONS:
+        raise ValueError(f"Invalid Sport '{player['Sport']}'. Use FTB, BB or SB.")
+    if player['Position'] not in PLAYER_POSITIONS[player['Sport']]:
+        raise ValueError(
+            f"Invalid Position '{player['Position']}' for {player['Sport']}. "
+            f"Use {', '.join(PLAYER_POSITIONS[player['Sport']])}."
+        )
+    if player['AvaiStatus'] not in AVAILABILITY_STATUSES:
+        raise ValueError(f"Invalid AvaiStatus '{player['AvaiStatus']}'. Use A or U.")
+    for column, limit in TEXT_LIMITS.items():
+        if player[column] and len(player[column]) > limit:
+            raise ValueError(f"{column} is longer than {limit} characters.")
+
+    points = _text(row, 'FantasyPoints') or '0'
+    try:
+        player['FantasyPoints'] = Decimal(points)
+    except InvalidOperation:
+        raise ValueError(f"Invalid FantasyPoints '{points}'.")
+    if not player['FantasyPoints'].is_finite() or abs(player['FantasyPoints']) >= 10000:
+        raise ValueError("FantasyPoints must be between -9999.99 and 9999.99.")
+
+    return player
+
+
+def _identity(player):
+    # case-insensitive, like the table's default collation
+    return player['FullName'].casefold(), player['RealTeam'].casefold(), player['Sport']
+
+
+def _existing_players(cursor, players):
+    """
+    Find the PlayerIDs of already stored players with the same (FullName, RealTeam, Sport).
+
+    :return: A dictionary mapping identity to PlayerID.
+    """
+    placeholders = ', '.join(['(%s, %s, %s)'] * len(players))
+    params = []
+    for player in players:
+        params.extend((player['FullName'], player['RealTeam'], player['Sport']))
+    cursor.execute(f"""
+        SELECT PlayerID, FullName, RealTeam, Sport
+        FROM Player
+        WHERE (FullName, RealTeam, Sport) IN ({placeholders})
+    """, params)
+    return {_identity(row): row['PlayerID'] for row in cursor.fetchall()}
+
+
+def _write_chunk(cursor, players, upsert):
+    """
+    Write one chunk of validated players.
+
+    :return: A (inserted, updated) pair of counts.
+    """
+    updates = []
+    if upsert:
+        existing = _existing_players(cursor, players)
+        new_players = []
+        for player in players:
+            player_id = existing.get(_identity(player))
+            if player_id is None:
+                new_players.append(player)
+            else:
+                updates.append(player | {'PlayerID': player_id})
+        players = new_players
+
+    if updates:
+        cursor.executemany("""
+            UPDATE Player
+            SET Position = %(Position)s, FantasyPoints = %(FantasyPoints)s,
+                AvaiStatus = %(AvaiStatus)s, PhotoURL = COALESCE(%(PhotoURL)s, PhotoURL)
+            WHERE PlayerID = %(PlayerID)s
+        """, updates)
+
+    if players:
+        for player, player_id in zip(players, reserve_ids('Player', len(players))):
+            player['PlayerID'] = player_id
+        cursor.executemany("""
+            INSERT INTO Player (PlayerID, FullName, Sport, Position, RealTeam, FantasyPoints, AvaiStatus, PhotoURL)
+            VALUES (%(PlayerID)s, %(FullName)s, %(Sport)s, %(Position)s, %(RealTeam)s,
+                    %(FantasyPoints)s, %(AvaiStatus)s, %(PhotoURL)s)
+        """, players)
+
+    return len(players), len(updates)
+
+
+def import_players(connection, rows, upsert=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Validate and load players in one transaction.
+
+    :param connection: MySQL connection object.
+    :param rows: An iterable of (line_number, row) pairs, e.g. from read_rows.
+    :param upsert: Update existing players matched on (FullName, RealTeam, Sport) instead of inserting duplicates.
+    :param chunk_size: Number of rows written per executemany.
+    :return: A dictionary with 'rows', 'inserted', 'updated', 'error_count' and 'errors'
+             (a list of {'line', 'error'}, truncated to MAX_REPORTED_ERRORS).
+    """
+    report = {'rows': 0, 'inserted': 0, 'updated': 0, 'error_count': 0, 'errors': []}
+    pending = {}  # identity (or line number without upsert) -> player, later rows win
+
+    def flush(cursor):
+        if pending:
+            inserted, updated = _write_chunk(cursor, list(pending.values()), upsert)
+            report['inserted'] += inserted
+            report['updated'] += updated
+            pending.clear()
+
+    try:
+        with connection.cursor() as cursor:
+            for line_number, row in rows:
+                report['rows'] += 1
+                try:
+                    player = validate_row(row)
+                except ValueError as e:
+                    report['error_count'] += 1
+                    if len(report['errors']) < MAX_REPORTED_ERRORS:
+                        report['errors'].append({'line': line_number, 'error': str(e)})
+                    continue
+
+                key = _identity(player) if upsert else line_number
+                if key in pending:
+                    # the same player twice in one chunk, the later row replaces the earlier one
+                    report['updated'] += 1
+                pending[key] = player
+                if len(pending) >= chunk_size:
+                    flush(cursor)
+            flush(cursor)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+    return report
+
+
+def import_stream(connection, stream, filename, upsert=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Import players from a binary file object such as an upload.
+
+    :param stream: A binary file object.
+    :param filename: The file name, used to pick CSV or JSON Lines.
+    """
+    fmt = detect_format(filename)
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        return import_players(connection, read_rows(text, fmt), upsert, chunk_size)
+    finally:
+        text.detach()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Bulk import players from a CSV or JSON Lines file.")
+    parser.add_argument('path', help='a .csv (with a header row) or .jsonl file')
+    parser.add_argument('--upsert', action='store_true',
+                        help='update players with the same FullName, RealTeam and Sport')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        with open(args.path, 'rb') as f:
+            report = import_stream(connection, f, args.path, args.upsert, args.chunk_size)
+    finally:
+        connection.close()
+
+    for error in report['errors']:
+        print(f"line {error['line']}: {error['error']}", file=sys.stderr)
+    print(f"{report['rows']} rows read, {report['inserted']} inserted, "
+          f"{report['updated']} updated, {report['error_count']} rejected.")
+    return 1 if report['error_count'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,467 @@
+"""
+Typeahead player search over Player.FullName and RealTeam.
+
+Searches are answered from an in-process index, without touching the database:
+
+  * names and real teams are split into lower-cased, accent-free tokens. A sorted vocabulary
+    of the distinct tokens answers prefix lookups with two bisects, and each token lists its
+    players;
+  * a trigram index over the vocabulary finds tokens that contain a query word ('son' finds
+    'johnson') when the prefix matches do not fill the result;
+  * every word of the query must match a token of the player. The candidates come from the
+    word with the fewest matching tokens, or from the team's roster when a TeamID is given;
+    the other words, Sport and AvaiStatus are checked per candidate, and the search stops
+    once it has `limit` players.
+
+The index is built on a background thread at startup; until it is ready, searches fall back to
+a prefix query on FullName and RealTeam. Routes that change players call players_changed()
+with their PlayerIDs, or without them after bulk changes, which schedules a rebuild. Writes by
+other processes (the import and archive CLIs, other app processes) are picked up by a rebuild
+whenever the Player data version moved, checked every PLAYER_SEARCH_REFRESH seconds
+(FSL_PLAYER_SEARCH_REFRESH, 300). PLAYER_SEARCH (FSL_PLAYER_SEARCH, on by default) switches the
+index off; searches then always go to the database.
+"""
+import os
+import re
+import sys
+import time
+import bisect
+import logging
+import threading
+import unicodedata
+
+import pymysql
+from flask import current_app
+
+from db import DB_CONFIG, get_db
+from utils import GetTableVersions
+
+
+logger = logging.getLogger('fsl.player_search')
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+DEFAULT_REFRESH_INTERVAL = 300.0
+
+PLAYER_COLUMNS = ('PlayerID', 'FullName', 'RealTeam', 'Sport', 'Position', 'AvaiStatus', 'TeamID')
+
+_WORD = re.compile(r'\w+')
+_LAST = '\U0010ffff'  # sorts after every token that starts with a given prefix
+
+
+def tokenize(text):
+    """
+    :return: The lower-cased words of a text, with accents removed.
+    """
+    if not text:
+        return []
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _WORD.findall(text.lower())
+
+
+def _trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+# a player is kept as a tuple: the PLAYER_COLUMNS, then its tokens
+SPORT = PLAYER_COLUMNS.index('Sport')
+STATUS = PLAYER_COLUMNS.index('AvaiStatus')
+TEAM = PLAYER_COLUMNS.index('TeamID')
+TOKENS = len(PLAYER_COLUMNS)
+
+
+def _record(row):
+    """
+    :param row: A dictionary with the PLAYER_COLUMNS.
+    """
+    player_id = int(row['PlayerID'])
+    team_id = int(row['TeamID']) if row['TeamID'] is not None else None
+    tokens = tuple(dict.fromkeys(tokenize(row['FullName']) + tokenize(row['RealTeam'])))
+    # the few distinct teams, sports, positions and statuses are shared between records
+    return (player_id, row['FullName'], _intern(row['RealTeam']), _intern(row['Sport']),
+            _intern(row['Position']), _intern(row['AvaiStatus']), team_id, tokens)
+
+
+def _as_dict(record):
+    return dict(zip(PLAYER_COLUMNS, record))
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class PlayerSearchIndex:
+    """
+    In-memory prefix and trigram index of the players, safe to share between threads.
+
+    :param refresh_interval: Seconds between checks of the Player data version.
+    :param connect_kwargs: Arguments passed through to pymysql.connect for the build connection.
+    """
+
+    def __init__(self, refresh_interval=DEFAULT_REFRESH_INTERVAL, **connect_kwargs):
+        self.refresh_interval = refresh_interval
+        self.connect_kwargs = connect_kwargs or dict(DB_CONFIG)
+
+        self._players = {}    # PlayerID -> record (see _record)
+        self._postings = {}   # token -> set of PlayerIDs
+        self._vocabulary = []  # the distinct tokens, sorted
+        self._trigrams = {}   # trigram -> set of tokens
+        self._teams = {}      # TeamID -> set of PlayerIDs
+        self._lock = threading.RLock()
+
+        self.ready = False
+        self.version = None
+        self._building = False
+        self._dirty = set()   # PlayerIDs refreshed while a build was reading
+        self._rebuild = threading.Event()
+        self._thread = None
+
+        self._builds = 0
+        self._build_time = 0.0
+        self._searches = 0
+        self._search_time = 0.0
+
+    # --- maintenance -------------------------------------------------------------------------
+
+    def _add(self, record):
+        player_id, tokens, team_id = record[0], record[TOKENS], record[TEAM]
+        self._players[player_id] = record
+        for token in tokens:
+            players = self._postings.get(token)
+            if players is None:
+                players = self._postings[token] = set()
+                bisect.insort(self._vocabulary, token)
+                for trigram in _trigrams(token):
+                    self._trigrams.setdefault(trigram, set()).add(token)
+            players.add(player_id)
+        if team_id is not None:
+            self._teams.setdefault(team_id, set()).add(player_id)
+
+    def _remove(self, player_id):
+        record = self._players.pop(player_id, None)
+        if record is None:
+            return
+        for token in record[TOKENS]:
+            players = self._postings[token]
+            players.discard(player_id)
+            if not players:
+                del self._postings[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+                for trigram in _trigrams(token):
+                    self._trigrams[trigram].discard(token)
+                    if not self._trigrams[trigram]:
+                        del self._trigrams[trigram]
+        team_id = record[TEAM]
+        if team_id is not None:
+            roster = self._teams[team_id]
+            roster.discard(player_id)
+            if not roster:
+                del self._teams[team_id]
+
+    def load(self, rows, version=None):
+        """
+        Replace the whole index with the given player rows.
+
+        :param rows: Rows (dictionaries) with the PLAYER_COLUMNS.
+        :param version: The Player data version the rows were read at.
+        """
+        players = {}
+        postings = {}
+        teams = {}
+        for row in rows:
+            record = _record(row)
+            players[record[0]] = record
+            for token in record[TOKENS]:
+                postings.setdefault(token, set()).add(record[0])
+            if record[TEAM] is not None:
+                teams.setdefault(record[TEAM], set()).add(record[0])
+        vocabulary = sorted(postings)
+        trigrams = {}
+        for token in vocabulary:
+            for trigram in _trigrams(token):
+                trigrams.setdefault(trigram, set()).add(token)
+
+        with self._lock:
+            self._players = players
+            self._postings = postings
+            self._vocabulary = vocabulary
+            self._trigrams = trigrams
+            self._teams = teams
+            self.version = version
+            self.ready = True
+
+    def upsert(self, rows):
+        with self._lock:
+            for row in rows:
+                record = _record(row)
+                self._remove(record[0])
+                self._add(record)
+
+    def remove(self, player_ids):
+        with self._lock:
+            for player_id in player_ids:
+                self._remove(player_id)
+
+    def build(self, connection):
+        """
+        Read every player and replace the index.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            self._building = True
+            self._dirty = set()
+        try:
+            # the version is read first, so writes during the read cause another rebuild
+            version = GetTableVersions(connection, ('Player',))
+            with connection.cursor(pymysql.cursors.SSDictCursor) as cursor:
+                cursor.execute(f"SELECT {', '.join(PLAYER_COLUMNS)} FROM Player")
+                rows = cursor.fetchall()
+            connection.commit()
+            self.load(rows, version)
+        finally:
+            with self._lock:
+                self._building = False
+                dirty, self._dirty = self._dirty, set()
+        if dirty:
+            self.refresh(connection, dirty)
+
+        elapsed = time.perf_counter() - started
+        self._builds += 1
+        self._build_time += elapsed
+        logger.info(f"Player search index built: {len(rows)} players in {elapsed:.2f} s")
+
+    def refresh(self, connection, player_ids):
+        """
+        Re-read some players after they changed; players that no longer exist are dropped.
+        """
+        player_ids = sorted({int(player_id) for player_id in player_ids})
+        if not player_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(player_ids))
+        with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute(f"SELECT {', '.join(PLAYER_COLUMNS)} FROM Player WHERE PlayerID IN ({placeholders})",
+                           player_ids)
+            rows = cursor.fetchall()
+        with self._lock:
+            if self._building:
+                self._dirty.update(player_ids)
+            found = {int(row['PlayerID']) for row in rows}
+            self.remove([player_id for player_id in player_ids if player_id not in found])
+            self.upsert(rows)
+
+    def request_rebuild(self):
+        self._rebuild.set()
+
+    def start(self):
+        """
+        Build the index on a background thread, then keep it in line with the Player version.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='player-search-index', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        self._rebuild.set()
+        while True:
+            requested = self._rebuild.wait(self.refresh_interval)
+            self._rebuild.clear()
+            connection = None
+            try:
+                connection = pymysql.connect(**self.connect_kwargs)
+                if requested or GetTableVersions(connection, ('Player',)) != self.version:
+                    self.build(connection)
+            except Exception as e:
+                logger.error(f"Player search index update failed: {e}")
+            finally:
+                if connection is not None:
+                    connection.close()
+
+    # --- lookups -----------------------------------------------------------------------------
+
+    def _prefix_range(self, word):
+        return (bisect.bisect_left(self._vocabulary, word),
+                bisect.bisect_right(self._vocabulary, word + _LAST))
+
+    def _containing(self, word):
+        """
+        Tokens that share every trigram of the word: a superset of the tokens containing it.
+        """
+        postings = [self._trigrams.get(trigram) for trigram in _trigrams(word)]
+        if not all(postings):
+            return set()
+        return set.intersection(*postings) if len(postings) > 1 else postings[0]
+
+    @staticmethod
+    def _matches(tokens, word, inside):
+        if inside and len(word) >= 3:
+            return any(word in token for token in tokens)
+        return any(token.startswith(word) for token in tokens)
+
+    def _collect(self, words, accept, limit, inside, found):
+        if inside:
+            # the prefix pass already saw the tokens that start with the word
+            candidates = [self._containing(word) if len(word) >= 3 else None for word in words]
+            if all(tokens is None for tokens in candidates):
+                return
+            primary = min((i for i, tokens in enumerate(candidates) if tokens is not None),
+                          key=lambda i: len(candidates[i]))
+            word = words[primary]
+            tokens = (token for token in candidates[primary] if word in token and not token.startswith(word))
+        else:
+            ranges = [self._prefix_range(word) for word in words]
+            primary = min(range(len(words)), key=lambda i: ranges[i][1] - ranges[i][0])
+            vocabulary = self._vocabulary
+            tokens = (vocabulary[i] for i in range(*ranges[primary]))
+
+        others = words[:primary] + words[primary + 1:]
+        players = self._players
+        for token in tokens:
+            for player_id in self._postings[token]:
+                if player_id in found:
+                    continue
+                record = players[player_id]
+                if not accept(record):
+                    continue
+                for other in others:
+                    if not self._matches(record[TOKENS], other, inside):
+                        break
+                else:
+                    found[player_id] = record
+                    if len(found) >= limit:
+                        return
+
+    def search(self, query, sport=None, status=None, team_id=None, limit=DEFAULT_LIMIT):
+        """
+        Find players whose name or real team matches every word of the query.
+
+        :param query: What was typed so far; may be empty when team_id is given.
+        :param sport: Only players of this Sport.
+        :param status: Only players with this AvaiStatus.
+        :param team_id: Only players of this fantasy team.
+        :param limit: The most players returned.
+        :return: Player dictionaries (PLAYER_COLUMNS), sorted by FullName.
+        """
+        started = time.perf_counter()
+        words = tokenize(query)
+
+        def accept(record):
+            return ((sport is None or record[SPORT] == sport)
+                    and (status is None or record[STATUS] == status)
+                    and (team_id is None or record[TEAM] == team_id))
+
+        found = {}
+        with self._lock:
+            if team_id is not None:
+                # a roster is small: check its players directly
+                for player_id in self._teams.get(team_id, ()):
+                    record = self._players[player_id]
+                    if accept(record) and all(self._matches(record[TOKENS], word, True) for word in words):
+                        found[player_id] = record
+            elif words:
+                self._collect(words, accept, limit, False, found)
+                if len(found) < limit:
+                    self._collect(words, accept, limit, True, found)
+            rows = [_as_dict(record) for record in found.values()]
+
+        prefix = ' '.join(words)
+        rows.sort(key=lambda row: (not ' '.join(tokenize(row['FullName'])).startswith(prefix), row['FullName']))
+        self._searches += 1
+        self._search_time += time.perf_counter() - started
+        return rows[:limit]
+
+    def stats(self):
+        """
+        :return: A dictionary of counters and gauges.
+        """
+        with self._lock:
+            return {
+                'ready': int(self.ready),
+                'players': len(self._players),
+                'tokens': len(self._vocabulary),
+                'trigrams': len(self._trigrams),
+                'builds': self._builds,
+                'build_seconds': self._build_time,
+                'searches': self._searches,
+                'search_seconds': self._search_time,
+            }
+
+
+def search_database(connection, query, sport=None, status=None, team_id=None, limit=DEFAULT_LIMIT):
+    """
+    The same search as PlayerSearchIndex.search, as a prefix query on FullName and RealTeam.
+    Used while the index is not ready.
+    """
+    conditions = []
+    params = []
+    text = ' '.join(query.split())
+    if text:
+        pattern = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        conditions.append("(FullName LIKE %s OR RealTeam LIKE %s)")
+        params += [pattern, pattern]
+    for column, value in (('Sport', sport), ('AvaiStatus', status), ('TeamID', team_id)):
+        if value is not None:
+            conditions.append(f"{column} = %s")
+            params.append(value)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+        cursor.execute(f"""
+            SELECT {', '.join(PLAYER_COLUMNS)} FROM Player
+            {where}
+            ORDER BY FullName
+            LIMIT %s
+        """, params + [limit])
+        return [_as_dict(_record(row)) for row in cursor.fetchall()]
+
+
+def search_players(query, sport=None, status=None, team_id=None, limit=DEFAULT_LIMIT):
+    """
+    Search with the application's index when it is ready, else with the request's connection.
+
+    :return: A (players, source) pair; source is 'index' or 'database'.
+    """
+    index = current_app.extensions.get('player_search')
+    if index is not None and index.ready:
+        return index.search(query, sport, status, team_id, limit), 'index'
+    return search_database(get_db(), query, sport, status, team_id, limit), 'database'
+
+
+def players_changed(connection, player_ids=None, removed=False):
+    """
+    Bring the application's index up to date after a route changed players.
+
+    :param connection: The connection the change was committed on.
+    :param player_ids: The players that changed; None after bulk changes, which rebuilds the index.
+    :param removed: The players were deleted; drop them without reading the database.
+    """
+    index = current_app.extensions.get('player_search')
+    if index is None:
+        return
+    if player_ids is None:
+        index.request_rebuild()
+    elif removed:
+        index.remove(int(player_id) for player_id in player_ids)
+    else:
+        try:
+            index.refresh(connection, player_ids)
+        except pymysql.MySQLError as e:
+            logger.error(f"Player search index refresh failed, rebuilding: {e}")
+            index.request_rebuild()
+
+
+def init_app(app):
+    """
+    Create the application's search index and start building it.
+    """
+    app.config.setdefault('PLAYER_SEARCH',
+                          os.environ.get('FSL_PLAYER_SEARCH', '1') not in ('', '0', 'false', 'off'))
+    app.config.setdefault('PLAYER_SEARCH_REFRESH',
+                          float(os.environ.get('FSL_PLAYER_SEARCH_REFRESH', DEFAULT_REFRESH_INTERVAL)))
+    if not app.config['PLAYER_SEARCH']:
+        return
+    index = PlayerSearchIndex(refresh_interval=app.config['PLAYER_SEARCH_REFRESH'], **DB_CONFIG)
+    app.extensions['player_search'] = index
+    index.start()
@@ -0,0 +1,213 @@
+"""
+Slow-query log and repeated-query detector.
+
+Built on the statement hook of metrics.InstrumentedConnection. While a request runs:
+
+  * every statement slower than the threshold is logged at WARNING with its route, its
+    normalised text and its bound parameters;
+  * the statements are kept, and at the end of the request statements that were sent more
+    than once are flagged: 'identical' when the same text was repeated, 'similar' when only
+    the literals differ (the usual loop of one query per row). Requests that used more than
+    one connection are flagged as well.
+
+Flags are aggregated per route into a report (querylog.report(), or /diagnostics/queries
+for admins), sorted by the round trips that could be saved.
+
+Settings (app.config, with environment fallbacks):
+  * QUERY_LOG (FSL_QUERY_LOG): '1' to switch the diagnostics on.
+  * SLOW_QUERY_MS (FSL_SLOW_QUERY_MS, 100): the slow statement threshold.
+  * QUERY_REPEAT_THRESHOLD (FSL_QUERY_REPEAT_THRESHOLD, 3): how often a similar statement
+    must run in one request to be flagged; identical statements are flagged from 2.
+  * QUERY_LOG_SAMPLE (FSL_QUERY_LOG_SAMPLE, 1.0): the share of requests checked for
+    repeats. The slow log always sees every request; lower the sample in production.
+"""
+import os
+import re
+import random
+import logging
+import threading
+
+
+logger = logging.getLogger('fsl.querylog')
+
+# longest statement text kept in logs and reports
+MAX_SQL_LENGTH = 1000
+
+# distinct statements remembered per route in the report
+MAX_STATEMENTS_PER_ROUTE = 50
+
+_LITERAL = re.compile(r"""
+    '(?:[^'\\]|\\.|'')*'           # quoted string
+  | "(?:[^"\\]|\\.|"")*"
+  | \b0x[0-9a-fA-F]+\b             # hex literal
+  | (?<![\w.])-?\d+(?:\.\d+)?\b   # number that is not part of an identifier
+""", re.VERBOSE)
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """
+    Normalise a statement by replacing its literals with '?'.
+
+    :param sql: The statement as sent (str or bytes, with the parameters already bound).
+    :return: A (normalised_sql, parameters) pair; IN lists collapse to '(?+)'.
+    """
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    parameters = []
+
+    def replace(match):
+        parameters.append(match.group(0))
+        return '?'
+
+    normalised = _LITERAL.sub(replace, sql)
+    normalised = _IN_LIST.sub('(?+)', normalised)
+    normalised = _SPACE.sub(' ', normalised).strip()
+    return normalised, parameters
+
+
+def _shorten(text):
+    return text if len(text) <= MAX_SQL_LENGTH else text[:MAX_SQL_LENGTH] + '...'
+
+
+class QueryLog:
+    """
+    :param slow_threshold: Seconds after which a statement is logged as slow.
+    :param repeat_threshold: Runs of one similar statement per request that get flagged.
+    :param sample_rate: Share of requests whose statements are kept and checked for repeats.
+    """
+
+    def __init__(self, slow_threshold=0.1, repeat_threshold=3, sample_rate=1.0):
+        self.slow_threshold = slow_threshold
+        self.repeat_threshold = repeat_threshold
+        self.sample_rate = sample_rate
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """
+        :return: Whether the next request should keep its statements.
+        """
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def _route(self, route):
+        entry = self._routes.get(route)
+        if entry is None:
+            entry = self._routes[route] = {
+                'requests': 0, 'statements': 0, 'slow': 0, 'multiple_connections': 0, 'repeats': {},
+            }
+        return entry
+
+    def slow(self, route, sql, elapsed):
+        """
+        Log one slow statement.
+        """
+        normalised, parameters = fingerprint(sql)
+        logger.warning(f"Slow query ({elapsed * 1000:.0f} ms) on {route}: {_shorten(normalised)} "
+                       f"parameters={_shorten(repr(parameters))}")
+        with self._lock:
+            self._route(route)['slow'] += 1
+
+    def analyze(self, route, statements, connections):
+        """
+        Flag the repeated statements of one finished request.
+
+        :param route: E.g. 'GET start_trade'.
+        :param statements: The (sql, elapsed) pairs the request sent, in order.
+        :param connections: The number of distinct connections it used.
+        :return: The flags raised, as dictionaries.
+        """
+        groups = {}
+        for sql, elapsed in statements:
+            normalised, _ = fingerprint(sql)
+            group = groups.setdefault(normalised, {'count': 0, 'texts': set(), 'time': 0.0})
+            group['count'] += 1
+            group['texts'].add(sql)
+            group['time'] += elapsed
+
+        flags = []
+        for normalised, group in groups.items():
+            identical = len(group['texts']) < group['count']
+            if group['count'] >= self.repeat_threshold or (identical and group['count'] >= 2):
+                flags.append({
+                    'kind': 'identical' if len(group['texts']) == 1 else 'similar',
+                    'statement': _shorten(normalised),
+                    'count': group['count'],
+                    'time': group['time'],
+                })
+        for flag in flags:
+            logger.warning(f"{route}: {flag['kind']} statement ran {flag['count']} times in one request: "
+                           f"{flag['statement']}")
+        if connections > 1:
+            logger.warning(f"{route}: used {connections} database connections in one request")
+
+        with self._lock:
+            entry = self._route(route)
+            entry['requests'] += 1
+            entry['statements'] += len(statements)
+            if connections > 1:
+                entry['multiple_connections'] += 1
+            for flag in flags:
+                repeat = entry['repeats'].get(flag['statement'])
+                if repeat is None:
+                    if len(entry['repeats']) >= MAX_STATEMENTS_PER_ROUTE:
+                        continue
+                    repeat = entry['repeats'][flag['statement']] = {
+                        'kind': flag['kind'], 'requests': 0, 'max_count': 0, 'extra_round_trips': 0, 'time': 0.0,
+                    }
+                repeat['requests'] += 1
+                repeat['max_count'] = max(repeat['max_count'], flag['count'])
+                repeat['extra_round_trips'] += flag['count'] - 1
+                repeat['time'] += flag['time']
+        return flags
+
+    def report(self):
+        """
+        Per-route summary, the routes with the most avoidable round trips first.
+
+        :return: A list of dictionaries, one per route.
+        """
+        with self._lock:
+            routes = []
+            for route, entry in self._routes.items():
+                repeats = sorted(
+                    ({'statement': statement, **repeat} for statement, repeat in entry['repeats'].items()),
+                    key=lambda repeat: -repeat['extra_round_trips']
+                )
+                requests = entry['requests']
+                routes.append({
+                    'route': route,
+                    'requests_checked': requests,
+                    'statements_per_request': entry['statements'] / requests if requests else 0.0,
+                    'slow_statements': entry['slow'],
+                    'requests_with_multiple_connections': entry['multiple_connections'],
+                    'extra_round_trips_per_request':
+                        sum(repeat['extra_round_trips'] for repeat in repeats) / requests if requests else 0.0,
+                    'repeated_statements': repeats,
+                })
+        routes.sort(key=lambda route: (-route['extra_round_trips_per_request'], -route['slow_statements']))
+        return routes
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+
+def init_app(app):
+    """
+    Create the application's query log when QUERY_LOG is on. Call it before metrics.init_app,
+    which installs the statement hook.
+    """
+    app.config.setdefault('QUERY_LOG', os.environ.get('FSL_QUERY_LOG', '0') not in ('', '0', 'false', 'off'))
+    app.config.setdefault('SLOW_QUERY_MS', float(os.environ.get('FSL_SLOW_QUERY_MS', 100)))
+    app.config.setdefault('QUERY_REPEAT_THRESHOLD', int(os.environ.get('FSL_QUERY_REPEAT_THRESHOLD', 3)))
+    app.config.setdefault('QUERY_LOG_SAMPLE', float(os.environ.get('FSL_QUERY_LOG_SAMPLE', 1.0)))
+
+    if not app.config['QUERY_LOG']:
+        return
+    app.extensions['query_log'] = QueryLog(
+        slow_threshold=app.config['SLOW_QUERY_MS'] / 1000,
+        repeat_threshold=app.config['QUERY_REPEAT_THRESHOLD'],
+        sample_rate=app.config['QUERY_LOG_SAMPLE'],
+    )
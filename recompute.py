@@ -0,0 +1,235 @@
+"""
+Fantasy point recomputation from match events.
+
+Player.FantasyPoints should equal the sum of the player's MatchEvent.ImpactFantasyPoint, and
+Team.TotalPoints the sum of its players' FantasyPoints, the model datagen.py builds. Manual
+edits, the flat +20 of the AddPlayerPointsToTeam trigger and partial writes make them drift.
+This job repairs them, one sport at a time:
+
+  1. One grouped, non-locking read sums the events of every player of the sport and returns
+     only the players whose FantasyPoints differ.
+  2. Those players are written in batches, each its own short transaction: the batch is
+     locked in key order, its event totals are summed again under the lock (so events
+     ingested in the meantime count), and the changes are applied with
+     ingest.set_player_points, which moves the team totals along and re-ranks their leagues.
+  3. The teams of the sport are compared with the sum of their players' points in the same
+     way and corrected in batches.
+
+No lock is held between batches, so the app and event ingestion keep running during a full
+season recompute.
+
+Usage:
+    python recompute.py --dry-run       # report the drift, write nothing
+    python recompute.py                 # repair every sport
+    python recompute.py --sport BB --batch-size 200
+"""
+import sys
+import time
+import argparse
+from decimal import Decimal
+
+import pymysql
+
+from db import DB_CONFIG
+from ingest import apply_point_deltas, set_player_points
+from player_import import PLAYER_POSITIONS
+from standings import refresh_team_standings
+
+
+DEFAULT_BATCH_SIZE = 500
+
+MAX_POINTS = Decimal('9999.99')  # NUMERIC(6,2)
+
+# a player's event total, clamped to what FantasyPoints can hold
+_EVENT_TOTAL = "LEAST(GREATEST(COALESCE(SUM(e.ImpactFantasyPoint), 0), -9999.99), 9999.99)"
+
+
+def _clamp(points):
+    return max(min(points, MAX_POINTS), -MAX_POINTS)
+
+
+def player_drift(connection, sport):
+    """
+    :return: The players of a sport whose FantasyPoints differ from their event total, as
+        {'PlayerID', 'Current', 'Target'} dictionaries in PlayerID order.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT p.PlayerID, p.FantasyPoints AS Current, {_EVENT_TOTAL} AS Target
+            FROM Player p
+            LEFT JOIN MatchEvent e ON e.PlayerID = p.PlayerID
+            WHERE p.Sport = %s
+            GROUP BY p.PlayerID, p.FantasyPoints
+            HAVING NOT (p.FantasyPoints <=> Target)
+            ORDER BY p.PlayerID
+        """, (sport,))
+        return cursor.fetchall()
+
+
+def team_drift(connection, sport):
+    """
+    :return: The teams of a sport whose TotalPoints differ from the sum of their players'
+        event totals, as {'TeamID', 'Current', 'Target'} dictionaries in TeamID order. Reading
+        the players' event totals rather than their FantasyPoints makes the dry run report
+        what a real run ends with.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT t.TeamID, t.TotalPoints AS Current,
+                   LEAST(GREATEST(COALESCE(SUM(pt.Total), 0), -9999.99), 9999.99) AS Target
+            FROM Team t
+            LEFT JOIN (
+                SELECT p.TeamID, {_EVENT_TOTAL} AS Total
+                FROM Team st
+                JOIN Player p ON p.TeamID = st.TeamID
+                LEFT JOIN MatchEvent e ON e.PlayerID = p.PlayerID
+                WHERE st.Sport = %s
+                GROUP BY p.PlayerID, p.TeamID
+            ) pt ON pt.TeamID = t.TeamID
+            WHERE t.Sport = %s
+            GROUP BY t.TeamID, t.TotalPoints
+            HAVING NOT (t.TotalPoints <=> Target)
+            ORDER BY t.TeamID
+        """, (sport, sport))
+        return cursor.fetchall()
+
+
+def _lock(cursor, table, key, ids):
+    placeholders = ', '.join(['%s'] * len(ids))
+    cursor.execute(f"SELECT {key} FROM {table} WHERE {key} IN ({placeholders}) ORDER BY {key} FOR UPDATE", ids)
+
+
+def write_players(connection, player_ids):
+    """
+    Set a batch of players to their event totals, in one transaction.
+
+    :return: The number of players changed.
+    """
+    placeholders = ', '.join(['%s'] * len(player_ids))
+    try:
+        with connection.cursor() as cursor:
+            _lock(cursor, 'Player', 'PlayerID', player_ids)
+            cursor.execute(f"""
+                SELECT PlayerID, SUM(ImpactFantasyPoint) AS Total FROM MatchEvent
+                WHERE PlayerID IN ({placeholders})
+                GROUP BY PlayerID
+            """, player_ids)
+            totals = {int(row['PlayerID']): row['Total'] for row in cursor.fetchall()}
+            changed = set_player_points(
+                cursor, {player_id: _clamp(totals.get(player_id) or Decimal(0)) for player_id in player_ids}
+            )
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    return len(changed)
+
+
+def write_teams(connection, team_ids):
+    """
+    Set a batch of teams to the sum of their players' FantasyPoints, in one transaction.
+
+    :return: The number of teams changed.
+    """
+    placeholders = ', '.join(['%s'] * len(team_ids))
+    try:
+        with connection.cursor() as cursor:
+            _lock(cursor, 'Team', 'TeamID', team_ids)
+            cursor.execute(f"""
+                SELECT t.TeamID, t.TotalPoints, COALESCE(SUM(p.FantasyPoints), 0) AS Total
+                FROM Team t
+                LEFT JOIN Player p ON p.TeamID = t.TeamID
+                WHERE t.TeamID IN ({placeholders})
+                GROUP BY t.TeamID, t.TotalPoints
+            """, team_ids)
+            deltas = {}
+            for row in cursor.fetchall():
+                delta = _clamp(row['Total']) - (row['TotalPoints'] or 0)
+                if delta:
+                    deltas[row['TeamID']] = delta
+            apply_point_deltas(cursor, 'Team', 'TeamID', 'TotalPoints', deltas)
+            refresh_team_standings(cursor, deltas)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    return len(deltas)
+
+
+def _summarise(rows, key):
+    return {
+        'drifted': len(rows),
+        'drift': sum((abs(row['Target'] - (row['Current'] or 0)) for row in rows), Decimal(0)),
+        'largest': sorted(
+            ({'id': row[key], 'current': row['Current'], 'target': row['Target']} for row in rows),
+            key=lambda change: -abs(change['target'] - (change['current'] or 0))
+        )[:5],
+    }
+
+
+def recompute(connection, sports=None, dry_run=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Bring player and team points back in line with the match events.
+
+    :param connection: MySQL connection object.
+    :param sports: Sports to recompute; all of them when None.
+    :param dry_run: Report the drift without writing anything.
+    :param batch_size: Players or teams written per transaction.
+    :return: A list of per-sport report dictionaries.
+    """
+    reports = []
+    for sport in sports or PLAYER_POSITIONS:
+        started = time.perf_counter()
+        players = player_drift(connection, sport)
+        report = {'sport': sport, 'dry_run': dry_run, 'players': _summarise(players, 'PlayerID')}
+        player_ids = [int(row['PlayerID']) for row in players]
+
+        report['players']['changed'] = 0
+        if not dry_run:
+            for start in range(0, len(player_ids), batch_size):
+                report['players']['changed'] += write_players(connection, player_ids[start:start + batch_size])
+
+        # read after the players are fixed, so only the teams still off are written
+        teams = team_drift(connection, sport)
+        report['teams'] = _summarise(teams, 'TeamID')
+        team_ids = [int(row['TeamID']) for row in teams]
+
+        report['teams']['changed'] = 0
+        if not dry_run:
+            for start in range(0, len(team_ids), batch_size):
+                report['teams']['changed'] += write_teams(connection, team_ids[start:start + batch_size])
+
+        report['seconds'] = time.perf_counter() - started
+        reports.append(report)
+    return reports
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sport', choices=sorted(PLAYER_POSITIONS), action='append',
+                        help='only recompute this sport (repeatable)')
+    parser.add_argument('--dry-run', action='store_true', help='report the drift without writing')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        reports = recompute(connection, args.sport, dry_run=args.dry_run, batch_size=args.batch_size)
+    finally:
+        connection.close()
+
+    for report in reports:
+        print(f"{report['sport']} ({report['seconds']:.2f} s):")
+        for kind in ('players', 'teams'):
+            summary = report[kind]
+            line = f"  {summary['drifted']} {kind} off by {summary['drift']} points in total"
+            if not report['dry_run']:
+                line += f", {summary['changed']} updated"
+            print(line + '.')
+            for change in summary['largest']:
+                print(f"    {kind[:-1]} {change['id']}: {change['current']} -> {change['target']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,380 @@
+"""
+Structured player stats and fantasy scoring.
+
+PlayerStats.PerformanceStats is free text ('Passed for 320 yards, 3 TDs', 'Scored 26 points,
+6 rebounds'). This module:
+
+  * parses it into typed stat columns in PlayerStatLine (migrations/011_player_stat_lines.sql).
+    Parsing is incremental: only rows that are new, or whose text changed since they were
+    parsed, are read, in keyset-paged chunks that each commit on their own;
+  * rescores every player from those columns in one vectorized pass. The stat lines are read
+    into a NumPy matrix (one row per game, one column per stat), each row is multiplied by its
+    sport's weights and the row scores are summed per player with np.bincount. Only players
+    whose FantasyPoints changed are written, in batches, as the difference from the points
+    read before scoring (ingest.add_player_points), so event points ingested meanwhile are
+    kept; team totals move by the same differences and the affected leagues are re-ranked.
+
+Scoring rules give the points per unit of each stat, per sport (DEFAULT_RULES). A JSON file
+of the same shape replaces the rules of the sports it lists. Players without any stat lines
+keep their points.
+
+Usage:
+    python scoring.py parse                 # parse new and changed PlayerStats rows
+    python scoring.py parse --full          # re-parse everything
+    python scoring.py rescore --dry-run     # report the changes without writing them
+    python scoring.py rescore --rules rules.json
+
+Rescoring needs NumPy; the web app does not import this module.
+"""
+import re
+import sys
+import json
+import time
+import zlib
+import argparse
+from decimal import Decimal
+
+import numpy as np
+import pymysql
+
+from db import DB_CONFIG
+from ingest import add_player_points
+
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_BATCH_SIZE = 500
+
+# typed columns of PlayerStatLine, in matrix order
+STAT_COLUMNS = (
+    'PassingYards', 'RushingYards', 'ReceivingYards', 'Touchdowns', 'Interceptions', 'FieldGoals',
+    'Receptions', 'Points', 'Rebounds', 'Assists', 'Blocks', 'Goals', 'Saves', 'Tackles',
+    'Clearances', 'Passes', 'Shots', 'CleanSheets',
+)
+
+SPORTS = ('FTB', 'BB', 'SB')
+
+# points per unit of each stat; stats a sport does not list score nothing
+DEFAULT_RULES = {
+    'FTB': {
+        'PassingYards': 0.04, 'RushingYards': 0.1, 'ReceivingYards': 0.1, 'Touchdowns': 6,
+        'Interceptions': -2, 'FieldGoals': 3, 'Receptions': 0.5,
+    },
+    'BB': {
+        'Points': 1, 'Rebounds': 1.2, 'Assists': 1.5, 'Blocks': 3,
+    },
+    'SB': {
+        'Goals': 5, 'Assists': 3, 'Saves': 1, 'CleanSheets': 4, 'Tackles': 0.5, 'Clearances': 0.5,
+        'Interceptions': 0.5, 'Shots': 0.3, 'Passes': 0.02,
+    },
+}
+
+# unit words -> column; yards are resolved from the verb of their clause
+UNITS = {
+    'td': 'Touchdowns', 'tds': 'Touchdowns', 'touchdown': 'Touchdowns', 'touchdowns': 'Touchdowns',
+    'int': 'Interceptions', 'ints': 'Interceptions',
+    'interception': 'Interceptions', 'interceptions': 'Interceptions',
+    'fg': 'FieldGoals', 'fgs': 'FieldGoals', 'field goal': 'FieldGoals', 'field goals': 'FieldGoals',
+    'rec': 'Receptions', 'reception': 'Receptions', 'receptions': 'Receptions',
+    'catch': 'Receptions', 'catches': 'Receptions',
+    'pts': 'Points', 'point': 'Points', 'points': 'Points',
+    'reb': 'Rebounds', 'rebound': 'Rebounds', 'rebounds': 'Rebounds',
+    'ast': 'Assists', 'assist': 'Assists', 'assists': 'Assists',
+    'blk': 'Blocks', 'block': 'Blocks', 'blocks': 'Blocks',
+    'goal': 'Goals', 'goals': 'Goals',
+    'save': 'Saves', 'saves': 'Saves',
+    'tackle': 'Tackles', 'tackles': 'Tackles',
+    'clearance': 'Clearances', 'clearances': 'Clearances',
+    'pass': 'Passes', 'passes': 'Passes',
+    'shot': 'Shots', 'shots': 'Shots',
+    'clean sheet': 'CleanSheets', 'clean sheets': 'CleanSheets',
+}
+YARD_UNITS = ('yd', 'yds', 'yard', 'yards')
+
+# column for yards whose clause has no verb ('85 yards'), by position
+DEFAULT_YARDS = {'QB': 'PassingYards', 'RB': 'RushingYards'}
+
+MAX_STAT = 32767  # SMALLINT
+MAX_POINTS = Decimal('9999.99')  # NUMERIC(6,2)
+
+_CLAUSE = re.compile(r'[,;]|\band\b')
+_QUANTITY = re.compile(r'(\d+)\s*(field goals?|clean sheets?|[a-z]+)')
+_CLEAN_SHEET = re.compile(r'\bclean sheet\b')
+
+
+def _yards_column(clause, position):
+    if 'pass' in clause or 'threw' in clause:
+        return 'PassingYards'
+    if 'rush' in clause or 'ran ' in clause:
+        return 'RushingYards'
+    if 'caught' in clause or 'catch' in clause or 'receiv' in clause:
+        return 'ReceivingYards'
+    return DEFAULT_YARDS.get(position, 'ReceivingYards')
+
+
+def parse_performance(text, position=None):
+    """
+    Turn one PerformanceStats text into stat counts.
+
+    :param text: E.g. 'Passed for 320 yards, 3 TDs' or '26 pts, 6 reb, 5 ast'.
+    :param position: The player's position; decides what bare 'N yards' counts as.
+    :return: A dictionary mapping STAT_COLUMNS names to counts, holding only the stats found.
+    """
+    stats = {}
+    if not text:
+        return stats
+    for clause in _CLAUSE.split(text.lower()):
+        counted = set()
+        for match in _QUANTITY.finditer(clause):
+            unit = match.group(2)
+            if unit in YARD_UNITS:
+                column = _yards_column(clause, position)
+            elif unit.startswith('goal') and 'assist' in clause:
+                column = 'Assists'  # 'Assisted 1 goal'
+            else:
+                column = UNITS.get(unit)
+            if column is not None:
+                stats[column] = min(stats.get(column, 0) + int(match.group(1)), MAX_STAT)
+                counted.add(column)
+        if 'CleanSheets' not in counted and _CLEAN_SHEET.search(clause):
+            stats['CleanSheets'] = stats.get('CleanSheets', 0) + 1  # 'Made 5 saves, clean sheet'
+    return stats
+
+
+def parse_stat_lines(connection, full=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Bring PlayerStatLine up to date with PlayerStats.
+
+    :param connection: MySQL connection object.
+    :param full: Re-parse every row, not only the new and changed ones.
+    :param chunk_size: PlayerStats rows read and written per transaction.
+    :return: A report dictionary: rows parsed, rows with no recognised stat, seconds taken.
+    """
+    started = time.perf_counter()
+    stale = "" if full else "AND NOT (l.SourceCrc <=> CRC32(COALESCE(ps.PerformanceStats, '')))"
+    columns = ', '.join(STAT_COLUMNS)
+    updates = ', '.join(f"{column} = VALUES({column})"
+                        for column in ('PlayerID', 'GameDate', 'Sport') + STAT_COLUMNS + ('Parsed', 'SourceCrc'))
+    insert = f"""
+        INSERT INTO PlayerStatLine (StatsID, PlayerID, GameDate, Sport, {columns}, Parsed, SourceCrc)
+        VALUES ({', '.join(['%s'] * (len(STAT_COLUMNS) + 6))})
+        ON DUPLICATE KEY UPDATE {updates}
+    """
+
+    parsed = 0
+    unrecognised = 0
+    last_id = -1
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT ps.StatsID, ps.PlayerID, ps.GameDate, ps.PerformanceStats, p.Sport, p.Position
+                FROM PlayerStats ps
+                JOIN Player p ON p.PlayerID = ps.PlayerID
+                LEFT JOIN PlayerStatLine l ON l.StatsID = ps.StatsID
+                WHERE ps.StatsID > %s {stale}
+                ORDER BY ps.StatsID
+                LIMIT %s
+            """, (last_id, chunk_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            values = []
+            for row in rows:
+                text = row['PerformanceStats'] or ''
+                stats = parse_performance(text, row['Position'])
+                if not stats:
+                    unrecognised += 1
+                values.append(
+                    (row['StatsID'], row['PlayerID'], row['GameDate'], row['Sport'])
+                    + tuple(stats.get(column, 0) for column in STAT_COLUMNS)
+                    + (bool(stats), zlib.crc32(text.encode('utf-8')))
+                )
+            cursor.executemany(insert, values)
+        connection.commit()
+        parsed += len(rows)
+        last_id = rows[-1]['StatsID']
+
+    return {'parsed': parsed, 'unrecognised': unrecognised, 'seconds': time.perf_counter() - started}
+
+
+def load_rules(path=None):
+    """
+    :param path: Optional JSON file mapping sport to {column: points per unit}. The sports it
+        lists replace the defaults.
+    :return: The scoring rules.
+    :raises ValueError: If the file names an unknown sport or stat.
+    """
+    rules = {sport: dict(weights) for sport, weights in DEFAULT_RULES.items()}
+    if path is None:
+        return rules
+    with open(path) as f:
+        custom = json.load(f)
+    for sport, weights in custom.items():
+        if sport not in SPORTS:
+            raise ValueError(f"Unknown sport '{sport}' in {path}. Use FTB, BB or SB.")
+        unknown = set(weights) - set(STAT_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown stats for {sport} in {path}: {', '.join(sorted(unknown))}.")
+        rules[sport] = {column: float(value) for column, value in weights.items()}
+    return rules
+
+
+def weight_matrix(rules):
+    """
+    :return: A (sports, stats) array; row i holds the weights of SPORTS[i].
+    """
+    weights = np.zeros((len(SPORTS), len(STAT_COLUMNS)))
+    for i, sport in enumerate(SPORTS):
+        for column, value in rules.get(sport, {}).items():
+            weights[i, STAT_COLUMNS.index(column)] = value
+    return weights
+
+
+def load_stat_matrix(connection, chunk_size=50000):
+    """
+    Read every stat line into arrays, streaming the rows.
+
+    :return: A (player_ids, sport_codes, stats) triple: int64 arrays of length n, and an
+        int32 (n, len(STAT_COLUMNS)) matrix. Sport codes index SPORTS.
+    """
+    chunks = []
+    with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute(f"""
+            SELECT CAST(PlayerID AS UNSIGNED), FIELD(Sport, {', '.join(['%s'] * len(SPORTS))}) - 1,
+                   {', '.join(STAT_COLUMNS)}
+            FROM PlayerStatLine
+        """, SPORTS)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            chunks.append(np.array(rows, dtype=np.int64))
+
+    if not chunks:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros((0, len(STAT_COLUMNS)), np.int32)
+    table = np.concatenate(chunks)
+    return table[:, 0], table[:, 1], table[:, 2:].astype(np.int32)
+
+
+def score_players(player_ids, sport_codes, stats, weights):
+    """
+    Score every stat line with its sport's weights and total the scores per player.
+
+    :param player_ids: int array, one entry per stat line.
+    :param sport_codes: int array of indexes into SPORTS; lines with -1 (unknown sport) score 0.
+    :param stats: (lines, stats) matrix in STAT_COLUMNS order.
+    :param weights: The result of weight_matrix().
+    :return: A (players, points) pair of arrays, the players sorted ascending.
+    """
+    line_points = np.zeros(len(player_ids))
+    for code in range(len(SPORTS)):
+        mask = sport_codes == code
+        if mask.any():
+            line_points[mask] = stats[mask] @ weights[code]
+    players, index = np.unique(player_ids, return_inverse=True)
+    return players, np.bincount(index, weights=line_points, minlength=len(players))
+
+
+def rescore(connection, rules=None, dry_run=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Recompute FantasyPoints from PlayerStatLine for every player that has stat lines.
+
+    :param connection: MySQL connection object.
+    :param rules: Scoring rules; DEFAULT_RULES when None.
+    :param dry_run: Compute and report, but write nothing.
+    :param batch_size: Players written per transaction.
+    :return: A report dictionary: stat lines, players scored, players changed, the total
+        change, the largest changes and the time spent loading, scoring and writing.
+    """
+    report = {'stat_lines': 0, 'players': 0, 'changed': 0, 'total_change': Decimal(0), 'largest': [],
+              'load_seconds': 0.0, 'score_seconds': 0.0, 'write_seconds': 0.0, 'dry_run': dry_run}
+
+    started = time.perf_counter()
+    player_ids, sport_codes, stats = load_stat_matrix(connection)
+    report['stat_lines'] = len(player_ids)
+    report['load_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    players, totals = score_players(player_ids, sport_codes, stats, weight_matrix(rules or DEFAULT_RULES))
+    totals = np.clip(np.round(totals, 2), -float(MAX_POINTS), float(MAX_POINTS))
+    report['players'] = len(players)
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT PlayerID, FantasyPoints FROM Player")
+        current = {int(row['PlayerID']): row['FantasyPoints'] or Decimal(0) for row in cursor.fetchall()}
+    targets = {}
+    for player_id, total in zip(players.tolist(), totals.tolist()):
+        points = Decimal(f"{total:.2f}")
+        if player_id in current and points != current[player_id]:
+            targets[player_id] = points
+    report['score_seconds'] = time.perf_counter() - started
+
+    report['changed'] = len(targets)
+    report['total_change'] = sum((points - current[player_id] for player_id, points in targets.items()), Decimal(0))
+    report['largest'] = sorted(
+        ({'PlayerID': player_id, 'old': current[player_id], 'new': points} for player_id, points in targets.items()),
+        key=lambda change: -abs(change['new'] - change['old'])
+    )[:10]
+    if dry_run:
+        return report
+
+    started = time.perf_counter()
+    player_ids = sorted(targets)
+    for start in range(0, len(player_ids), batch_size):
+        batch = {player_id: targets[player_id] - current[player_id]
+                 for player_id in player_ids[start:start + batch_size]}
+        try:
+            with connection.cursor() as cursor:
+                add_player_points(cursor, batch)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+    report['write_seconds'] = time.perf_counter() - started
+    return report
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parse = commands.add_parser('parse', help='parse PlayerStats into PlayerStatLine')
+    parse.add_argument('--full', action='store_true', help='re-parse every row')
+    parse.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    score = commands.add_parser('rescore', help='recompute FantasyPoints from PlayerStatLine')
+    score.add_argument('--rules', help='JSON file with per-sport scoring rules')
+    score.add_argument('--dry-run', action='store_true', help='report the changes without writing them')
+    score.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    try:
+        rules = load_rules(args.rules) if args.command == 'rescore' else None
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        if args.command == 'parse':
+            report = parse_stat_lines(connection, full=args.full, chunk_size=args.chunk_size)
+            print(f"{report['parsed']} stat rows parsed ({report['unrecognised']} with no recognised stat) "
+                  f"in {report['seconds']:.2f} s.")
+            return 0
+
+        report = rescore(connection, rules, dry_run=args.dry_run, batch_size=args.batch_size)
+    finally:
+        connection.close()
+
+    print(f"{report['stat_lines']} stat lines, {report['players']} players scored "
+          f"(load {report['load_seconds']:.2f} s, score {report['score_seconds']:.2f} s).")
+    verb = 'would change' if report['dry_run'] else 'changed'
+    print(f"{report['changed']} players {verb}, total {report['total_change']:+} points"
+          + ('.' if report['dry_run'] else f" (write {report['write_seconds']:.2f} s)."))
+    for change in report['largest']:
+        print(f"  player {change['PlayerID']}: {change['old']} -> {change['new']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
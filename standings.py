@@ -0,0 +1,106 @@
+"""
+League standings: keeps Team.LeagueRanking in line with Team.TotalPoints.
+
+Teams are ranked within their league by TotalPoints (highest first), ties broken by the
+lower TeamID, so every league always has rankings 1..n with no duplicates. Code that
+changes team points calls refresh_team_standings() in the same transaction, which
+re-ranks only the leagues of those teams and writes only the rankings that moved.
+
+A full rebuild, for recovery after manual edits or bulk SQL:
+
+    python standings.py              # every league
+    python standings.py --league 3   # one league
+"""
+import sys
+import argparse
+
+import pymysql
+
+from db import DB_CONFIG
+
+
+def rerank_leagues(cursor, league_ids):
+    """
+    Recompute LeagueRanking for the given leagues with one UPDATE.
+
+    :param cursor: An open database cursor, inside the caller's transaction.
+    :param league_ids: The leagues to re-rank.
+    :return: The number of teams whose ranking changed.
+    """
+    league_ids = sorted({league_id for league_id in league_ids if league_id is not None})
+    if not league_ids:
+        return 0
+
+    placeholders = ', '.join(['%s'] * len(league_ids))
+    cursor.execute(f"""
+        UPDATE Team t
+        JOIN (
+            SELECT TeamID,
+                   ROW_NUMBER() OVER (PARTITION BY LeagueID ORDER BY TotalPoints DESC, TeamID ASC) AS NewRanking
+            FROM Team
+            WHERE LeagueID IN ({placeholders})
+        ) r ON t.TeamID = r.TeamID
+        SET t.LeagueRanking = r.NewRanking
+        WHERE NOT (t.LeagueRanking <=> r.NewRanking)
+    """, league_ids)
+    return cursor.rowcount
+
+
+def refresh_team_standings(cursor, team_ids):
+    """
+    Re-rank the leagues that the given teams play in. Call it after changing their TotalPoints
+    (or adding them), before committing.
+
+    :param cursor: An open database cursor, inside the caller's transaction.
+    :param team_ids: Teams whose points changed.
+    :return: The number of teams whose ranking changed.
+    """
+    team_ids = sorted(set(team_ids))
+    if not team_ids:
+        return 0
+
+    placeholders = ', '.join(['%s'] * len(team_ids))
+    cursor.execute(f"SELECT DISTINCT LeagueID FROM Team WHERE TeamID IN ({placeholders})", team_ids)
+    return rerank_leagues(cursor, [row['LeagueID'] for row in cursor.fetchall()])
+
+
+def rebuild_standings(connection, league_id=None):
+    """
+    Recompute the rankings of every league, or of one league.
+
+    :param connection: MySQL connection object.
+    :param league_id: Optional league to limit the rebuild to.
+    :return: The number of teams whose ranking changed.
+    """
+    try:
+        with connection.cursor() as cursor:
+            if league_id is None:
+                cursor.execute("SELECT LeagueID FROM League ORDER BY LeagueID")
+                league_ids = [row['LeagueID'] for row in cursor.fetchall()]
+            else:
+                league_ids = [league_id]
+            changed = rerank_leagues(cursor, league_ids)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    return changed
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Rebuild Team.LeagueRanking from Team.TotalPoints.")
+    parser.add_argument('--league', type=int, help='only rebuild this league')
+    args = parser.parse_args(argv)
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        changed = rebuild_standings(connection, args.league)
+    finally:
+        connection.close()
+
+    print(f"{changed} team rankings updated.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
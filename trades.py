@@ -0,0 +1,143 @@
+"""
+One-for-one trade execution with row locks on the players and teams involved.
+
+The ExecuteTrade procedure took the buyer's team with LIMIT 1 on Team.Manager and moved
+both players without checking where they were, so two trades of the same player could
+both commit. execute_trade instead, in one transaction:
+
+  1. locks the two players (FOR UPDATE, in PlayerID order) and checks that the seller's
+     player is still on the seller's team, that the offered player is on one of the
+     user's teams, and that both are still available;
+  2. locks the two teams (in TeamID order) and checks the manager and the sports;
+  3. moves the players and records Trade, PlayerTrade and TeamTrade, with a TradeID from
+     the ID allocator (ids.py);
+  4. moves each player's FantasyPoints to its new team's TotalPoints and re-ranks the
+     leagues of the two teams, as a waiver run does.
+
+The four rows are locked always players before teams and each in key order, the same
+order as event ingestion and waiver runs, so trades on the same rows queue instead of
+racing. Re-ranking then writes the rankings that moved in the two leagues. A deadlock or lock wait
+timeout rolls back the attempt, which is retried after a short random back-off.
+"""
+import time
+import random
+
+import pymysql
+
+from db import RETRY_ERRORS
+from ids import next_id
+from ingest import apply_point_deltas
+from standings import refresh_team_standings
+
+
+# attempts per trade when the transaction is chosen as a deadlock victim or times out
+DEFAULT_ATTEMPTS = 5
+
+
+class TradeError(ValueError):
+    """
+    The trade is not valid (any more); the message is meant for the user.
+    """
+
+
+def _lock_players(cursor, player_ids):
+    cursor.execute("""
+        SELECT PlayerID, TeamID, AvaiStatus, Sport, FantasyPoints FROM Player
+        WHERE PlayerID IN (%s, %s)
+        ORDER BY PlayerID
+        FOR UPDATE
+    """, sorted(player_ids))
+    return {int(row['PlayerID']): row for row in cursor.fetchall()}
+
+
+def _lock_teams(cursor, team_ids):
+    cursor.execute("""
+        SELECT TeamID, Manager, Sport FROM Team
+        WHERE TeamID IN (%s, %s)
+        ORDER BY TeamID
+        FOR UPDATE
+    """, sorted(team_ids))
+    return {int(row['TeamID']): row for row in cursor.fetchall()}
+
+
+def _trade(cursor, user_id, seller_team_id, player_id, your_player_id, trade_date, trade_id):
+    players = _lock_players(cursor, (player_id, your_player_id))
+    wanted, offered = players.get(player_id), players.get(your_player_id)
+    if wanted is None or offered is None:
+        raise TradeError("Player not found.")
+    if wanted['TeamID'] is None or int(wanted['TeamID']) != seller_team_id:
+        raise TradeError("The player is no longer on the seller's team.")
+    if offered['TeamID'] is None:
+        raise TradeError("Your player is not on a team.")
+    buyer_team_id = int(offered['TeamID'])
+    if buyer_team_id == seller_team_id:
+        raise TradeError("You cannot trade with your own team.")
+    if wanted['AvaiStatus'] != 'A' or offered['AvaiStatus'] != 'A':
+        raise TradeError("One of the players is no longer available for trading.")
+
+    teams = _lock_teams(cursor, (buyer_team_id, seller_team_id))
+    buyer, seller = teams.get(buyer_team_id), teams.get(seller_team_id)
+    if seller is None:
+        raise TradeError("Seller team not found.")
+    if buyer is None or buyer['Manager'] is None or int(buyer['Manager']) != int(user_id):
+        raise TradeError("Your player is not on one of your teams.")
+    if wanted['Sport'] != buyer['Sport'] or offered['Sport'] != seller['Sport']:
+        raise TradeError("Players can only be traded between teams of their sport.")
+
+    cursor.execute("INSERT INTO Trade (TradeID, TradeDate) VALUES (%s, %s)", (trade_id, trade_date))
+    cursor.execute("UPDATE Player SET TeamID = %s, AvaiStatus = 'U' WHERE PlayerID = %s", (buyer_team_id, player_id))
+    cursor.execute("UPDATE Player SET TeamID = %s, AvaiStatus = 'A' WHERE PlayerID = %s",
+                   (seller_team_id, your_player_id))
+    cursor.execute("""
+        INSERT INTO PlayerTrade (TradeID, PlayerID, FromOrTo) VALUES (%s, %s, 'To'), (%s, %s, 'From')
+    """, (trade_id, player_id, trade_id, your_player_id))
+    cursor.execute("""
+        INSERT INTO TeamTrade (TradeID, TeamID, InOrOut) VALUES (%s, %s, 'In'), (%s, %s, 'Out')
+    """, (trade_id, buyer_team_id, trade_id, seller_team_id))
+
+    # the wanted player's points go to the buyer, the offered player's to the seller
+    shift = (wanted['FantasyPoints'] or 0) - (offered['FantasyPoints'] or 0)
+    if shift:
+        apply_point_deltas(cursor, 'Team', 'TeamID', 'TotalPoints', {buyer_team_id: shift, seller_team_id: -shift})
+        refresh_team_standings(cursor, (buyer_team_id, seller_team_id))
+    return buyer_team_id
+
+
+def execute_trade(connection, user_id, seller_team_id, player_id, your_player_id, trade_date,
+                  attempts=DEFAULT_ATTEMPTS):
+    """
+    Swap the seller's player for one of the user's players.
+
+    :param connection: MySQL connection object; the trade is committed on it.
+    :param user_id: The buying user, who must manage the team of `your_player_id`.
+    :param seller_team_id: The team the wanted player is expected to be on.
+    :param player_id: The wanted player.
+    :param your_player_id: The player offered in return.
+    :param trade_date: Trade.TradeDate.
+    :param attempts: Tries before a deadlock or lock wait timeout is given up on.
+    :return: A dictionary with TradeID, BuyerTeamID and the number of Attempts.
+    :raises TradeError: When the trade is not valid; nothing is written.
+    """
+    seller_team_id, player_id, your_player_id = int(seller_team_id), int(player_id), int(your_player_id)
+    if player_id == your_player_id:
+        raise TradeError("A player cannot be traded for itself.")
+
+    trade_id = next_id('Trade')  # kept across retries, a rolled back attempt never used it
+    for attempt in range(1, attempts + 1):
+        try:
+            with connection.cursor() as cursor:
+                buyer_team_id = _trade(cursor, user_id, seller_team_id, player_id, your_player_id, trade_date,
+                                       trade_id)
+            connection.commit()
+            return {'TradeID': trade_id, 'BuyerTeamID': buyer_team_id, 'Attempts': attempt}
+        except TradeError:
+            connection.rollback()
+            raise
+        except pymysql.err.OperationalError as e:
+            connection.rollback()
+            if e.args[0] not in RETRY_ERRORS or attempt == attempts:
+                raise
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+        except Exception:
+            connection.rollback()
+            raise
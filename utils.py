@@ -1,20 +1,151 @@
+import time
 import pymysql
 import logging
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Union
 
+from pagination import fetch_page, row_counts
+from draft import run_draft
+from trades import execute_trade, TradeError
 
-def GetMatches(connection, sport, order_by):
+
+def GetTableVersions(connection, tables):
+    """
+    Read the data versions of some tables from TableVersion (bumped by triggers on every write).
+
+    :param connection: MySQL connection object.
+    :param tables: Version names, e.g. ('MatchDetail', 'MatchTeam') or ('MatchEvent:12',).
+    :return: A tuple of versions in the same order as `tables`.
+    """
+    placeholders = ', '.join(['%s'] * len(tables))
     with connection.cursor() as cursor:
-        cursor.callproc('GetMatches', (sport, order_by))
-        result = cursor.fetchall()
-        return result
+        cursor.execute(f"""
+            SELECT Name, SUM(Version) AS Version
+            FROM TableVersion
+            WHERE Name IN ({placeholders})
+            GROUP BY Name
+        """, tuple(tables))
+        versions = {row['Name']: int(row['Version']) for row in cursor.fetchall()}
+    return tuple(versions.get(table, 0) for table in tables)
+
+
+class ResultCache:
+    """
+    Bounded cache of query results (or any value) with TTL and LRU eviction.
+
+    Each entry remembers the versions of the tables it was read from and is only served
+    while they are unchanged, so any write to those tables invalidates it, from any process.
+
+    :param max_entries: Maximum number of cached results; the least recently used is evicted.
+    :param ttl: Seconds a result is served at most, even if its tables did not change.
+    """
+
+    def __init__(self, max_entries=256, ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, versions, stored_at)
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def lookup(self, key, versions):
+        """
+        :param key: The cache key.
+        :param versions: The current versions of the data behind the entry.
+        :return: The cached value, or None if it is missing, stale or expired.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, cached_versions, stored_at = entry
+                if cached_versions != versions:
+                    self._invalidations += 1
+                    del self._entries[key]
+                elif now - stored_at > self.ttl:
+                    self._expirations += 1
+                    del self._entries[key]
+                else:
+                    self._hits += 1
+                    self._entries.move_to_end(key)
+                    return value
+            self._misses += 1
+            return None
+
+    def store(self, key, versions, value):
+        with self._lock:
+            self._entries[key] = (value, versions, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def call(self, connection, procedure, args, tables):
+        """
+        Return the result of a stored procedure, from the cache when it is still valid.
+
+        :param connection: MySQL connection object.
+        :param procedure: The procedure name.
+        :param args: The procedure arguments.
+        :param tables: Version names of the data the procedure reads; writes to any of them invalidate the result.
+        :return: The rows returned by the procedure.
+        """
+        key = (procedure, tuple(args))
+        versions = GetTableVersions(connection, tables)
+        rows = self.lookup(key, versions)
+        if rows is not None:
+            return rows
+
+        with connection.cursor() as cursor:
+            cursor.callproc(procedure, args)
+            rows = cursor.fetchall()
+
+        self.store(key, versions, rows)
+        return rows
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Snapshot of the cache counters.
+
+        :return: A dictionary of counters and gauges.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'invalidations': self._invalidations,
+            }
+
+
+# process-wide cache of match procedures; finished matches rarely change
+match_cache = ResultCache()
+
+# GetMatches reads MatchSummary alone, see migrations/013_match_summary.sql
+MATCH_TABLES = ('MatchSummary',)
+
+
+def GetMatches(connection, sport, order_by):
+    return match_cache.call(connection, 'GetMatches', (sport, order_by), MATCH_TABLES)
     
 
 def GetMatchEvents(connection, match_id, order_by):
-    with connection.cursor() as cursor:
-        cursor.callproc('GetMatchEvents', (match_id, order_by))
-        result = cursor.fetchall()
-        return result
+    # events are versioned per match, see migrations/007_table_versions.sql
+    return match_cache.call(connection, 'GetMatchEvents', (match_id, order_by), (f'MatchEvent:{match_id}',))
 
 
 
@@ -39,6 +170,160 @@ def GetAllPlayerStats(connection, order_by):
                 # general MySQL error
                 raise e
 
+# Sort keys for the paginated player listing. PlayerID is the tie-breaker, so the order is
+# total and page cursors are stable; each key pair is backed by an index (migration 002).
+PLAYER_SORT_KEYS = {
+    'Name': [('p.FullName', 'ASC', 'FullName'), ('p.PlayerID', 'ASC', 'PlayerID')],
+    'Fantasy Points': [('p.FantasyPoints', 'DESC', 'FantasyPoints'), ('p.PlayerID', 'DESC', 'PlayerID')],
+    'Sport': [('p.Sport', 'ASC', 'Sport'), ('p.PlayerID', 'ASC', 'PlayerID')],
+}
+
+
+def GetPlayerPage(connection, order_by, after=None, before=None, per_page=20):
+    """
+    Fetch one page of players sorted by 'Name', 'Fantasy Points' or 'Sport'.
+
+    :param connection: MySQL connection object.
+    :param order_by: The sort key.
+    :param after: Cursor of the last player on the previous page.
+    :param before: Cursor of the first player on the following page (for "Previous").
+    :param per_page: Number of players per page.
+    :return: A dict with 'rows', 'next_cursor' and 'prev_cursor'.
+    """
+    if order_by not in PLAYER_SORT_KEYS:
+        raise ValueError('Invalid order_by_field. Use "Name", "Fantasy Points", or "Sport".')
+
+    with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+        return fetch_page(
+            cursor,
+            "SELECT p.PlayerID, p.FullName, p.PhotoURL, p.Sport, p.FantasyPoints FROM Player p",
+            PLAYER_SORT_KEYS[order_by],
+            after=after,
+            before=before,
+            per_page=per_page
+        )
+
+
+def CountPlayers(connection):
+    """
+    Total number of players, cached for a short time (see pagination.row_counts).
+    """
+    def load():
+        with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+            cursor.execute("SELECT COUNT(*) AS count FROM Player")
+            return cursor.fetchone()['count']
+
+    return row_counts.get('players', load)
+
+
+# Sort keys for the trade history listing; (TradeID, PlayerID) is the PlayerTrade primary key.
+# TradeDate may be NULL; the seek condition pages through NULLs too (pagination.seek_condition).
+TRADE_SORT_KEYS = {
+    'Name': [('p.FullName', 'ASC', 'FullName'), ('pt.TradeID', 'ASC', 'TradeID'), ('pt.PlayerID', 'ASC', 'PlayerID')],
+    'Sport': [('t.Sport', 'ASC', 'Sport'), ('pt.TradeID', 'ASC', 'TradeID'), ('pt.PlayerID', 'ASC', 'PlayerID')],
+    'Fantasy Points': [('p.FantasyPoints', 'DESC', 'FantasyPoints'), ('pt.TradeID', 'DESC', 'TradeID'), ('pt.PlayerID', 'DESC', 'PlayerID')],
+    'Trade Date': [('tr.TradeDate', 'DESC', 'TradeDate'), ('pt.TradeID', 'DESC', 'TradeID'), ('pt.PlayerID', 'DESC', 'PlayerID')],
+}
+
+
+def GetTradePage(connection, order_by, after=None, before=None, per_page=10):
+    """
+    Fetch one page of the trade history (PlayerTrade joined to Player, Trade and Team).
+
+    :param connection: MySQL connection object.
+    :param order_by: 'Name', 'Sport', 'Fantasy Points' or 'Trade Date'.
+    :param after: Cursor of the last trade on the previous page.
+    :param before: Cursor of the first trade on the following page.
+    :param per_page: Number of trades per page.
+    :return: A dict with 'rows', 'next_cursor' and 'prev_cursor'.
+    """
+    if order_by not in TRADE_SORT_KEYS:
+        raise ValueError('Invalid order_by_field. Use "Name", "Sport", "Fantasy Points", or "Trade Date".')
+
+    with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+        return fetch_page(
+            cursor,
+            """
+                SELECT
+                    pt.TradeID,
+                    pt.PlayerID,
+                    p.FullName,
+                    p.PhotoURL,
+                    p.RealTeam,
+                    p.FantasyPoints,
+                    t.TeamName,
+                    t.Sport,
+                    pt.FromOrTo,
+                    tr.TradeDate
+                FROM
+                    PlayerTrade pt
+                JOIN
+                    Player p ON pt.PlayerID = p.PlayerID
+                JOIN
+                    Trade tr ON pt.TradeID = tr.TradeID
+                JOIN
+                    Team t ON p.TeamID = t.TeamID
+            """,
+            TRADE_SORT_KEYS[order_by],
+            after=after,
+            before=before,
+            per_page=per_page
+        )
+
+
+# Sort keys for the draft listing; DraftDate may be NULL, like TradeDate above
+DRAFT_SORT_KEYS = {
+    'Date': [('Draft.DraftDate', 'ASC', 'Date'), ('Draft.DraftID', 'ASC', 'DraftID')],
+    'DraftOrder': [('Draft.DraftOrder', 'ASC', 'DraftOrder'), ('Draft.DraftID', 'ASC', 'DraftID')],
+    'DraftStatus': [('Draft.DraftStatus', 'ASC', 'DraftStatus'), ('Draft.DraftID', 'ASC', 'DraftID')],
+    'LeagueType': [('League.LeagueType', 'ASC', 'LeagueType'), ('Draft.DraftID', 'ASC', 'DraftID')],
+}
+
+
+def GetDraftPage(connection, order_by, after=None, before=None, per_page=12):
+    """
+    Fetch one page of drafts with their league name and type.
+
+    :param connection: MySQL connection object.
+    :param order_by: 'Date', 'DraftOrder', 'DraftStatus' or 'LeagueType'.
+    :param after: Cursor of the last draft on the previous page.
+    :param before: Cursor of the first draft on the following page.
+    :param per_page: Number of drafts per page.
+    :return: A dict with 'rows', 'next_cursor' and 'prev_cursor'.
+    """
+    if order_by not in DRAFT_SORT_KEYS:
+        raise ValueError("Invalid order_by_field. Use 'Date', 'DraftOrder', 'DraftStatus', or 'LeagueType'.")
+
+    with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+        return fetch_page(
+            cursor,
+            """
+                SELECT
+                    Draft.DraftID,
+                    Draft.DraftDate AS Date,
+                    Draft.DraftOrder,
+                    Draft.DraftStatus,
+                    League.LeagueName,
+                    League.LeagueType
+                FROM Draft
+                JOIN League ON Draft.LeagueID = League.LeagueID
+            """,
+            DRAFT_SORT_KEYS[order_by],
+            after=after,
+            before=before,
+            per_page=per_page
+        )
+
+
+def GetRowCount(connection, name):
+    """
+    Read a trigger-maintained row count from RowCounter (e.g. 'PlayerTrade' or 'Draft').
+    """
+    with connection.cursor(pymysql.cursors.DictCursor) as cursor:
+        cursor.execute("SELECT COALESCE(SUM(Total), 0) AS count FROM RowCounter WHERE Name = %s", (name,))
+        return int(cursor.fetchone()['count'])
+
+
 def GetPlayerDetails(conn, player_id):
     """
     Retrieves details of a player by calling the GetPlayerDetails stored procedure.
@@ -134,38 +419,31 @@ def GetTrades(conn, order_by_field):
 
 def ExecuteTrade(connection, user_id, seller_team_id, player_id, your_player_id, trade_date):
     """
-    Executes a trade between two players by calling the ExecuteTrade stored procedure.
+    Executes a trade between two players with trades.execute_trade, which locks the two
+    players and teams, checks ownership under the lock and retries on deadlock.
     """
     try:
-        with connection.cursor() as cursor:
-            # call the stored procedure
-            cursor.callproc('ExecuteTrade', (user_id, seller_team_id, player_id, your_player_id, trade_date))
-            connection.commit()
-            return {'status': "Trade executed successfully."}
-    except pymysql.err.InternalError as e:
-        # handle stored procedure errors
-        error_code, error_message = e.args
-        logging.error(f"Stored Procedure Error {error_code}: {error_message}")
-        return {'status': error_message}
+        result = execute_trade(connection, user_id, seller_team_id, player_id, your_player_id, trade_date)
+        if result['Attempts'] > 1:
+            logging.info(f"Trade {result['TradeID']} committed after {result['Attempts']} attempts")
+        return {'status': "Trade executed successfully."}
+    except TradeError as e:
+        return {'status': str(e)}
     except Exception as e:
         # handle unexpected errors
-        connection.rollback()
         logging.error(f"Unexpected Error: {e}")
         return {'status': "An unexpected error occurred while executing the trade."}
     
     
 def start_draft(conn, league_id, draft_date, draft_order):
     """
-    Starts a draft for a given league by calling the StartDraft stored procedure.
+    Starts a draft for a given league with the set-based draft engine (see draft.py),
+    which assigns players exactly like the StartDraft stored procedure.
     
     :param conn: MySQL connection object.
     :param league_id: The ID of the league to start the draft for.
     :param draft_date: The date when the draft starts.
     :param draft_order: The draft order type ('R' for round-robin, 'S' for snake).
+    :return: The ID of the new draft.
     """
-    cursor = conn.cursor()
-
-    cursor.callproc('StartDraft', (league_id, draft_date, draft_order))
-    conn.commit()
-
-    cursor.close()
\ No newline at end of file
+    return run_draft(conn, league_id, draft_date, draft_order)
@@ -0,0 +1,281 @@
+"""
+Batch waiver processing.
+
+A waiver run takes every pending claim (WaiverStatus 'P') whose WaiverPickupDate falls in a
+window and settles them together:
+
+  1. The claims, the claimed players and the claiming teams are locked, in that order and
+     each in key order, within one transaction.
+  2. A claim is denied when its player is no longer available (AvaiStatus 'A'), is already
+     on the claiming team, or plays another sport than the team.
+  3. The remaining claims on one PlayerID compete: the team lowest in its league
+     (highest LeagueRanking, unranked teams first) wins, then the earliest
+     WaiverPickupDate, then the lowest WaiverID. Every other claim on the player is denied.
+  4. Winning players move to their new team and become unavailable ('U'), as after a
+     draft pick. Their FantasyPoints move from the old team's TotalPoints (if any) to the
+     new team's, and the leagues involved are re-ranked. Claim statuses, player moves and
+     points are written with a handful of set-based statements and committed at once.
+
+Claims used to be approved on insert by the AutoApproveWaiver trigger, which
+migrations/014_waiver_runs.sql drops, so new claims wait for the next run.
+
+Usage:
+    python waivers.py --dry-run                     # settle every pending claim up to today, write nothing
+    python waivers.py --since 2024-03-01 --until 2024-03-07
+"""
+import sys
+import time
+import argparse
+import datetime
+from collections import defaultdict
+
+import pymysql
+
+from db import DB_CONFIG
+from ingest import apply_point_deltas
+from standings import refresh_team_standings
+
+
+# keys per IN (...) list when locking claimed players and teams
+LOCK_CHUNK = 1000
+
+# why a claim was denied
+DENIED_UNAVAILABLE = 'player not available'
+DENIED_MISSING = 'player or team not found'
+DENIED_SPORT = 'player plays another sport'
+DENIED_ON_TEAM = 'player already on the team'
+DENIED_OUTBID = 'lower priority claim'
+
+
+def _chunks(keys, size=LOCK_CHUNK):
+    for start in range(0, len(keys), size):
+        yield keys[start:start + size]
+
+
+def lock_claims(cursor, since, until):
+    """
+    :return: The pending claims picked up between since and until (either may be None), as
+        dictionaries in WaiverID order, locked for update.
+    """
+    conditions = ["WaiverStatus = 'P'"]
+    params = []
+    if since is not None:
+        conditions.append("WaiverPickupDate >= %s")
+        params.append(since)
+    if until is not None:
+        conditions.append("WaiverPickupDate <= %s")
+        params.append(until)
+    cursor.execute(f"""
+        SELECT WaiverID, TeamID, PlayerID, WaiverPickupDate FROM Waiver
+        WHERE {' AND '.join(conditions)}
+        ORDER BY WaiverID
+        FOR UPDATE
+    """, params)
+    return cursor.fetchall()
+
+
+def _lock_rows(cursor, sql, key, ids):
+    rows = {}
+    for chunk in _chunks(sorted(ids)):
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cursor.execute(sql.format(placeholders=placeholders), chunk)
+        rows.update((int(row[key]), row) for row in cursor.fetchall())
+    return rows
+
+
+def lock_players(cursor, player_ids):
+    return _lock_rows(cursor, """
+        SELECT PlayerID, Sport, TeamID, AvaiStatus, FantasyPoints FROM Player
+        WHERE PlayerID IN ({placeholders}) ORDER BY PlayerID FOR UPDATE
+    """, 'PlayerID', player_ids)
+
+
+def lock_teams(cursor, team_ids):
+    return _lock_rows(cursor, """
+        SELECT TeamID, Sport, LeagueRanking FROM Team
+        WHERE TeamID IN ({placeholders}) ORDER BY TeamID FOR UPDATE
+    """, 'TeamID', team_ids)
+
+
+def claim_priority(claim, team):
+    """
+    Sort key of a claim among the claims on one player; the smallest wins.
+    """
+    ranking = team['LeagueRanking']
+    return (
+        0 if ranking is None else 1, -(ranking or 0),
+        claim['WaiverPickupDate'] or datetime.date.max,
+        claim['WaiverID'],
+    )
+
+
+def resolve_claims(claims, players, teams):
+    """
+    Decide every claim. Pure; nothing is read or written.
+
+    :param claims: Claim dictionaries (WaiverID, TeamID, PlayerID, WaiverPickupDate).
+    :param players: PlayerID -> Player row (Sport, TeamID, AvaiStatus).
+    :param teams: TeamID -> Team row (Sport, LeagueRanking).
+    :return: (winners, denied): winners maps PlayerID to its winning claim, denied maps
+        WaiverID to the reason.
+    """
+    denied = {}
+    contenders = defaultdict(list)
+    for claim in claims:
+        player = players.get(int(claim['PlayerID'])) if claim['PlayerID'] is not None else None
+        team = teams.get(int(claim['TeamID'])) if claim['TeamID'] is not None else None
+        if player is None or team is None:
+            denied[claim['WaiverID']] = DENIED_MISSING
+        elif player['AvaiStatus'] != 'A':
+            denied[claim['WaiverID']] = DENIED_UNAVAILABLE
+        elif player['Sport'] != team['Sport']:
+            denied[claim['WaiverID']] = DENIED_SPORT
+        elif player['TeamID'] is not None and int(player['TeamID']) == int(claim['TeamID']):
+            denied[claim['WaiverID']] = DENIED_ON_TEAM
+        else:
+            contenders[int(claim['PlayerID'])].append(claim)
+
+    winners = {}
+    for player_id, player_claims in contenders.items():
+        player_claims.sort(key=lambda claim: claim_priority(claim, teams[int(claim['TeamID'])]))
+        winners[player_id] = player_claims[0]
+        for claim in player_claims[1:]:
+            denied[claim['WaiverID']] = DENIED_OUTBID
+    return winners, denied
+
+
+def _set_status(cursor, status, waiver_ids):
+    for chunk in _chunks(sorted(waiver_ids)):
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cursor.execute(f"UPDATE Waiver SET WaiverStatus = %s WHERE WaiverID IN ({placeholders})", [status, *chunk])
+
+
+def move_players(cursor, moves):
+    """
+    Put players on new teams and mark them unavailable, with one UPDATE ... JOIN per chunk.
+
+    :param moves: A dictionary mapping PlayerID to its new TeamID.
+    """
+    items = sorted(moves.items())
+    for chunk in _chunks(items):
+        derived = ' UNION ALL '.join(['SELECT %s AS PlayerID, %s AS TeamID'] * len(chunk))
+        cursor.execute(f"""
+            UPDATE Player p
+            JOIN ({derived}) m ON p.PlayerID = m.PlayerID
+            SET p.TeamID = m.TeamID, p.AvaiStatus = 'U'
+        """, [value for item in chunk for value in item])
+
+
+def run_waivers(connection, since=None, until=None, dry_run=False):
+    """
+    Settle the pending claims of a window in one transaction.
+
+    :param connection: MySQL connection object.
+    :param since: First WaiverPickupDate of the window; no lower bound when None.
+    :param until: Last WaiverPickupDate of the window; no upper bound when None.
+    :param dry_run: Decide the claims and report, then roll back.
+    :return: A report dictionary: counts, the approved moves, the denied claims with their
+        reasons, and the time spent locking, resolving and writing.
+    """
+    timings = {}
+    started = time.perf_counter()
+    try:
+        with connection.cursor() as cursor:
+            claims = lock_claims(cursor, since, until)
+            players = lock_players(cursor, {int(c['PlayerID']) for c in claims if c['PlayerID'] is not None})
+            teams = lock_teams(cursor, {int(c['TeamID']) for c in claims if c['TeamID'] is not None}
+                               | {int(p['TeamID']) for p in players.values() if p['TeamID'] is not None})
+            timings['lock'] = time.perf_counter() - started
+
+            mark = time.perf_counter()
+            winners, denied = resolve_claims(claims, players, teams)
+            moves = {player_id: int(claim['TeamID']) for player_id, claim in winners.items()}
+            deltas = defaultdict(int)
+            for player_id, team_id in moves.items():
+                player = players[player_id]
+                points = player['FantasyPoints'] or 0
+                if player['TeamID'] is not None:
+                    deltas[int(player['TeamID'])] -= points
+                deltas[team_id] += points
+            timings['resolve'] = time.perf_counter() - mark
+
+            mark = time.perf_counter()
+            if not dry_run:
+                _set_status(cursor, 'A', [claim['WaiverID'] for claim in winners.values()])
+                _set_status(cursor, 'D', denied)
+                move_players(cursor, moves)
+                apply_point_deltas(cursor, 'Team', 'TeamID', 'TotalPoints', deltas)
+                refresh_team_standings(cursor, [team_id for team_id, delta in deltas.items() if delta])
+        if dry_run:
+            connection.rollback()
+        else:
+            connection.commit()
+        timings['write'] = time.perf_counter() - mark
+    except Exception:
+        connection.rollback()
+        raise
+
+    reasons = defaultdict(int)
+    for reason in denied.values():
+        reasons[reason] += 1
+    return {
+        'since': since,
+        'until': until,
+        'dry_run': dry_run,
+        'claims': len(claims),
+        'players': len(players),
+        'approved': len(winners),
+        'denied': len(denied),
+        'denied_by_reason': dict(reasons),
+        'moves': [
+            {'waiver_id': int(claim['WaiverID']), 'player_id': player_id, 'team_id': moves[player_id],
+             'from_team_id': _int(players[player_id]['TeamID'])}
+            for player_id, claim in sorted(winners.items())
+        ],
+        'denials': [{'waiver_id': int(waiver_id), 'reason': reason} for waiver_id, reason in sorted(denied.items())],
+        'timings': timings,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def _int(value):
+    return None if value is None else int(value)
+
+
+def _date(value):
+    return datetime.date.fromisoformat(value)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--since', type=_date, help='first pickup date of the window (YYYY-MM-DD)')
+    parser.add_argument('--until', type=_date, default=datetime.date.today(),
+                        help='last pickup date of the window (default: today)')
+    parser.add_argument('--dry-run', action='store_true', help='report the outcome without writing')
+    parser.add_argument('--verbose', action='store_true', help='list every move and denial')
+    args = parser.parse_args(argv)
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        report = run_waivers(connection, args.since, args.until, dry_run=args.dry_run)
+    finally:
+        connection.close()
+
+    verb = 'would approve' if report['dry_run'] else 'approved'
+    print(f"{report['claims']} pending claims on {report['players']} players: {verb} {report['approved']}, "
+          f"denied {report['denied']} in {report['seconds']:.2f}s "
+          f"(lock {report['timings']['lock']:.2f}s, resolve {report['timings']['resolve']:.2f}s, "
+          f"write {report['timings']['write']:.2f}s)")
+    for reason, count in sorted(report['denied_by_reason'].items()):
+        print(f"  {count} denied: {reason}")
+    if args.verbose:
+        for move in report['moves']:
+            source = f"team {move['from_team_id']}" if move['from_team_id'] else 'free agent'
+            print(f"  waiver {move['waiver_id']}: player {move['player_id']} {source} -> team {move['team_id']}")
+        for denial in report['denials']:
+            print(f"  waiver {denial['waiver_id']}: {denial['reason']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))